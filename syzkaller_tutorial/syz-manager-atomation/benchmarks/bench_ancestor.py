@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark get_closest_upstream_ancestor against the original per-branch
+merge-base loop on a synthetic repository with many tracking branches.
+"""
+import argparse
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import make_repo
+
+from invoke_syz_manager import history
+
+
+def per_branch_ancestor(repo_source_root: Path, get_remote):
+    """
+    The original implementation: two git processes per tracking branch.
+    """
+    output = subprocess.check_output(
+        [
+            "git",
+            "-C",
+            str(repo_source_root),
+            "for-each-ref",
+            "--format=%(refname:short) %(upstream:short)",
+            "refs/heads/",
+        ],
+        text=True,
+    ).strip()
+    candidates = [tuple(line.split()[:2]) for line in output.splitlines() if len(line.split()) >= 2]
+
+    best_ancestor, best_branch, min_distance = None, None, float("inf")
+    for cand_branch, cand_upstream in candidates:
+        try:
+            ancestor = subprocess.check_output(
+                ["git", "-C", str(repo_source_root), "merge-base", "HEAD", cand_upstream],
+                text=True,
+                stderr=subprocess.DEVNULL,
+            ).strip()
+            distance = int(
+                subprocess.check_output(
+                    ["git", "-C", str(repo_source_root), "rev-list", "--count", f"{ancestor}..HEAD"],
+                    text=True,
+                    stderr=subprocess.DEVNULL,
+                ).strip()
+            )
+        except subprocess.CalledProcessError:
+            continue
+        if distance < min_distance:
+            best_ancestor, best_branch, min_distance = ancestor, cand_branch, distance
+
+    ancestor_msg = subprocess.check_output(
+        ["git", "-C", str(repo_source_root), "log", "-1", best_ancestor, "--pretty=%s"],
+        text=True,
+    ).strip()
+    remote_url = subprocess.check_output(
+        ["git", "-C", str(repo_source_root), "remote", "get-url", get_remote(repo_source_root, best_branch)],
+        text=True,
+    ).strip()
+    return best_ancestor, ancestor_msg, remote_url, best_branch
+
+
+def timed(fn, *args, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--branches", type=int, default=300)
+    parser.add_argument("--history", type=int, default=2000)
+    parser.add_argument("--unpushed", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = Path(tmp) / "repo"
+        make_repo(repo, history=args.history, branches=args.branches, unpushed=args.unpushed)
+
+        expected, legacy_time = timed(
+            per_branch_ancestor, repo, history.get_remote, repeat=args.repeat
+        )
+        result, batched_time = timed(
+            history.get_closest_upstream_ancestor, repo, repeat=args.repeat
+        )
+
+    if result != expected:
+        raise SystemExit(f"[error] results differ:\n  per-branch: {expected}\n  batched:    {result}")
+
+    print(f"branches={args.branches} history={args.history} unpushed={args.unpushed}")
+    print(f"per-branch: {legacy_time * 1000:9.1f} ms")
+    print(f"batched:    {batched_time * 1000:9.1f} ms  ({legacy_time / batched_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
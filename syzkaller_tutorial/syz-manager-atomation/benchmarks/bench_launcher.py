@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Benchmark the launcher hot paths (ancestor search, commits_to_head,
+get_last_tag, patch creation, check_repro_package) and whole launches of
+main() on synthetic repositories, and compare the timings with the baselines
+stored in baselines.json. Exits with status 1 if a benchmark regressed.
+
+Timings are scaled by a calibration (the time of a trivial git command) so
+that baselines recorded on one machine stay meaningful on another. Runs
+offline; everything is generated locally.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import SCRIPT_PATH, make_launch_env
+
+from invoke_syz_manager import artifacts, constants, errors, history
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines.json"
+CALIBRATION_RUNS = 20
+
+
+def measure(fn, repeat: int) -> float:
+    """
+    Return the median duration of repeat calls of fn, after a warmup call.
+    """
+    fn()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def calibrate(repo: Path) -> float:
+    return measure(
+        lambda: subprocess.run(
+            ["git", "-C", str(repo), "rev-parse", "HEAD"], stdout=subprocess.DEVNULL
+        ),
+        CALIBRATION_RUNS,
+    )
+
+
+def quiet(fn, *args):
+    """
+    Return a function calling fn(*args) with its stdout discarded.
+    """
+
+    def call():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn(*args)
+
+    return call
+
+
+def expect_error(error, fn, *args):
+    def call():
+        try:
+            fn(*args)
+        except error:
+            return
+        raise SystemExit(f"[error] {fn.__name__} did not raise {error.__name__}")
+
+    return call
+
+
+def launch(root: Path, env: dict[str, Path], work_name: str, *extra: str):
+    """
+    Run the launcher end to end; the syz-manager it execs only prints.
+    """
+    subprocess.run(
+        [
+            sys.executable,
+            str(SCRIPT_PATH),
+            "--linux-src",
+            str(env["linux"]),
+            "--syzkaller-src",
+            str(env["syzkaller"]),
+            "--cfg-template",
+            str(env["cfg_template"]),
+            "--work-name",
+            work_name,
+            "--non-interactive",
+            *extra,
+        ],
+        cwd=root,
+        env={**os.environ, "XDG_CACHE_HOME": str(root / "cache")},
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+
+
+def run_benchmarks(root: Path, env: dict[str, Path], repeat: int) -> dict[str, float]:
+    linux, syzkaller = env["linux"], env["syzkaller"]
+    linux_info = history.get_linux_history_info(linux)
+    linux_tag = history.get_last_tag(linux)
+    results = {}
+
+    def bench(name, fn):
+        results[name] = measure(fn, repeat)
+        print(f"  {name:<32} {results[name] * 1000:9.1f} ms", flush=True)
+
+    bench("get_closest_upstream_ancestor", lambda: history.get_closest_upstream_ancestor(syzkaller))
+    bench("get_last_tag", lambda: history.get_last_tag(linux))
+    bench("commits_to_head", lambda: history.commits_to_head(linux, linux_tag["commit_hash"]))
+    bench("get_linux_history_info", lambda: history.get_linux_history_info(linux))
+    bench("get_syzkaller_history_info", lambda: history.get_syzkaller_history_info(syzkaller))
+    bench(
+        "create_patch_from_info",
+        quiet(history.create_patch_from_info, linux_info, root / "bench.patch", linux),
+    )
+
+    # A package created by a real launch, validated against its own contents
+    # (the common relaunch path) and against a .config with one changed option
+    launch(root, env, "package", "--no-cache")
+    repro_dir = root / "package" / constants.REPRO_PACKAGE_DIRNAME
+    expected_files = {
+        repro_dir / name: (repro_dir / name).read_text()
+        for name in [
+            constants.REAL_CFG_FILENAME,
+            constants.LINUX_CONFIG_FILENAME,
+            constants.LINUX_COMMIT_FILENAME,
+            constants.SYZKALLER_COMMIT_FILENAME,
+        ]
+    }
+    bench("check_repro_package", quiet(artifacts.check_repro_package, repro_dir, expected_files))
+    stale_files = dict(expected_files)
+    config_path = repro_dir / constants.LINUX_CONFIG_FILENAME
+    stale_files[config_path] = stale_files[config_path].replace(
+        "CONFIG_BENCH_1=y", "# CONFIG_BENCH_1 is not set", 1
+    )
+    bench(
+        "check_repro_package_stale",
+        quiet(expect_error(errors.ReproductionError, artifacts.check_repro_package, repro_dir, stale_files)),
+    )
+
+    runs = iter(range(1_000_000))
+    bench("main_create", lambda: launch(root, env, f"create_{next(runs)}", "--no-cache"))
+    bench("main_create_cached", lambda: launch(root, env, f"cached_{next(runs)}"))
+    bench("main_existing", lambda: launch(root, env, "package", "--no-cache"))
+    return results
+
+
+def compare(results: dict[str, float], calibration: float, baseline: dict, tolerance: float, min_delta: float) -> bool:
+    """
+    Print each timing next to its baseline scaled to this machine, and return
+    whether any is more than tolerance (relative) and min_delta (seconds)
+    slower.
+    """
+    scale = calibration / baseline["calibration"]
+    regressed = False
+    print(f"{'benchmark':<32} {'time':>9} {'baseline':>9}  ratio")
+    for name, duration in results.items():
+        if name not in baseline["benchmarks"]:
+            print(f"{name:<32} {duration * 1000:7.1f}ms {'-':>9}  (no baseline)")
+            continue
+        expected = baseline["benchmarks"][name] * scale
+        ratio = duration / expected
+        slow = ratio > 1 + tolerance and duration - expected > min_delta
+        regressed |= slow
+        print(
+            f"{name:<32} {duration * 1000:7.1f}ms {expected * 1000:7.1f}ms  {ratio:5.2f}x"
+            + ("  REGRESSION" if slow else "")
+        )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--history", type=int, default=2000)
+    parser.add_argument("--branches", type=int, default=300)
+    parser.add_argument("--unpushed", type=int, default=20)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--config-lines", type=int, default=10000)
+    parser.add_argument("--patch-lines", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store the timings as the new baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="Fail when a benchmark is this much slower than its baseline (default: 0.5, i.e. 1.5x)",
+    )
+    parser.add_argument(
+        "--min-delta",
+        type=float,
+        default=0.005,
+        help="Ignore slowdowns of less than this many seconds (default: 0.005)",
+    )
+    args = parser.parse_args()
+    profile = {
+        "history": args.history,
+        "branches": args.branches,
+        "unpushed": args.unpushed,
+        "tags": args.tags,
+        "config_lines": args.config_lines,
+        "patch_lines": args.patch_lines,
+    }
+
+    baseline = None
+    if not args.update_baseline:
+        if not args.baseline.exists():
+            raise SystemExit(f"[error] no baseline at {args.baseline}, run with --update-baseline")
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["profile"] != profile:
+            raise SystemExit(
+                f"[error] {args.baseline} was recorded with {baseline['profile']}; "
+                "use the same sizes or --update-baseline"
+            )
+
+    print(" ".join(f"{key}={value}" for key, value in profile.items()))
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        env = make_launch_env(root, **profile)
+        calibration = calibrate(env["linux"])
+        print(f"  {'calibration (git rev-parse)':<32} {calibration * 1000:9.1f} ms", flush=True)
+        results = run_benchmarks(root, env, args.repeat)
+
+    if args.update_baseline:
+        args.baseline.write_text(
+            json.dumps(
+                {"profile": profile, "calibration": calibration, "benchmarks": results},
+                indent=4,
+            )
+            + "\n"
+        )
+        print(f"[baseline] wrote {args.baseline}")
+        return 0
+
+    if compare(results, calibration, baseline, args.tolerance, args.min_delta):
+        print("[error] benchmarks regressed")
+        return 1
+    print("[ok] no regression")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
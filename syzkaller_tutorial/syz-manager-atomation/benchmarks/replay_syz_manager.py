@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Fake syz-manager that replays a recorded syz-manager log, for exercising the
+supervisor and the watchdog without VMs. Install it as bin/syz-manager of a
+syzkaller tree and point REPLAY_LOG at the log to replay.
+
+Crash lines whose title matches one of the ignores of the cfg passed with
+-config are dropped, as syz-manager would not report them. REPLAY_DELAY is
+the delay in seconds between lines (default: 0).
+"""
+import argparse
+import json
+import os
+import re
+import signal
+import sys
+import time
+
+CRASH_LINE_RE = re.compile(r"^\S+ \S+ VM \d+: crash(?:\(\w+\))?: (.*?)\s*$")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-config", required=True)
+    parser.add_argument("-vv", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        ignores = [re.compile(pattern) for pattern in json.load(f).get("ignores", [])]
+    delay = float(os.environ.get("REPLAY_DELAY", "0"))
+    signal.signal(signal.SIGINT, lambda signum, frame: sys.exit(0))
+
+    with open(os.environ["REPLAY_LOG"], errors="replace") as log:
+        for line in log:
+            match = CRASH_LINE_RE.match(line)
+            if match and any(ignore.search(match.group(1)) for ignore in ignores):
+                continue
+            sys.stdout.write(line)
+            sys.stdout.flush()
+            if delay:
+                time.sleep(delay)
+
+
+if __name__ == "__main__":
+    main()
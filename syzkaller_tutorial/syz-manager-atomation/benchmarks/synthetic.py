@@ -0,0 +1,159 @@
+"""
+Helpers to generate synthetic git repositories for the launcher benchmarks.
+Everything is created locally with git fast-import, no network access needed.
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPT_PATH = Path(__file__).resolve().parent.parent / "invoke-syz-manager.py"
+
+# Make the invoke_syz_manager package next to the script importable
+if str(SCRIPT_PATH.parent) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_PATH.parent))
+
+
+def git(repo: Path, *args: str, input: str | None = None) -> str:
+    return subprocess.check_output(
+        ["git", "-C", str(repo), *args], text=True, input=input
+    )
+
+
+def make_repo(
+    repo: Path,
+    history: int = 2000,
+    branches: int = 300,
+    unpushed: int = 20,
+    tags: int = 0,
+    patch_lines: int = 0,
+) -> None:
+    """
+    Create a repository with a linear history of `history` commits on `master`,
+    `branches` local branches tracking `origin/track_N` refs spread along that
+    history, `tags` tags, and a checked out `work` branch without upstream that
+    has `unpushed` commits on top of the history. Tags are annotated, like the
+    release tags `git describe` finds in Linux. The unpushed commits together
+    add about `patch_lines` lines, so that the patch from the ancestor is that
+    long.
+    """
+    repo.mkdir(parents=True)
+    git(repo, "init", "-q", "-b", "master")
+    git(repo, "remote", "add", "origin", "https://example.invalid/synthetic.git")
+
+    stream = []
+    mark = 0
+    for i in range(history + unpushed):
+        mark += 1
+        branch = "refs/heads/master" if i < history else "refs/heads/work"
+        content = f"commit {i}\n"
+        stream += [
+            f"commit {branch}",
+            f"mark :{mark}",
+            f"committer Bench <bench@example.invalid> {1600000000 + i} +0000",
+            f"data {len(f'change {i}')}",
+            f"change {i}",
+        ]
+        if i == history:
+            stream.append(f"from :{history}")
+        stream += [f"M 644 inline file_{i % 50}", f"data {len(content)}", content]
+        if i >= history and patch_lines:
+            source = "".join(
+                f"static int bench_{i}_{n}(void) {{ return {n}; }}\n"
+                for n in range(patch_lines // unpushed)
+            )
+            stream += [f"M 644 inline drivers/bench/bench_{i}.c", f"data {len(source)}", source]
+
+    step = max(1, history // max(1, branches))
+    for n in range(branches):
+        commit_mark = max(1, history - n * step)
+        stream += [f"reset refs/remotes/origin/track_{n}", f"from :{commit_mark}", ""]
+    for n in range(tags):
+        commit_mark = max(1, (n + 1) * history // (tags + 1))
+        message = f"Linux {n + 1}.0"
+        stream += [
+            f"tag v{n + 1}.0",
+            f"from :{commit_mark}",
+            f"tagger Bench <bench@example.invalid> {1600000000 + commit_mark} +0000",
+            f"data {len(message)}",
+            message,
+        ]
+    for n in range(branches):
+        stream += [f"reset refs/heads/track_{n}", f"from refs/remotes/origin/track_{n}", ""]
+
+    git(repo, "fast-import", "--quiet", input="\n".join(stream) + "\n")
+
+    with open(repo / ".git" / "config", "a") as f:
+        for n in range(branches):
+            f.write(
+                f'[branch "track_{n}"]\n'
+                "\tremote = origin\n"
+                f"\tmerge = refs/heads/track_{n}\n"
+            )
+    git(repo, "checkout", "-q", "work" if unpushed else "master")
+
+
+def make_kconfig(lines: int = 10000) -> str:
+    """
+    Return a Linux .config of about `lines` lines, mixing set, unset and valued
+    options like a real one.
+    """
+    out = ["#", "# Automatically generated file; DO NOT EDIT.", "#"]
+    for n in range(lines - len(out)):
+        if n % 3 == 0:
+            out.append(f"# CONFIG_BENCH_{n} is not set")
+        elif n % 7 == 0:
+            out.append(f'CONFIG_BENCH_{n}="value {n}"')
+        else:
+            out.append(f"CONFIG_BENCH_{n}=y")
+    return "\n".join(out) + "\n"
+
+
+def make_launch_env(
+    root: Path,
+    history: int = 2000,
+    branches: int = 300,
+    unpushed: int = 20,
+    tags: int = 50,
+    config_lines: int = 10000,
+    patch_lines: int = 5000,
+) -> dict[str, Path]:
+    """
+    Create everything the launcher needs under root: a Linux repo with tags, a
+    .config and a bzImage, a syzkaller repo whose checked out branch has no
+    upstream and a bin/syz-manager that only prints its arguments, and a cfg
+    template. Both repos have `unpushed` commits adding `patch_lines` lines.
+    Return the paths by name ("linux", "syzkaller", "cfg_template").
+    """
+    linux = root / "linux"
+    syzkaller = root / "syzkaller"
+    make_repo(linux, history, branches=0, unpushed=unpushed, tags=tags, patch_lines=patch_lines)
+    make_repo(syzkaller, history, branches, unpushed, patch_lines=patch_lines)
+
+    (linux / ".config").write_text(make_kconfig(config_lines))
+    bzimage = linux / "arch" / "x86" / "boot" / "bzImage"
+    bzimage.parent.mkdir(parents=True)
+    bzimage.write_bytes(b"\0" * 4096)
+    syz_manager = syzkaller / "bin" / "syz-manager"
+    syz_manager.parent.mkdir()
+    syz_manager.write_text('#!/bin/sh\necho syz-manager "$@"\n')
+    syz_manager.chmod(0o755)
+
+    cfg_template = root / "bench.cfg"
+    cfg_template.write_text(
+        json.dumps(
+            {
+                "target": "linux/amd64",
+                "http": "127.0.0.1:56741",
+                "workdir": "",
+                "image": "bench.img",
+                "sshkey": "bench.id_rsa",
+                "syzkaller": "",
+                "procs": 4,
+                "type": "qemu",
+                "vm": {"count": 2, "kernel": "", "cpu": 2, "mem": 2048},
+            },
+            indent=4,
+        )
+    )
+    return {"linux": linux, "syzkaller": syzkaller, "cfg_template": cfg_template}
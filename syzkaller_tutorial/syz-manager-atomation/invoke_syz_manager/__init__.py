@@ -0,0 +1,5 @@
+"""
+Launch syz-manager from a work tree with a reproduction package recording the
+Linux and syzkaller trees it was started from. The command line lives in
+invoke_syz_manager.cli and is run by invoke-syz-manager.py.
+"""
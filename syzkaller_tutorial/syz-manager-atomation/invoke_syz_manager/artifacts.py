@@ -0,0 +1,340 @@
+"""
+The files of a reproduction package and their checks against the current
+trees.
+"""
+
+import gzip
+import hashlib
+import json
+from pathlib import Path
+import difflib
+
+from .constants import (
+    ARTIFACT_STORE_OBJECTS_DIRNAME,
+    CORPUS_FILENAME,
+    HASH_CHUNK_SIZE,
+    LINUX_CONFIG_FILENAME,
+    MANIFEST_FILENAME,
+    PLAIN_ARTIFACT_FILENAMES,
+    REPRO_PACKAGE_DIRNAME,
+    STORED_ARTIFACT_SUFFIX,
+)
+from .errors import ReproductionError
+from .files import link_or_copy, write_file_atomically
+from .snapshots import recover_stranded_corpus
+from .tracing import traced
+
+
+def color_diff_line(line: str) -> str:
+    if line.startswith("+") and not line.startswith("+++"):
+        return f"\033[32m{line}\033[0m"  # Green
+    elif line.startswith("-") and not line.startswith("---"):
+        return f"\033[31m{line}\033[0m"  # Red
+    elif line.startswith("@"):
+        return f"\033[36m{line}\033[0m"  # Cyan
+    else:
+        return line
+
+
+def get_existing_work_dir(work_dir: Path) -> tuple[Path, Path]:
+    repro_dir = work_dir / REPRO_PACKAGE_DIRNAME
+    corpus_db = work_dir / CORPUS_FILENAME
+
+    if not repro_dir.exists():
+        repro_dir = None
+        print(
+            f"[warning]: Directory with name {work_dir} already exists but reproduction package is missing."
+        )
+        print(
+            f"[warning]: This will create the syzkaller files along the existing contents of {work_dir}."
+        )
+
+    recover_stranded_corpus(work_dir)
+    if not corpus_db.exists():
+        corpus_db = None
+
+    return repro_dir, corpus_db
+
+
+def store_artifact(artifact_store: Path, fpath: Path, content: bytes) -> Path:
+    """
+    Write content into the content-addressed artifact store, compressed, unless
+    it is already there, and link it into place next to fpath. Returns the path
+    of the linked artifact, which is fpath with the stored artifact suffix.
+    """
+    sha256 = hashlib.sha256(content).hexdigest()
+    obj = (
+        artifact_store
+        / ARTIFACT_STORE_OBJECTS_DIRNAME
+        / sha256[:2]
+        / f"{sha256[2:]}{STORED_ARTIFACT_SUFFIX}"
+    )
+    if not obj.exists():
+        write_file_atomically(obj, gzip.compress(content, compresslevel=6, mtime=0))
+
+    stored_path = fpath.with_name(fpath.name + STORED_ARTIFACT_SUFFIX)
+    stored_path.unlink(missing_ok=True)
+    link_or_copy(obj, stored_path)
+    return stored_path
+
+
+def write_artifact(fpath: Path, content: bytes, artifact_store: Path | None = None):
+    """
+    Write a reproduction artifact, through the artifact store if one is used,
+    except for the PLAIN_ARTIFACT_FILENAMES.
+    """
+    if artifact_store is None or fpath.name in PLAIN_ARTIFACT_FILENAMES:
+        fpath.write_bytes(content)
+    else:
+        store_artifact(artifact_store, fpath, content)
+
+
+def find_artifact(fpath: Path) -> Path | None:
+    """
+    Return the path of an artifact as a plain file or as a stored artifact,
+    or None if it is missing.
+    """
+    if fpath.exists():
+        return fpath
+    stored_path = fpath.with_name(fpath.name + STORED_ARTIFACT_SUFFIX)
+    if stored_path.exists():
+        return stored_path
+    return None
+
+
+def open_artifact(path: Path):
+    if path.name.endswith(STORED_ARTIFACT_SUFFIX):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def read_artifact_text(path: Path) -> str:
+    with open_artifact(path) as f:
+        return f.read().decode()
+
+
+def hash_file(path: Path) -> tuple[str, int]:
+    """
+    Return the SHA-256 hex digest and size of a file, reading it in chunks.
+    Stored artifacts are hashed on their decompressed contents.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open_artifact(path) as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def file_matches(path: Path, sha256: str, size: int) -> bool:
+    """
+    Return whether a file has the given digest, without hashing it if the size differs.
+    """
+    if not path.name.endswith(STORED_ARTIFACT_SUFFIX) and path.stat().st_size != size:
+        return False
+    return hash_file(path)[0] == sha256
+
+
+def write_manifest(repro_dir: Path):
+    """
+    Write the SHA-256 and size of every artifact in repro_dir, patches included.
+    Stored artifacts are listed under their plain name.
+    """
+    manifest = {}
+    for fpath in sorted(repro_dir.iterdir()):
+        if fpath.name == MANIFEST_FILENAME or not fpath.is_file():
+            continue
+        sha256, size = hash_file(fpath)
+        manifest[fpath.name.removesuffix(STORED_ARTIFACT_SUFFIX)] = {
+            "sha256": sha256,
+            "size": size,
+        }
+
+    manifest_path = repro_dir / MANIFEST_FILENAME
+    manifest_path.write_text(json.dumps(manifest, indent=4))
+    print(f"[write] {manifest_path} ({len(manifest)} artifacts)")
+
+
+def parse_kconfig(text: str) -> dict[str, str]:
+    """
+    Parse a Linux .config into a {symbol: value} dict in a single pass.
+    `# CONFIG_X is not set` lines are parsed as the value "n".
+    """
+    symbols = {}
+    for line in text.splitlines():
+        if line.startswith("CONFIG_"):
+            symbol, sep, value = line.partition("=")
+            if sep:
+                symbols[symbol] = value
+        elif line.startswith("# CONFIG_") and line.endswith(" is not set"):
+            symbols[line[2:-11]] = "n"
+    return symbols
+
+
+def diff_kconfig(
+    expected: dict[str, str], actual: dict[str, str]
+) -> tuple[dict[str, str], dict[str, str], dict[str, tuple[str, str]]]:
+    """
+    Return the (added, removed, changed) symbols between two parsed .configs.
+    A missing symbol is equivalent to `is not set`, so symbols that only move
+    between the two are not reported.
+    """
+    added = {}
+    removed = {}
+    changed = {}
+    for symbol, value in actual.items():
+        old_value = expected.get(symbol, "n")
+        if value == old_value:
+            continue
+        if old_value == "n":
+            added[symbol] = value
+        elif value == "n":
+            removed[symbol] = old_value
+        else:
+            changed[symbol] = (old_value, value)
+    for symbol, old_value in expected.items():
+        if symbol not in actual and old_value != "n":
+            removed[symbol] = old_value
+    return added, removed, changed
+
+
+@traced
+def describe_kconfig_mismatch(fpath: Path, expected_content: str) -> str:
+    """
+    Return an error message listing the .config symbols that differ.
+    """
+    MAX_CONFIG_DIFF_SYMBOLS = 100
+
+    added, removed, changed = diff_kconfig(
+        parse_kconfig(expected_content), parse_kconfig(read_artifact_text(fpath))
+    )
+    if not (added or removed or changed):
+        return f"File {fpath} differs from expected contents only in comments, ordering or unset symbols."
+
+    # Options whose value changed are listed first, they are the most likely
+    # to be relevant to a campaign.
+    diff = [
+        f"~{symbol}: {old_value} -> {value}"
+        for symbol, (old_value, value) in sorted(changed.items())
+    ]
+    diff += [f"+{symbol}={value}" for symbol, value in sorted(added.items())]
+    diff += [f"-{symbol}={value}" for symbol, value in sorted(removed.items())]
+    if len(diff) > MAX_CONFIG_DIFF_SYMBOLS:
+        diff = diff[:MAX_CONFIG_DIFF_SYMBOLS] + [
+            f"... and {len(diff) - MAX_CONFIG_DIFF_SYMBOLS} more"
+        ]
+
+    diff_str = "\n".join(color_diff_line(l) for l in diff)
+    return (
+        f"File {fpath} differs from expected contents ({len(changed)} changed, "
+        f"{len(added)} added, {len(removed)} removed options). Diff:\n{diff_str}\n"
+    )
+
+
+@traced
+def describe_mismatch(fpath: Path, expected_content: str) -> str:
+    """
+    Return an error message with a diff between a file and its expected contents.
+    """
+    if fpath.name.removesuffix(STORED_ARTIFACT_SUFFIX) == LINUX_CONFIG_FILENAME:
+        return describe_kconfig_mismatch(fpath, expected_content)
+
+    diff = difflib.unified_diff(
+        expected_content.splitlines(),
+        read_artifact_text(fpath).splitlines(),
+        fromfile="expected",
+        tofile="actual",
+        lineterm="",
+    )
+    diff_lines = [color_diff_line(l) for l in diff]
+    diff_str = "\n".join(diff_lines)
+    return f"File {fpath} differs from expected contents. Diff:\n{diff_str}\n"
+
+
+def find_stale_artifacts(
+    repro_dir: Path, expected_digests: dict[Path, tuple[str, int]]
+) -> list[tuple[Path, Path | None, bool]]:
+    """
+    Return (path, artifact, from_manifest) for each artifact of the package
+    that is missing (artifact is None) or does not match: the expected_digests
+    (SHA-256 and size of the expected contents), and for the other artifacts
+    (the patches) the package manifest, if it has one.
+    """
+    stale = []
+    for fpath, (sha256, size) in expected_digests.items():
+        artifact = find_artifact(fpath)
+        if artifact is None or not file_matches(artifact, sha256, size):
+            stale.append((fpath, artifact, False))
+
+    manifest_path = repro_dir / MANIFEST_FILENAME
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+        for name, entry in manifest.items():
+            fpath = repro_dir / name
+            if fpath in expected_digests:
+                continue
+            artifact = find_artifact(fpath)
+            if artifact is None or not file_matches(artifact, entry["sha256"], entry["size"]):
+                stale.append((fpath, artifact, True))
+    return stale
+
+
+def check_repro_package(repro_dir: Path, expected_files: dict[Path, str]):
+    """
+    Check if the working tree exists and validate reproduction package contents.
+
+    Files are compared by size and streamed SHA-256, and only mismatching files
+    are read whole to be diffed. Artifacts that have no expected contents (the
+    patches) are checked against the package manifest, if it has one: they are
+    determined by the commits recorded in the commit files, which are checked
+    against the repos.
+    """
+    expected_digests = {}
+    for fpath, expected_content in expected_files.items():
+        expected_bytes = expected_content.encode()
+        expected_digests[fpath] = (
+            hashlib.sha256(expected_bytes).hexdigest(),
+            len(expected_bytes),
+        )
+
+    errors = []
+    manifest_path = repro_dir / MANIFEST_FILENAME
+    for fpath, artifact, from_manifest in find_stale_artifacts(repro_dir, expected_digests):
+        if not from_manifest:
+            if artifact is None:
+                errors.append(
+                    f"Expected reproduction file {fpath} in existing {repro_dir}, but it was missing."
+                )
+            else:
+                errors.append(describe_mismatch(artifact, expected_files[fpath]))
+        elif artifact is None:
+            errors.append(
+                f"Reproduction file {fpath} listed in {manifest_path} is missing."
+            )
+        else:
+            errors.append(
+                f"File {fpath} does not match its SHA-256 in {manifest_path}."
+            )
+
+    if errors:
+        raise ReproductionError("\n".join(errors))
+
+    print(f"[ok] Reproduction package {repro_dir} is valid.")
+
+
+@traced
+def write_repro_files(
+    repro_dir: Path, expected_files: dict[Path, str], artifact_store: Path | None = None
+):
+    """
+    Write reproduction package files into repro_dir.
+    """
+    for fpath, content in expected_files.items():
+        write_artifact(fpath, content.encode(), artifact_store)
+        print(f"[write] {fpath} ({len(content)} bytes)")
+    write_manifest(repro_dir)
+
+    print(
+        f"[ok] Working tree {repro_dir.parent} created with fresh reproduction package."
+    )
@@ -0,0 +1,164 @@
+"""
+On-disk caches under CACHE_DIR.
+"""
+
+import errno
+import fcntl
+import hashlib
+import os
+import shutil
+import json
+from pathlib import Path
+
+from .constants import (
+    BZIMAGE_FILENAME,
+    BZIMAGE_RELATIVE_PATH,
+    CACHE_LOCK_FILENAME,
+    INVOKE_SYZ_MANAGER_VERSION,
+    KERNEL_CACHE_DIRNAME,
+    LINUX_COMMIT_FILENAME,
+    PROVENANCE_CACHE_DIRNAME,
+    SYZKALLER_COMMIT_FILENAME,
+    VMLINUX_FILENAME,
+)
+from .errors import ConfigurationError
+from .files import clone_or_copy
+from .tracing import check_subprocess_output, traced
+
+
+def get_provenance_cache_entry(
+    cache_dir: Path, linux_fingerprint: str, syzkaller_fingerprint: str, linux_config: str
+) -> Path:
+    """
+    Return the cache entry directory for the given repo fingerprints and .config.
+    """
+    digest = hashlib.sha256()
+    for part in (
+        INVOKE_SYZ_MANAGER_VERSION,
+        linux_fingerprint,
+        syzkaller_fingerprint,
+        hashlib.sha256(linux_config.encode()).hexdigest(),
+    ):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return cache_dir / PROVENANCE_CACHE_DIRNAME / digest.hexdigest()
+
+
+def read_cached_provenance(cache_entry: Path) -> tuple[dict, dict] | None:
+    """
+    Return the cached (linux, syzkaller) history info, or None on a cache miss.
+    """
+    try:
+        linux_history = json.loads((cache_entry / LINUX_COMMIT_FILENAME).read_text())
+        syzkaller_history = json.loads(
+            (cache_entry / SYZKALLER_COMMIT_FILENAME).read_text()
+        )
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    # Mark the entry as recently used for eviction
+    os.utime(cache_entry)
+    return linux_history, syzkaller_history
+
+
+@traced
+def evict_cache(entries_dir: Path, max_bytes: int):
+    """
+    Remove the least recently used entries of a cache until the cache fits
+    into max_bytes. Entries locked with lock_cache_entry are in use and kept.
+    """
+    if not entries_dir.exists():
+        return
+
+    entries = []
+    total = 0
+    for entry in entries_dir.iterdir():
+        if not entry.is_dir() or entry.name.startswith("."):
+            continue
+        size = sum(f.stat().st_size for f in entry.iterdir())
+        entries.append((entry.stat().st_mtime, size, entry))
+        total += size
+
+    for _, size, entry in sorted(entries):
+        if total <= max_bytes:
+            break
+        lock_path = entry / CACHE_LOCK_FILENAME
+        if lock_path.exists():
+            with open(lock_path, "rb") as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                shutil.rmtree(entry, ignore_errors=True)
+        else:
+            shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+
+
+def lock_cache_entry(entry: Path):
+    """
+    Take a shared lock on a cache entry that protects it from eviction until
+    this process, and the syz-manager it is replaced with or runs, exit.
+    """
+    fd = os.open(entry / CACHE_LOCK_FILENAME, os.O_RDONLY | os.O_CREAT, 0o644)
+    fcntl.flock(fd, fcntl.LOCK_SH)
+    os.set_inheritable(fd, True)
+
+
+def get_kernel_build_key(linux_src: Path) -> str:
+    """
+    Return a hash of what a kernel build depends on: HEAD, the .config and the
+    uncommitted changes of the Linux tree.
+    """
+    digest = hashlib.sha256()
+    for part in (
+        check_subprocess_output(["git", "-C", str(linux_src), "rev-parse", "HEAD"]),
+        (linux_src / ".config").read_bytes(),
+        check_subprocess_output(["git", "-C", str(linux_src), "diff", "HEAD", "--binary"]),
+    ):
+        digest.update(hashlib.sha256(part).digest())
+    return digest.hexdigest()
+
+
+def snapshot_kernel(linux_src: Path, cache_dir: Path) -> Path:
+    """
+    Return the kernel cache entry holding the bzImage, and vmlinux if it was
+    built, of the current Linux build. On a miss they are copied (reflinked
+    where possible) out of the build tree, which the next build overwrites.
+    The entry is locked against eviction while it is in use.
+    """
+    entries_dir = cache_dir / KERNEL_CACHE_DIRNAME
+    entry = entries_dir / get_kernel_build_key(linux_src)
+    if entry.exists():
+        os.utime(entry)
+        print(f"[kernel-cache] using cached kernel build {entry}")
+        lock_cache_entry(entry)
+        return entry
+
+    bzimage = linux_src
+    for part in BZIMAGE_RELATIVE_PATH:
+        bzimage = bzimage / part
+    if not bzimage.exists():
+        raise ConfigurationError(f"Expected kernel image at {bzimage}, but it was missing. Forgot to compile?")
+    if bzimage.stat().st_mtime < (linux_src / ".config").stat().st_mtime:
+        print(f"[warning] {bzimage} is older than {linux_src / '.config'}, was the kernel rebuilt?")
+
+    entries_dir.mkdir(parents=True, exist_ok=True)
+    tmp_entry = entries_dir / f".{entry.name}.{os.getpid()}.tmp"
+    tmp_entry.mkdir()
+    try:
+        clone_or_copy(bzimage, tmp_entry / BZIMAGE_FILENAME)
+        if (linux_src / VMLINUX_FILENAME).exists():
+            clone_or_copy(linux_src / VMLINUX_FILENAME, tmp_entry / VMLINUX_FILENAME)
+        else:
+            print(f"[warning] no {linux_src / VMLINUX_FILENAME}, crash reports will not be symbolized")
+        try:
+            tmp_entry.rename(entry)
+        except OSError as e:
+            # Another launcher cached the same build first
+            if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                raise
+    finally:
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+    print(f"[kernel-cache] cached kernel build in {entry}")
+    lock_cache_entry(entry)
+    return entry
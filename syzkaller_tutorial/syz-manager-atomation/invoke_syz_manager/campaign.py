@@ -0,0 +1,264 @@
+"""
+Running several work trees at once within the CPU and memory of the host.
+"""
+
+import argparse
+import os
+import sys
+import subprocess
+import json
+import signal
+import time
+from pathlib import Path
+
+from . import tracing
+from .config import load_source_paths
+from .constants import CACHE_DIR, FORWARDED_SIGNALS, LAUNCHER_PATH, RESERVATIONS_DIRNAME
+from .errors import ConfigurationError
+from .files import write_file_atomically
+from .tracing import start_trace
+
+
+def read_meminfo_mib(field: str) -> int:
+    with open("/proc/meminfo") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) // 1024
+    raise ConfigurationError(f"{field} not found in /proc/meminfo")
+
+
+def get_cfg_resources(cfg_template: Path) -> dict[str, int]:
+    """
+    Return the host cores and memory (MiB) that the VMs of a syzkaller cfg use,
+    with syzkaller's defaults for vm.cpu and vm.mem.
+    """
+    try:
+        cfg = json.loads(cfg_template.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        raise ConfigurationError(f"Invalid or missing syzkaller cfg template {cfg_template}")
+    vm = cfg.get("vm", {})
+    count = vm.get("count", 1)
+    return {
+        "vms": count,
+        "procs": cfg.get("procs", 1),
+        "cpus": count * vm.get("cpu", 1),
+        "mem": count * vm.get("mem", 1024),
+    }
+
+
+def reserve_resources(pid: int, work_name: str, resources: dict[str, int]) -> Path:
+    """
+    Record in CACHE_DIR that the launcher with the given pid holds the cores
+    and memory of resources, so that other campaigns and tuning runs on the
+    host leave them free. Returns the reservation file, to be removed when the
+    launcher exits; the reservation of a process that is gone is ignored.
+    """
+    path = CACHE_DIR / RESERVATIONS_DIRNAME / f"{pid}.json"
+    write_file_atomically(
+        path,
+        json.dumps(
+            {"work_name": work_name, "cpus": resources["cpus"], "mem": resources["mem"]}
+        ).encode(),
+    )
+    return path
+
+
+def get_reserved_resources(exclude_pids: set[int]) -> tuple[int, int]:
+    """
+    Return the cores and memory (MiB) reserved by the running launchers other
+    than exclude_pids. Reservations left behind by exited processes are removed.
+    """
+    cpus = mem = 0
+    for path in (CACHE_DIR / RESERVATIONS_DIRNAME).glob("*.json"):
+        if not path.stem.isdigit() or int(path.stem) in exclude_pids:
+            continue
+        try:
+            os.kill(int(path.stem), 0)
+        except ProcessLookupError:
+            path.unlink(missing_ok=True)
+            continue
+        except PermissionError:
+            pass  # alive, but owned by another user
+        try:
+            reservation = json.loads(path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        cpus += reservation["cpus"]
+        mem += reservation["mem"]
+    return cpus, mem
+
+
+def campaign_main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="invoke-syz-manager.py campaign",
+        description="Launch several work trees in parallel, as many at a time as the "
+        "host cores and memory allow given the vm.count, vm.cpu and vm.mem of their "
+        "cfgs, less what the runs of other campaigns on the host have reserved. The "
+        "other runs are queued and started as capacity frees up. Runs are "
+        "supervised and non-interactive; the launcher output of each run goes to "
+        "<work name>.launch.log.",
+    )
+    parser.add_argument(
+        "--run",
+        nargs=2,
+        action="append",
+        required=True,
+        metavar=("CFG_TEMPLATE", "WORK_NAME"),
+        help="A syzkaller cfg template and the work tree to launch it in (repeatable)",
+    )
+    parser.add_argument("--linux-src", help="Path to the Linux source tree")
+    parser.add_argument("--syzkaller-src", help="Path to the syzkaller source tree")
+    parser.add_argument(
+        "--config",
+        default="config.json",
+        help="Path to the configuration file (default: config.json)",
+    )
+    parser.add_argument(
+        "--max-cpus",
+        type=int,
+        help="Host cores available to the VMs (default: the cores this process may run on)",
+    )
+    parser.add_argument(
+        "--max-mem",
+        type=int,
+        help="Host memory in MiB available to the VMs (default: MemAvailable)",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Trace every run into <work name>.trace.json and write the campaign "
+        "scheduling merged with the traces of its runs to PATH",
+    )
+    parser.add_argument(
+        "launcher_args",
+        nargs=argparse.REMAINDER,
+        help="Extra launcher options passed to every run after '--'",
+    )
+    args = parser.parse_args(argv)
+    max_cpus = args.max_cpus if args.max_cpus is not None else len(os.sched_getaffinity(0))
+    max_mem = args.max_mem if args.max_mem is not None else read_meminfo_mib("MemAvailable")
+
+    linux_src, syzkaller_src, _ = load_source_paths(
+        args.linux_src, args.syzkaller_src, Path(args.config)
+    )
+    print(f"[info] using linux_src={linux_src} syzkaller_src={syzkaller_src}")
+    # Only the separator itself is dropped, a later '--' is meant for the runs
+    extra_args = args.launcher_args
+    if extra_args[:1] == ["--"]:
+        extra_args = extra_args[1:]
+    # Each run gets its own track of the campaign trace
+    run_tids = {work_name: tid for tid, (_, work_name) in enumerate(args.run, 1)}
+    if args.trace:
+        start_trace(Path(args.trace), "invoke-syz-manager.py campaign")
+        for work_name, tid in run_tids.items():
+            tracing.TRACER.metadata(tracing.TRACER.pid, tid, "thread_name", work_name)
+
+    queue = []
+    queued_at = time.perf_counter()
+    for cfg_template, work_name in args.run:
+        resources = get_cfg_resources(Path(cfg_template))
+        if resources["cpus"] > max_cpus or resources["mem"] > max_mem:
+            raise ConfigurationError(
+                f"{cfg_template} needs {resources['cpus']} cores and {resources['mem']} MiB, "
+                f"more than the {max_cpus} cores and {max_mem} MiB available."
+            )
+        queue.append((cfg_template, work_name, resources))
+
+    running = {}  # Popen -> (work name, resources, start, reservation file)
+    free_cpus, free_mem = max_cpus, max_mem
+    stopping = False
+    failed = 0
+
+    def forward(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for proc in running:
+            proc.send_signal(signum)
+
+    previous_handlers = {sig: signal.signal(sig, forward) for sig in FORWARDED_SIGNALS}
+    try:
+        while queue or running:
+            other_cpus, other_mem = get_reserved_resources({proc.pid for proc in running})
+            # Start every queued run that fits, in order
+            for item in list(queue):
+                cfg_template, work_name, resources = item
+                if (
+                    stopping
+                    or resources["cpus"] > free_cpus - other_cpus
+                    or resources["mem"] > free_mem - other_mem
+                ):
+                    continue
+                queue.remove(item)
+                cmd = [
+                    sys.executable,
+                    str(LAUNCHER_PATH),
+                    "--linux-src",
+                    str(linux_src),
+                    "--syzkaller-src",
+                    str(syzkaller_src),
+                    "--cfg-template",
+                    cfg_template,
+                    "--work-name",
+                    work_name,
+                    "--supervise",
+                    "--no-echo",
+                    "--non-interactive",
+                ] + extra_args
+                if tracing.TRACER is not None:
+                    cmd += ["--trace", f"{work_name}.trace.json"]
+                    tracing.TRACER.complete(
+                        "queued", "campaign", queued_at, tid=run_tids[work_name]
+                    )
+                launch_log = open(f"{work_name}.launch.log", "ab")
+                proc = subprocess.Popen(
+                    cmd,
+                    stdin=subprocess.DEVNULL,
+                    stdout=launch_log,
+                    stderr=subprocess.STDOUT,
+                    start_new_session=True,
+                )
+                launch_log.close()
+                reservation = reserve_resources(proc.pid, work_name, resources)
+                running[proc] = (work_name, resources, time.perf_counter(), reservation)
+                free_cpus -= resources["cpus"]
+                free_mem -= resources["mem"]
+                print(
+                    f"[start] {work_name}: {resources['vms']} VMs, {resources['cpus']} cores, "
+                    f"{resources['mem']} MiB, procs={resources['procs']} "
+                    f"({free_cpus} cores, {free_mem} MiB left, {len(queue)} queued)"
+                )
+
+            if stopping and queue:
+                print(f"[info] not starting {len(queue)} queued runs")
+                queue.clear()
+
+            time.sleep(1)
+            for proc in [proc for proc in running if proc.poll() is not None]:
+                work_name, resources, started, reservation = running.pop(proc)
+                reservation.unlink(missing_ok=True)
+                if tracing.TRACER is not None:
+                    tracing.TRACER.complete(
+                        work_name,
+                        "campaign",
+                        started,
+                        {"returncode": proc.returncode},
+                        tid=run_tids[work_name],
+                    )
+                free_cpus += resources["cpus"]
+                free_mem += resources["mem"]
+                failed += proc.returncode != 0
+                print(f"[exit] {work_name} exited with {proc.returncode}")
+    finally:
+        for sig, handler in previous_handlers.items():
+            signal.signal(sig, handler)
+        for _, _, _, reservation in running.values():
+            reservation.unlink(missing_ok=True)
+
+    if tracing.TRACER is not None:
+        for _, work_name in args.run:
+            try:
+                with open(f"{work_name}.trace.json") as f:
+                    tracing.TRACER.events.extend(json.load(f)["traceEvents"])
+            except (FileNotFoundError, json.JSONDecodeError, KeyError):
+                print(f"[warning] no trace for {work_name}")
+    return 1 if failed else 0
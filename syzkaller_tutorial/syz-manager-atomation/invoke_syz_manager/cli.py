@@ -0,0 +1,565 @@
+"""
+Command line entry points of invoke-syz-manager.py.
+"""
+
+import argparse
+import functools
+import sys
+import json
+import time
+from pathlib import Path
+
+from . import tracing
+from .artifacts import (
+    check_repro_package,
+    find_artifact,
+    get_existing_work_dir,
+    read_artifact_text,
+    write_repro_files,
+)
+from .cache import evict_cache, get_provenance_cache_entry, read_cached_provenance
+from .campaign import campaign_main
+from .config import confirm_paths, copy_and_modify_cfg, get_linux_config, load_source_paths
+from .constants import (
+    CACHE_DIR,
+    COVERAGE_DIRNAME,
+    KERNEL_CACHE_DIRNAME,
+    KERNEL_CACHE_MAX_BYTES,
+    LINUX_COMMIT_FILENAME,
+    LINUX_CONFIG_FILENAME,
+    LINUX_DIFF_FILENAME,
+    LOG_CATEGORY_LEVELS,
+    NDJSON_DEFAULT_LEVEL,
+    NDJSON_DEFAULT_RETAIN,
+    NDJSON_SUFFIX,
+    PROVENANCE_CACHE_DIRNAME,
+    PROVENANCE_CACHE_MAX_BYTES,
+    REAL_CFG_FILENAME,
+    REPRO_PACKAGE_DIRNAME,
+    SYZKALLER_COMMIT_FILENAME,
+    SYZKALLER_DIFF_FILENAME,
+    SYZ_MANAGER_LOG_FILENAME,
+    TUNING_RESULTS_FILENAME,
+)
+from .corpus import corpus_main, handle_existing_corpus, warm_start_corpus
+from .coverage import coverage_main, fork_coverage_snapshots, start_coverage_snapshots
+from .crashes import crashes_main
+from .dashboard import dashboard_main
+from .errors import ConfigurationError
+from .files import write_file_atomically
+from .history import (
+    create_patch_from_info,
+    get_linux_history_info,
+    get_repo_fingerprint,
+    get_syzkaller_history_info,
+)
+from .launch import run_syz_manager, watch_syz_manager
+from .log_index import index_main
+from .ndjson import NdjsonLogSink, ndjson_main, parse_retain
+from .report import report_main
+from .restore import restore_main
+from .snapshots import fork_main, snapshot_main
+from .stats import stats_main
+from .status import status_main
+from .symbols import focus_cfg, symbols_main
+from .tracing import print_timing_summary, run_concurrently, start_trace
+from .tuning import tune_cfg, write_tuned_template
+from .watchdog import Watchdog, apply_watchdog_ignores
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Automate execution of syz-manager with a reproducible working tree.",
+        epilog="Other commands: " + ", ".join(SUBCOMMANDS)
+        + " (run '<command> --help' for their options)",
+    )
+    parser.add_argument(
+        "--linux-src", help="Path to the Linux source tree (overrides config file)"
+    )
+    parser.add_argument(
+        "--cfg-template", required=True, help="Path to the syzkaller .cfg template"
+    )
+    parser.add_argument(
+        "--syzkaller-src",
+        help="Path to the syzkaller source tree (overrides config file)",
+    )
+    parser.add_argument(
+        "--work-name", required=True, help="Name to use for the working tree"
+    )
+    parser.add_argument(
+        "--config",
+        default="config.json",
+        help="Path to the configuration file (default: config.json)",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbosity",
+        type=int,
+        default=10,
+        help="syzkaller verbosity level (default max)",
+    )
+    parser.add_argument(
+        "--supervise",
+        action="store_true",
+        help="Run syz-manager as a child process and write its log from Python "
+        "instead of replacing this process with a bash/tee pipeline",
+    )
+    parser.add_argument(
+        "--log-max-bytes",
+        type=int,
+        default=256 * 1024 * 1024,
+        help="In supervise mode, rotate the log when it grows past this size, 0 to disable "
+        "(default 256 MiB)",
+    )
+    parser.add_argument(
+        "--compress-logs",
+        action="store_true",
+        help="In supervise mode, gzip rotated log segments",
+    )
+    parser.add_argument(
+        "--no-echo",
+        action="store_true",
+        help="In supervise mode, only write the syz-manager output to its log",
+    )
+    parser.add_argument(
+        "--non-interactive",
+        action="store_true",
+        help="Do not ask for confirmation: use the configured source paths and "
+        "continue fuzzing from an existing corpus",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Write a Chrome trace-event JSON (chrome://tracing, ui.perfetto.dev) of "
+        "the phases and subprocesses of the launcher to PATH, and in supervise or "
+        "watchdog mode of the syz-manager startup (VM boots, seed loading, coverage "
+        "init)",
+    )
+    parser.add_argument(
+        "--tune",
+        action="store_true",
+        help="Before creating the work tree, run short trials of cfg variants and "
+        "launch the one with the highest exec/sec. Relaunches of a tuned work tree "
+        "use the same variant of the template, with or without --tune",
+    )
+    parser.add_argument(
+        "--tune-procs", help="Comma-separated procs values to try (default: x0.5, x1, x2)"
+    )
+    parser.add_argument("--tune-vm-count", help="Comma-separated vm.count values to try")
+    parser.add_argument("--tune-vm-cpu", help="Comma-separated vm.cpu values to try")
+    parser.add_argument("--tune-vm-mem", help="Comma-separated vm.mem values to try")
+    parser.add_argument(
+        "--tune-seconds",
+        type=int,
+        default=600,
+        help="Duration of each tuning trial in seconds (default: 600)",
+    )
+    parser.add_argument(
+        "--tune-warmup",
+        type=int,
+        default=120,
+        help="Seconds at the start of a trial not counted in its exec/sec (default: 120)",
+    )
+    parser.add_argument(
+        "--kernel-cache",
+        action="store_true",
+        help="Snapshot bzImage and vmlinux into a cache keyed by the Linux HEAD, "
+        ".config and uncommitted changes, and point the cfg at the cached copy",
+    )
+    parser.add_argument(
+        "--kernel-cache-max-bytes",
+        type=int,
+        default=KERNEL_CACHE_MAX_BYTES,
+        help="Disk budget of the kernel cache, least recently used builds are "
+        f"evicted first (default: {KERNEL_CACHE_MAX_BYTES})",
+    )
+    parser.add_argument(
+        "--cover-function",
+        action="append",
+        default=[],
+        help="Restrict coverage to the kernel functions matching this glob, expanded "
+        "against the vmlinux or System.map symbols (repeatable)",
+    )
+    parser.add_argument(
+        "--cover-file",
+        action="append",
+        default=[],
+        help="Restrict coverage to the Linux source files matching this glob (repeatable)",
+    )
+    parser.add_argument(
+        "--enable-syscall",
+        action="append",
+        default=[],
+        help="Enable only the syscalls matching this glob, e.g. 'ioctl$FIDEDUPE*', "
+        "expanded against syzkaller's descriptions (repeatable)",
+    )
+    parser.add_argument(
+        "--merge-corpora",
+        action="store_true",
+        help="Warm-start from the programs of the corpus.db files of the previous "
+        "runs, merged into the work dir corpus.db with each program kept once",
+    )
+    parser.add_argument(
+        "--ndjson",
+        action="store_true",
+        help="Also write the syz-manager output as per-category NDJSON streams "
+        f"(<log stem>.<category>{NDJSON_SUFFIX}: "
+        + ", ".join(LOG_CATEGORY_LEVELS)
+        + ") next to the log (requires --supervise or --watchdog)",
+    )
+    parser.add_argument(
+        "--ndjson-level",
+        type=int,
+        default=NDJSON_DEFAULT_LEVEL,
+        help="Only write the NDJSON categories up to this level: 0 stats and crashes, "
+        "1 VM lifecycle and other manager messages, 2 corpus and ssh, 3 signal, "
+        f"seed and module lines (default: {NDJSON_DEFAULT_LEVEL})",
+    )
+    parser.add_argument(
+        "--ndjson-retain",
+        action="append",
+        default=[],
+        metavar="CATEGORY=BYTES",
+        help="Rotate the NDJSON stream of a category to .1 past this size, 0 to never "
+        "rotate (repeatable; default: "
+        + ", ".join(f"{c}={b}" for c, b in NDJSON_DEFAULT_RETAIN.items())
+        + ")",
+    )
+    parser.add_argument(
+        "--coverage-interval",
+        type=int,
+        default=0,
+        help="Save a snapshot of the syz-manager coverage, fetched from the http "
+        f"endpoint of the cfg, into <work dir>/{COVERAGE_DIRNAME} every this many "
+        "seconds. Without --supervise or --watchdog, snapshots are taken by a "
+        "forked helper process that exits with syz-manager",
+    )
+    parser.add_argument(
+        "--watchdog",
+        action="store_true",
+        help="Supervise syz-manager and restart it on a crash storm, ignoring the "
+        "storming crash title, or on an exec/sec collapse (implies --supervise)",
+    )
+    parser.add_argument(
+        "--storm-window",
+        type=int,
+        default=3600,
+        help="Crash storm window in seconds of log time (default: 3600)",
+    )
+    parser.add_argument(
+        "--storm-threshold",
+        type=int,
+        default=10,
+        help="Reports of one crash title within the window that make a crash storm "
+        "(default: 10)",
+    )
+    parser.add_argument(
+        "--collapse-window",
+        type=int,
+        default=1800,
+        help="Window over which exec/sec is measured, in seconds of log time "
+        "(default: 1800)",
+    )
+    parser.add_argument(
+        "--collapse-ratio",
+        type=float,
+        default=0.25,
+        help="Fraction of the peak exec/sec below which throughput has collapsed "
+        "(default: 0.25)",
+    )
+    parser.add_argument(
+        "--max-restarts",
+        type=int,
+        default=5,
+        help="Maximum number of watchdog restarts (default: 5)",
+    )
+    parser.add_argument(
+        "--artifact-store",
+        help="Shared directory where reproduction artifacts are stored once, compressed, "
+        "and linked into each repro_package as <name>.gz (syzkaller.cfg and .config "
+        "stay plain)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Do not read or write the provenance cache in {CACHE_DIR}",
+    )
+    return parser.parse_args()
+
+
+SUBCOMMANDS = {
+    "stats": stats_main,
+    "crashes": crashes_main,
+    "index": index_main,
+    "campaign": campaign_main,
+    "corpus": corpus_main,
+    "coverage": coverage_main,
+    "report": report_main,
+    "symbols": symbols_main,
+    "restore": restore_main,
+    "status": status_main,
+    "ndjson": ndjson_main,
+    "snapshot": snapshot_main,
+    "fork": fork_main,
+    "dashboard": dashboard_main,
+}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        return SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+
+    args = parse_args()
+    new_ndjson_sink = None
+    if args.ndjson:
+        if not (args.supervise or args.watchdog):
+            raise ConfigurationError("--ndjson requires --supervise or --watchdog")
+        new_ndjson_sink = functools.partial(
+            NdjsonLogSink, level=args.ndjson_level, retain=parse_retain(args.ndjson_retain)
+        )
+    if args.trace:
+        start_trace(Path(args.trace), f"invoke-syz-manager.py {args.work_name}")
+
+    linux_src, syzkaller_src, config = load_source_paths(
+        args.linux_src, args.syzkaller_src, Path(args.config)
+    )
+    if config is not None:
+        if args.non_interactive:
+            print(f"[info] using linux_src={linux_src} syzkaller_src={syzkaller_src}")
+        elif not confirm_paths(config):
+            print("Operation cancelled by user")
+            sys.exit(0)
+
+    work_dir = Path(args.work_name).resolve()
+    artifact_store = (
+        Path(args.artifact_store).resolve() if args.artifact_store else None
+    )
+    repro_dir = work_dir / REPRO_PACKAGE_DIRNAME
+    real_cfg = repro_dir / REAL_CFG_FILENAME
+    linux_config_file = repro_dir / LINUX_CONFIG_FILENAME
+    linux_commit_file = repro_dir / LINUX_COMMIT_FILENAME
+    syzkaller_commit_file = repro_dir / SYZKALLER_COMMIT_FILENAME
+
+    cfg_template = Path(args.cfg_template)
+    work_dir_existed = work_dir.exists()
+    tuning_results = None
+    tuning_results_file = find_artifact(repro_dir / TUNING_RESULTS_FILENAME)
+    if tuning_results_file is not None:
+        # The package cfg was made from the best variant of the template, so
+        # validate against the same variant of the template given now
+        tuning_results = json.loads(read_artifact_text(tuning_results_file))
+        cfg_template = write_tuned_template(cfg_template, work_dir, tuning_results)
+        print(f"[tune] {repro_dir} was tuned, using the tuned template {cfg_template}")
+    elif args.tune:
+        if repro_dir.exists():
+            print(f"[tune] {repro_dir} already exists, skipping tuning")
+        else:
+            work_dir.mkdir(parents=False, exist_ok=True)
+            cfg_template, tuning_results = tune_cfg(
+                cfg_template, work_dir, Path(syzkaller_src), Path(linux_src), args
+            )
+
+    # Build expected contents. The Linux and syzkaller sides are independent,
+    # so the git queries of both trees run concurrently.
+    timings: dict[str, float] = {}
+    start = time.perf_counter()
+    phases = {
+        "linux_config": (get_linux_config, Path(linux_src)),
+        "real_cfg": (
+            copy_and_modify_cfg,
+            cfg_template,
+            work_dir,
+            Path(syzkaller_src),
+            Path(linux_src),
+            CACHE_DIR if args.kernel_cache else None,
+        ),
+    }
+    if not args.no_cache:
+        phases["linux_fingerprint"] = (get_repo_fingerprint, Path(linux_src))
+        phases["syzkaller_fingerprint"] = (get_repo_fingerprint, Path(syzkaller_src))
+    provenance = run_concurrently(phases, timings)
+    expected_real_cfg = provenance["real_cfg"]
+    if args.cover_function or args.cover_file or args.enable_syscall:
+        expected_real_cfg = focus_cfg(
+            expected_real_cfg,
+            Path(json.loads(expected_real_cfg)["kernel_obj"]),
+            Path(linux_src),
+            Path(syzkaller_src),
+            args.cover_function,
+            args.cover_file,
+            args.enable_syscall,
+        )
+    expected_real_cfg = apply_watchdog_ignores(expected_real_cfg, repro_dir)
+    expected_linux_config = provenance["linux_config"]
+
+    cache_entry = None
+    cached_provenance = None
+    if not args.no_cache:
+        cache_entry = get_provenance_cache_entry(
+            CACHE_DIR,
+            provenance["linux_fingerprint"],
+            provenance["syzkaller_fingerprint"],
+            expected_linux_config,
+        )
+        cached_provenance = read_cached_provenance(cache_entry)
+
+    if cached_provenance is not None:
+        print(f"[cache] using cached provenance from {cache_entry}")
+        expected_linux_commit, expected_syzkaller_commit = cached_provenance
+    else:
+        history = run_concurrently(
+            {
+                "linux_history": (get_linux_history_info, Path(linux_src)),
+                "syzkaller_history": (get_syzkaller_history_info, Path(syzkaller_src)),
+            },
+            timings,
+        )
+        expected_linux_commit = history["linux_history"]
+        expected_syzkaller_commit = history["syzkaller_history"]
+        if cache_entry is not None:
+            write_file_atomically(
+                cache_entry / LINUX_COMMIT_FILENAME,
+                json.dumps(expected_linux_commit, indent=4).encode(),
+            )
+            write_file_atomically(
+                cache_entry / SYZKALLER_COMMIT_FILENAME,
+                json.dumps(expected_syzkaller_commit, indent=4).encode(),
+            )
+
+    expected_files: dict[Path, str] = {
+        real_cfg: expected_real_cfg,
+        linux_config_file: expected_linux_config,
+        linux_commit_file: json.dumps(expected_linux_commit, indent=4),
+        syzkaller_commit_file: json.dumps(expected_syzkaller_commit, indent=4),
+    }
+    if tuning_results is not None:
+        expected_files[repro_dir / TUNING_RESULTS_FILENAME] = json.dumps(
+            tuning_results, indent=4
+        )
+
+    if work_dir_existed:
+        existing_repro, existing_corpus = get_existing_work_dir(work_dir)
+
+        if existing_repro is not None:
+            check_start = time.perf_counter()
+            check_repro_package(existing_repro, expected_files)
+            timings["check"] = time.perf_counter() - check_start
+            if tracing.TRACER is not None:
+                tracing.TRACER.complete("check", "phase", check_start)
+        else:
+            create_repro_dir(
+                linux_src,
+                syzkaller_src,
+                repro_dir,
+                expected_linux_commit,
+                expected_syzkaller_commit,
+                expected_files,
+                timings,
+                cache_entry,
+                artifact_store,
+            )
+
+    else:
+        existing_corpus = None
+        work_dir.mkdir(parents=False, exist_ok=True)
+        create_repro_dir(
+            linux_src,
+            syzkaller_src,
+            repro_dir,
+            expected_linux_commit,
+            expected_syzkaller_commit,
+            expected_files,
+            timings,
+            cache_entry,
+            artifact_store,
+        )
+
+    if cache_entry is not None:
+        evict_cache(CACHE_DIR / PROVENANCE_CACHE_DIRNAME, PROVENANCE_CACHE_MAX_BYTES)
+    if args.kernel_cache:
+        evict_cache(CACHE_DIR / KERNEL_CACHE_DIRNAME, args.kernel_cache_max_bytes)
+
+    print_timing_summary(timings, time.perf_counter() - start)
+
+    if existing_corpus is not None:
+        handle_existing_corpus(work_dir, existing_corpus, not args.non_interactive)
+    if args.merge_corpora:
+        warm_start_corpus(work_dir)
+
+    log_file = work_dir / SYZ_MANAGER_LOG_FILENAME
+    snapshotter = None
+    if args.supervise or args.watchdog:
+        snapshotter = start_coverage_snapshots(real_cfg, work_dir, args.coverage_interval)
+    else:
+        # syz-manager is exec'd in place of this process, see run_syz_manager
+        fork_coverage_snapshots(real_cfg, work_dir, args.coverage_interval)
+    try:
+        if args.watchdog:
+            return watch_syz_manager(
+                Path(syzkaller_src),
+                repro_dir,
+                log_file,
+                args.verbosity,
+                functools.partial(
+                    Watchdog,
+                    args.storm_window,
+                    args.storm_threshold,
+                    args.collapse_window,
+                    args.collapse_ratio,
+                ),
+                args.max_restarts,
+                args.log_max_bytes,
+                args.compress_logs,
+                not args.no_echo,
+                new_ndjson_sink,
+            )
+        return run_syz_manager(
+            Path(syzkaller_src),
+            real_cfg,
+            log_file,
+            args.verbosity,
+            args.supervise,
+            args.log_max_bytes,
+            args.compress_logs,
+            not args.no_echo,
+            new_ndjson_sink,
+        )
+    finally:
+        if snapshotter is not None:
+            snapshotter.stop()
+
+
+def create_repro_dir(
+    linux_src,
+    syzkaller_src,
+    repro_dir,
+    expected_linux_commit,
+    expected_syzkaller_commit,
+    expected_files,
+    timings,
+    cache_entry=None,
+    artifact_store=None,
+):
+    repro_dir.mkdir(parents=False)
+    run_concurrently(
+        {
+            "linux_patch": (
+                create_patch_from_info,
+                expected_linux_commit,
+                repro_dir / LINUX_DIFF_FILENAME,
+                Path(linux_src),
+                cache_entry,
+                artifact_store,
+            ),
+            "syzkaller_patch": (
+                create_patch_from_info,
+                expected_syzkaller_commit,
+                repro_dir / SYZKALLER_DIFF_FILENAME,
+                Path(syzkaller_src),
+                cache_entry,
+                artifact_store,
+            ),
+        },
+        timings,
+    )
+    write_repro_files(repro_dir, expected_files, artifact_store)
@@ -0,0 +1,163 @@
+"""
+Launcher configuration, source tree paths and the syzkaller .cfg template.
+"""
+
+import json
+from pathlib import Path
+
+from .cache import snapshot_kernel
+from .constants import (
+    BZIMAGE_FILENAME,
+    BZIMAGE_RELATIVE_PATH,
+    SYZ_MANAGER_BIN_RELATIVE_PATH,
+    VMLINUX_FILENAME,
+)
+from .errors import ConfigurationError
+from .tracing import traced
+
+
+def load_config(config_path: Path, required_keys: list[str]) -> dict[str, str]:
+    """
+    Load configuration from config.json file in the current working directory.
+    """
+    try:
+        with open(config_path, "r") as f:
+            config = json.load(f)
+            missing_keys = [key for key in required_keys if key not in config]
+            if missing_keys:
+                raise ConfigurationError(
+                    f"Missing required keys in config file: {missing_keys}"
+                )
+            return config
+    except FileNotFoundError:
+        raise ConfigurationError(f"Configuration file not found at {config_path}")
+    except json.JSONDecodeError:
+        raise ConfigurationError(f"Invalid JSON in configuration file {config_path}")
+
+
+def load_source_paths(
+    linux_src: str | None, syzkaller_src: str | None, config_path: Path
+) -> tuple[str, str, dict[str, str] | None]:
+    """
+    Return the Linux and syzkaller source paths, reading the ones that were not
+    given from the configuration file. The configuration is also returned if it
+    was used, so that the caller can have its paths confirmed.
+    """
+    required_keys = []
+    if linux_src is None:
+        required_keys.append("linux_src")
+    if syzkaller_src is None:
+        required_keys.append("syzkaller_src")
+
+    config = None
+    if required_keys:
+        config = load_config(config_path, required_keys=required_keys)
+        if not linux_src:
+            linux_src = config["linux_src"]
+        if not syzkaller_src:
+            syzkaller_src = config["syzkaller_src"]
+    return linux_src, syzkaller_src, config
+
+
+def prompt_for_confirm() -> bool:
+    while True:
+        response = input("\nDo you want to continue? [y/N]: ").lower()
+        if response in ["y", "yes"]:
+            return True
+        if response in ["", "n", "no"]:
+            return False
+        print("Please answer 'y' or 'n'")
+
+
+def confirm_paths(required_keys: dict[str, Path]) -> bool:
+    """
+    Ask user to confirm the paths that will be used.
+    """
+
+    res = True
+    for key, val in required_keys.items():
+        print(f"The following {key} source path will be used:\n {str(val)}")
+        res = res and prompt_for_confirm()
+    return res
+
+
+def load_cfg_template(cfg_template: Path) -> dict:
+    with open(cfg_template, "r") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            raise ConfigurationError(
+                f"Invalid JSON in syzkaller cfg template file {cfg_template}"
+            )
+
+
+def modify_cfg(
+    config: dict,
+    work_dir: Path,
+    syzkaller_path: Path,
+    linux_src_path: Path,
+    kernel_dir: Path | None = None,
+) -> dict:
+    """
+    Point a syzkaller cfg at the work dir and the source trees. If kernel_dir is
+    given, the kernel image and vmlinux (if kernel_dir has one) are taken from
+    it instead of the Linux build tree.
+    """
+    config["workdir"] = str(work_dir)
+    config["syzkaller"] = str(syzkaller_path)
+    config["kernel_src"] = str(linux_src_path)
+    config["kernel_obj"] = str(linux_src_path)
+    bzimage_path = Path(linux_src_path)
+    for part in BZIMAGE_RELATIVE_PATH:
+        bzimage_path = bzimage_path / part
+    if kernel_dir is not None:
+        bzimage_path = kernel_dir / BZIMAGE_FILENAME
+        if (kernel_dir / VMLINUX_FILENAME).exists():
+            config["kernel_obj"] = str(kernel_dir)
+    config["vm"]["kernel"] = str(bzimage_path)
+    return config
+
+
+@traced
+def copy_and_modify_cfg(
+    cfg_template: Path,
+    work_dir: Path,
+    syzkaller_path: Path,
+    linux_src_path: Path,
+    cache_dir: Path | None = None,
+) -> str:
+    """
+    Return expected contents for real.cfg after copying/modifying. With a
+    cache_dir, the kernel is taken from its kernel cache instead of the build
+    tree.
+    """
+    kernel_dir = snapshot_kernel(linux_src_path, cache_dir) if cache_dir else None
+    config = modify_cfg(
+        load_cfg_template(cfg_template),
+        work_dir,
+        syzkaller_path,
+        linux_src_path,
+        kernel_dir,
+    )
+    return json.dumps(config, indent=4)
+
+
+def get_linux_config(linux_src: Path) -> str:
+    """
+    Return contents of the Linux .config file.
+    """
+    cfg_path = linux_src / ".config"
+    if not cfg_path.exists():
+        raise ConfigurationError(f"Linux .config file not found at {cfg_path}")
+    return cfg_path.read_text()
+
+
+def get_syz_manager_bin(syzkaller_src: Path) -> Path:
+    syz_manager_bin = syzkaller_src
+    for part in SYZ_MANAGER_BIN_RELATIVE_PATH:
+        syz_manager_bin = syz_manager_bin / part
+    if not syz_manager_bin.exists():
+        raise ConfigurationError(
+            f"Expected syz-manager binary at {syz_manager_bin}, but it was missing. Forgot to compile?"
+        )
+    return syz_manager_bin
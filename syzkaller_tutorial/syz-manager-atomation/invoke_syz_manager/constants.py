@@ -0,0 +1,149 @@
+"""
+Paths, file names, formats and defaults shared by the launcher modules.
+"""
+
+import os
+import re
+import signal
+from pathlib import Path
+
+
+# Constants for hardcoded paths and filenames
+REPRO_PACKAGE_DIRNAME = "repro_package"
+CORPUS_FILENAME = "corpus.db"
+REAL_CFG_FILENAME = "syzkaller.cfg"
+LINUX_CONFIG_FILENAME = ".config"
+LINUX_COMMIT_FILENAME = "linux_commit_difference.json"
+LINUX_DIFF_FILENAME = "linux_diff_from_ancestor.patch"
+SYZKALLER_COMMIT_FILENAME = "syzkaller_commit_difference.json"
+SYZKALLER_DIFF_FILENAME = "syzkaller_diff_from_ancestor.patch"
+MANIFEST_FILENAME = "manifest.json"
+SYZ_MANAGER_LOG_FILENAME = "syz-manager.log"
+STATS_FILE_SUFFIX = ".stats.csv"
+INDEX_FILE_SUFFIX = ".index.json"
+SYZ_MANAGER_BIN_RELATIVE_PATH = ["bin", "syz-manager"]
+BZIMAGE_RELATIVE_PATH = ["arch", "x86", "boot", "bzImage"]
+LAUNCHER_PATH = Path(__file__).resolve().parent.parent / "invoke-syz-manager.py"
+CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "invoke-syz-manager"
+)
+PROVENANCE_CACHE_DIRNAME = "provenance"
+PROVENANCE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+KERNEL_CACHE_DIRNAME = "kernels"
+KERNEL_CACHE_MAX_BYTES = 16 * 1024**3
+CACHE_LOCK_FILENAME = ".lock"
+SYMBOL_CACHE_DIRNAME = "symbols"
+RESERVATIONS_DIRNAME = "reservations"
+SYMBOL_CACHE_MAX_BYTES = 256 * 1024 * 1024
+SYMBOL_TABLE_FILENAME = "symbols.bin"
+SYMBOL_TABLE_VERSION = 1
+SYSTEM_MAP_FILENAME = "System.map"
+SYSCALL_DESCRIPTION_RE = re.compile(r"^([a-z_][a-zA-Z0-9_]*(?:\$[a-zA-Z0-9_]+)?)\(", re.MULTILINE)
+BZIMAGE_FILENAME = "bzImage"
+VMLINUX_FILENAME = "vmlinux"
+HASH_CHUNK_SIZE = 1024 * 1024
+ARTIFACT_STORE_OBJECTS_DIRNAME = "objects"
+STORED_ARTIFACT_SUFFIX = ".gz"
+# Always written plain: syz-manager reads the cfg, and the .config is the
+# artifact people and external tools take out of a repro_package
+PLAIN_ARTIFACT_FILENAMES = (REAL_CFG_FILENAME, LINUX_CONFIG_FILENAME)
+FICLONE = 0x40049409  # linux/fs.h ioctl to reflink a whole file
+LOG_BUFFER_SIZE = 64 * 1024
+LOG_FLUSH_INTERVAL = 1.0
+PIPE_READ_SIZE = 64 * 1024
+MANAGER_STOP_GRACE_SECONDS = 30
+TUNING_DIRNAME = "tuning"
+TUNING_RESULTS_FILENAME = "tuning_results.json"
+TUNED_TEMPLATE_FILENAME = "tuned_template.cfg"
+WATCHDOG_FILENAME = "watchdog.json"
+CORPUS_DB_MAGIC = 0xBADDB  # syzkaller pkg/db format
+CORPUS_RECORD_MAGIC = 0xFEE1BAD
+CORPUS_SEQ_DELETED = 2**64 - 1
+CORPUS_READ_SIZE = 256 * 1024
+PREVIOUS_RUN_PREFIX = "previous_run_"
+CRASHES_DIRNAME = "crashes"
+SNAPSHOTS_DIRNAME = "snapshots"
+SNAPSHOT_FILENAME = "snapshot.json"
+SNAPSHOT_TMP_SUFFIX = ".tmp"
+COVERAGE_DIRNAME = "coverage"
+COVERAGE_SNAPSHOT_SUFFIX = ".cover"
+COVERAGE_MAGIC = b"SYZCOV2\0"
+COVERAGE_REGION_BITS = 16  # a CoverageSet has a bitmap per 64 KiB of kernel text
+COVERAGE_FETCH_TIMEOUT = 60
+FORWARDED_SIGNALS = [signal.SIGINT, signal.SIGTERM, signal.SIGHUP, signal.SIGQUIT]
+
+# syz-manager log lines, e.g.
+# 2025/09/05 20:01:13 candidates=116 corpus=44 coverage=11410 exec total=1071 (14/sec) pending=0 reproducing=0
+# 2025/09/05 20:05:13 VM 1: crash(tail0): SYZFAIL: failed to recv rpc
+STATS_LINE_RE = re.compile(
+    rb"^(\d{4}/\d\d/\d\d \d\d:\d\d:\d\d) candidates=(\d+) corpus=(\d+) coverage=(\d+) "
+    rb"exec total=(\d+) \((\d+)/(sec|min)\)"
+)
+CRASH_LINE_RE = re.compile(
+    rb"^(\d{4}/\d\d/\d\d \d\d:\d\d:\d\d) VM (\d+): crash(?:\((\w+)\))?: (.*?)\s*$",
+    re.MULTILINE,
+)
+LOG_TIMESTAMP_RE = re.compile(rb"^(\d{4}/\d\d/\d\d \d\d:\d\d:\d\d) ")
+LOG_VM_INDEX_RE = re.compile(rb"^(?:VM|runner|pool: booting instance) (\d+)")
+CRASH_TITLE_MARKERS = (b" [corrupted]", b" [suppressed]")
+LOG_FILE_RE = re.compile(r".*\.log(\.\d+)?(\.gz)?$")
+LOG_INDEX_VERSION = 2
+LOG_INDEX_HEAD_BYTES = 4096
+# syz-manager startup milestones traced with --trace: (begin, end, span name)
+# pairs, where a captured VM index is formatted into the name, and instants
+MANAGER_TRACE_SPANS = [
+    (
+        re.compile(rb"pool: booting instance (\d+)"),
+        re.compile(rb"runner (\d+) connected"),
+        "VM {} boot",
+    ),
+    (
+        re.compile(rb"initializing coverage information"),
+        re.compile(rb"discovered \d+ source files"),
+        "coverage init",
+    ),
+]
+MANAGER_TRACE_INSTANTS = [
+    (re.compile(rb"serving rpc on"), "rpc serving"),
+    (re.compile(rb"serving http on"), "http serving"),
+    (re.compile(rb"skipped \d+ seeds"), "seeds loaded"),
+    (re.compile(rb"machine check:"), "machine check"),
+    (re.compile(rb"corpus +: \d+"), "corpus loaded"),
+]
+
+# NDJSON log streams: the category of a timestamped line by its first word
+# (stats, crash and running lines are told apart in classify_log_line), and the
+# verbosity level of each category, kept if <= --ndjson-level
+NDJSON_SUFFIX = ".ndjson"
+LOG_CATEGORY_WORDS = {
+    b"module": "module",
+    b"seed": "seed",
+    b"distributing": "signal",
+    b"pool:": "vm",
+    b"runner": "vm",
+    b"VM": "vm",
+    b"ssh": "ssh",
+    b"minimized": "corpus",
+    b"corpus": "corpus",
+    b"skipped": "corpus",
+}
+LOG_CATEGORY_LEVELS = {
+    "stats": 0,
+    "crash": 0,
+    "vm": 1,
+    "manager": 1,
+    "corpus": 2,
+    "ssh": 2,
+    "signal": 3,
+    "seed": 3,
+    "module": 3,
+}
+NDJSON_DEFAULT_LEVEL = 2
+NDJSON_DEFAULT_RETAIN = {"signal": 16 * 1024**2, "seed": 1024**2, "module": 1024**2}
+
+DASHBOARD_LOG_GLOB = "syz-manager*.log"
+DASHBOARD_SPARK_CHARS = "▁▂▃▄▅▆▇█"
+DASHBOARD_RATE_WINDOW = 3600
+DASHBOARD_RESCAN_INTERVAL = 10.0
+
+INVOKE_SYZ_MANAGER_VERSION = "1.1.1"
@@ -0,0 +1,272 @@
+"""
+The syzkaller corpus.db of work trees.
+"""
+
+import argparse
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+
+from .config import prompt_for_confirm
+from .constants import (
+    CORPUS_DB_MAGIC,
+    CORPUS_FILENAME,
+    CORPUS_READ_SIZE,
+    CORPUS_RECORD_MAGIC,
+    CORPUS_SEQ_DELETED,
+    PREVIOUS_RUN_PREFIX,
+)
+from .errors import ConfigurationError
+from .snapshots import format_snapshot_counts, snapshot_work_dir
+from .tracing import traced
+
+
+def handle_existing_corpus(work_dir: Path, corpus: Path, interactive: bool = True):
+
+    if not interactive:
+        print(f"[info] continuing fuzzing from the existing {corpus}")
+        return
+
+    print(
+        f"The directory {work_dir} already has a corpus.db file. Would you like to continue fuzzing from this run?"
+    )
+    reuse = prompt_for_confirm()
+
+    if reuse:
+        return
+    else:
+        # Only finished previous_run_N dirs count, not the .tmp dir of an
+        # interrupted snapshot
+        previous_runs = [
+            int(subdir.name[len(PREVIOUS_RUN_PREFIX) :])
+            for subdir in work_dir.iterdir()
+            if subdir.is_dir()
+            and subdir.name.startswith(PREVIOUS_RUN_PREFIX)
+            and subdir.name[len(PREVIOUS_RUN_PREFIX) :].isdigit()
+        ]
+        old_dir = work_dir / f"{PREVIOUS_RUN_PREFIX}{max(previous_runs, default=-1) + 1}"
+        counts = snapshot_work_dir(work_dir, old_dir, move_corpus=True)
+        print(f"[ok] moved {corpus} to {old_dir / CORPUS_FILENAME}, {format_snapshot_counts(counts)}")
+        return
+
+
+class CorpusDBReader:
+    """
+    Streaming reader of a syzkaller corpus.db: a header with a magic number and
+    a version, followed by records of a key, a sequence number and a
+    deflate-compressed value (a program) prefixed with its compressed length,
+    appended over time. A later record for a
+    key replaces the earlier ones, and a record with the deleted sequence number
+    removes the key. Only one record is held in memory at a time.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.buffer = b""
+        self.pos = 0
+        self.offset = 0
+        header = self.read(12)
+        if header is None or struct.unpack_from("<I", header)[0] != CORPUS_DB_MAGIC:
+            self.file.close()
+            raise ConfigurationError(f"{path} is not a syzkaller corpus.db")
+        self.version = struct.unpack_from("<Q", header, 4)[0]
+
+    def fill(self) -> bool:
+        data = self.file.read(CORPUS_READ_SIZE)
+        self.offset += self.pos
+        self.buffer = self.buffer[self.pos :] + data
+        self.pos = 0
+        return bool(data)
+
+    def read(self, size: int) -> bytes | None:
+        while len(self.buffer) - self.pos < size:
+            if not self.fill():
+                return None
+        data = self.buffer[self.pos : self.pos + size]
+        self.pos += size
+        return data
+
+    def inflate(self, size: int) -> bytes | None:
+        # Like syzkaller, inflate at most the size compressed bytes of the value
+        data = self.read(size)
+        if data is None:
+            return None
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        value = decompressor.decompress(data)
+        return value if decompressor.eof else None
+
+    def records(self):
+        """
+        Yield (offset, key, seq, value) for each record in file order. The value of
+        a deletion record is None. Like syzkaller, a truncated or corrupt record
+        ends the database, keeping the records before it.
+        """
+        try:
+            while True:
+                offset = self.offset + self.pos
+                head = self.read(8)
+                if head is None:
+                    if self.pos < len(self.buffer):
+                        break
+                    return
+                magic, key_len = struct.unpack("<II", head)
+                key = self.read(key_len) if magic == CORPUS_RECORD_MAGIC else None
+                seq = self.read(8) if key is not None else None
+                if seq is None:
+                    break
+                seq = struct.unpack("<Q", seq)[0]
+                if seq == CORPUS_SEQ_DELETED:
+                    yield offset, key.decode(), seq, None
+                    continue
+                value_len = self.read(4)
+                if value_len is None:
+                    break
+                value_len = struct.unpack("<I", value_len)[0]
+                value = self.inflate(value_len) if value_len else b""
+                if value is None:
+                    break
+                yield offset, key.decode(), seq, value
+            print(f"[warning] {self.path}: ignoring a corrupt record at offset {offset}")
+        except zlib.error:
+            print(f"[warning] {self.path}: ignoring a corrupt record at offset {offset}")
+        finally:
+            self.file.close()
+
+
+class CorpusDBWriter:
+    """
+    Writer of a syzkaller corpus.db, see CorpusDBReader. Values are compressed
+    with the best deflate compression, as syzkaller does.
+    """
+
+    def __init__(self, file, version: int):
+        self.file = file
+        self.file.write(struct.pack("<IQ", CORPUS_DB_MAGIC, version))
+
+    def write(self, key: str, seq: int, value: bytes | None):
+        key = key.encode()
+        record = [struct.pack("<II", CORPUS_RECORD_MAGIC, len(key)), key]
+        record.append(struct.pack("<Q", seq))
+        if seq != CORPUS_SEQ_DELETED:
+            compressed = b""
+            if value:
+                compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+                compressed = compressor.compress(value) + compressor.flush()
+            record += [struct.pack("<I", len(compressed)), compressed]
+        self.file.write(b"".join(record))
+
+
+def merge_corpus_dbs(sources: list[Path], output: Path) -> dict[str, int]:
+    """
+    Merge the programs of the sources corpus.db files into output, keeping each
+    program once. Each source is streamed twice: a first pass finds the record that
+    holds the final state of each key, and a second pass copies the live ones
+    that no earlier source had. Only the keys are kept in memory. The output
+    has the lowest version of the sources, so that syz-manager upgrades all
+    of it. Returns counts of the records read, programs kept, and records
+    dropped as duplicates of an earlier source or as deleted or replaced.
+    """
+    counts = {"records": 0, "kept": 0, "duplicates": 0, "stale": 0}
+    versions = [CorpusDBReader(source) for source in sources]
+    version = min(reader.version for reader in versions)
+    for reader in versions:
+        reader.file.close()
+
+    written: set[str] = set()
+    tmp_output = output.with_name(f".{output.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_output, "wb") as f:
+            writer = CorpusDBWriter(f, version)
+            for source in sources:
+                final: dict[str, int] = {}
+                for offset, key, seq, value in CorpusDBReader(source).records():
+                    counts["records"] += 1
+                    if value is None:
+                        final.pop(key, None)
+                    else:
+                        final[key] = offset
+                for offset, key, seq, value in CorpusDBReader(source).records():
+                    if final.get(key) != offset:
+                        counts["stale"] += 1
+                    elif key in written:
+                        counts["duplicates"] += 1
+                    else:
+                        writer.write(key, seq, value)
+                        written.add(key)
+                        counts["kept"] += 1
+        os.replace(tmp_output, output)
+    finally:
+        tmp_output.unlink(missing_ok=True)
+    return counts
+
+
+def find_previous_corpora(work_dir: Path) -> list[Path]:
+    """
+    Return the corpus.db files of the previous_run_N dirs, most recent first.
+    """
+    corpora = []
+    for subdir in work_dir.glob(f"{PREVIOUS_RUN_PREFIX}*"):
+        number = subdir.name.removeprefix(PREVIOUS_RUN_PREFIX)
+        if number.isdigit() and (subdir / CORPUS_FILENAME).exists():
+            corpora.append((int(number), subdir / CORPUS_FILENAME))
+    return [corpus for _, corpus in sorted(corpora, reverse=True)]
+
+
+@traced
+def warm_start_corpus(work_dir: Path):
+    """
+    Merge the corpora of the previous runs of work_dir into its corpus.db.
+    """
+    corpus = work_dir / CORPUS_FILENAME
+    sources = ([corpus] if corpus.exists() else []) + find_previous_corpora(work_dir)
+    if not sources or sources == [corpus]:
+        return
+    start = time.perf_counter()
+    counts = merge_corpus_dbs(sources, corpus)
+    print(
+        f"[corpus] merged {len(sources)} corpora into {corpus} in "
+        f"{time.perf_counter() - start:.2f}s: kept {counts['kept']} programs, dropped "
+        f"{counts['duplicates']} duplicates and {counts['stale']} deleted or replaced records"
+    )
+
+
+def corpus_main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="invoke-syz-manager.py corpus",
+        description="Count the programs of syzkaller corpus.db files, or merge them "
+        "into one corpus with each program kept once.",
+    )
+    parser.add_argument("corpora", nargs="+", help="corpus.db files")
+    parser.add_argument(
+        "-o", "--output", help="Merge the corpora into this corpus.db"
+    )
+    args = parser.parse_args(argv)
+
+    sources = [Path(p) for p in args.corpora]
+    if args.output:
+        counts = merge_corpus_dbs(sources, Path(args.output))
+        print(
+            f"[corpus] {counts['records']} records read, {counts['kept']} programs kept, "
+            f"{counts['duplicates']} duplicates and {counts['stale']} deleted or replaced "
+            "records dropped"
+        )
+        return 0
+
+    for source in sources:
+        reader = CorpusDBReader(source)
+        programs: set[str] = set()
+        records = 0
+        for _, key, _, value in reader.records():
+            records += 1
+            if value is None:
+                programs.discard(key)
+            else:
+                programs.add(key)
+        print(
+            f"{source}: version {reader.version}, {len(programs)} programs, "
+            f"{records} records"
+        )
+    return 0
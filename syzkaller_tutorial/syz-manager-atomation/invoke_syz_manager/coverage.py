@@ -0,0 +1,303 @@
+"""
+Coverage snapshots fetched from the syz-manager HTTP interface.
+"""
+
+import argparse
+import os
+import sys
+import json
+import re
+import struct
+import threading
+import time
+import urllib.request
+import zlib
+from pathlib import Path
+
+from .constants import (
+    COVERAGE_DIRNAME,
+    COVERAGE_FETCH_TIMEOUT,
+    COVERAGE_MAGIC,
+    COVERAGE_REGION_BITS,
+    COVERAGE_SNAPSHOT_SUFFIX,
+)
+from .errors import ConfigurationError
+from .files import write_file_atomically
+
+
+class CoverageSet:
+    """
+    Set of covered kernel PCs, held as a bitmap per region of
+    2**COVERAGE_REGION_BITS PCs that has any covered: region r maps to a
+    Python int whose bit i stands for PC (r << COVERAGE_REGION_BITS) + i.
+    Only covered regions take memory, so far apart core kernel and module
+    text stay small. Union, intersection and difference of two sets are
+    bitwise operations on the ints of the regions they share. Snapshot files
+    hold the zlib-compressed regions and their bitmaps.
+    """
+
+    def __init__(self, regions: dict[int, int] | None = None):
+        self.regions = {region: bits for region, bits in (regions or {}).items() if bits}
+
+    @classmethod
+    def from_pcs(cls, pcs: list[int]) -> "CoverageSet":
+        mask = (1 << COVERAGE_REGION_BITS) - 1
+        bitmaps = {}
+        for pc in pcs:
+            bitmap = bitmaps.get(pc >> COVERAGE_REGION_BITS)
+            if bitmap is None:
+                bitmap = bitmaps[pc >> COVERAGE_REGION_BITS] = bytearray((mask + 1) // 8)
+            offset = pc & mask
+            bitmap[offset >> 3] |= 1 << (offset & 7)
+        return cls({region: int.from_bytes(bitmap, "little") for region, bitmap in bitmaps.items()})
+
+    @classmethod
+    def load(cls, path: Path) -> "CoverageSet":
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(COVERAGE_MAGIC):
+            raise ConfigurationError(f"{path} is not a coverage snapshot")
+        count = struct.unpack_from("<Q", data, len(COVERAGE_MAGIC))[0]
+        try:
+            regions = zlib.decompress(memoryview(data)[len(COVERAGE_MAGIC) + 8 :])
+            coverage = cls()
+            pos = 0
+            while pos < len(regions):
+                region, size = struct.unpack_from("<QI", regions, pos)
+                pos += 12 + size
+                coverage.regions[region] = int.from_bytes(regions[pos - size : pos], "little")
+        except (zlib.error, struct.error):
+            raise ConfigurationError(f"Corrupt coverage snapshot {path}")
+        if len(coverage) != count:
+            raise ConfigurationError(f"Corrupt coverage snapshot {path}")
+        return coverage
+
+    def save(self, path: Path):
+        regions = []
+        for region, bits in sorted(self.regions.items()):
+            bitmap = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+            regions += [struct.pack("<QI", region, len(bitmap)), bitmap]
+        write_file_atomically(
+            path,
+            COVERAGE_MAGIC + struct.pack("<Q", len(self)) + zlib.compress(b"".join(regions)),
+        )
+
+    def __len__(self) -> int:
+        return sum(bits.bit_count() for bits in self.regions.values())
+
+    def __eq__(self, other) -> bool:
+        return self.regions == other.regions
+
+    def __or__(self, other: "CoverageSet") -> "CoverageSet":
+        regions = dict(self.regions)
+        for region, bits in other.regions.items():
+            regions[region] = regions.get(region, 0) | bits
+        return CoverageSet(regions)
+
+    def __and__(self, other: "CoverageSet") -> "CoverageSet":
+        return CoverageSet(
+            {
+                region: bits & other.regions[region]
+                for region, bits in self.regions.items()
+                if region in other.regions
+            }
+        )
+
+    def __sub__(self, other: "CoverageSet") -> "CoverageSet":
+        return CoverageSet(
+            {region: bits & ~other.regions.get(region, 0) for region, bits in self.regions.items()}
+        )
+
+    def pcs(self):
+        """
+        Yield the covered PCs in increasing order.
+        """
+        for region, bits in sorted(self.regions.items()):
+            base = region << COVERAGE_REGION_BITS
+            bitmap = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+            for match in re.finditer(rb"[^\x00]", bitmap):
+                byte, offset = match.group()[0], match.start() * 8
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        yield base + offset + bit
+
+
+def fetch_coverage(http_addr: str) -> CoverageSet:
+    """
+    Fetch the raw coverage PCs from the syz-manager http endpoint.
+    """
+    url = http_addr if "://" in http_addr else f"http://{http_addr}"
+    with urllib.request.urlopen(
+        f"{url.rstrip('/')}/rawcover", timeout=COVERAGE_FETCH_TIMEOUT
+    ) as response:
+        body = response.read()
+    return CoverageSet.from_pcs([int(pc, 16) for pc in body.split()])
+
+
+class CoverageSnapshotter:
+    """
+    Background thread that saves a coverage snapshot of a running syz-manager
+    into out_dir every interval seconds, skipping snapshots that did not change.
+    The manager http endpoint not answering yet, while it boots, is not an error.
+    """
+
+    def __init__(self, http_addr: str, out_dir: Path, interval: float):
+        self.http_addr = http_addr
+        self.out_dir = out_dir
+        self.interval = interval
+        self.last = CoverageSet()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.out_dir.mkdir(exist_ok=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                coverage = fetch_coverage(self.http_addr)
+            except (OSError, ValueError):
+                continue
+            if coverage == self.last:
+                continue
+            self.last = coverage
+            snapshot = self.out_dir / (
+                time.strftime("%Y%m%d-%H%M%S", time.gmtime()) + COVERAGE_SNAPSHOT_SUFFIX
+            )
+            coverage.save(snapshot)
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+def start_coverage_snapshots(
+    cfg_path: Path, work_dir: Path, interval: float
+) -> CoverageSnapshotter | None:
+    if not interval:
+        return None
+    http_addr = json.loads(cfg_path.read_text()).get("http")
+    if not http_addr:
+        print(f"[warning] no http address in {cfg_path}, not taking coverage snapshots")
+        return None
+    out_dir = work_dir / COVERAGE_DIRNAME
+    print(f"[coverage] saving coverage snapshots every {interval}s to {out_dir}")
+    return CoverageSnapshotter(http_addr, out_dir, interval)
+
+
+def fork_coverage_snapshots(cfg_path: Path, work_dir: Path, interval: float):
+    """
+    Take coverage snapshots from a forked child process, for when this process
+    is about to be replaced by syz-manager with exec and keeps no thread. The
+    child stops once its parent, by then the syz-manager pipeline, has exited.
+    """
+    if not interval:
+        return
+    parent = os.getpid()
+    sys.stdout.flush()
+    if os.fork() != 0:
+        return
+    status = 0
+    try:
+        snapshotter = start_coverage_snapshots(cfg_path, work_dir, interval)
+        if snapshotter is not None:
+            while os.getppid() == parent:
+                time.sleep(1)
+            snapshotter.stop()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"[warning] coverage snapshots stopped: {e}", file=sys.stderr)
+        status = 1
+    finally:
+        # Leave the parent's trace, buffers and exit handlers alone
+        os._exit(status)
+
+
+def load_coverage(path: Path) -> CoverageSet:
+    """
+    Load a coverage snapshot, or the latest snapshot of a work dir.
+    """
+    if path.is_dir():
+        snapshots = sorted((path / COVERAGE_DIRNAME).glob(f"*{COVERAGE_SNAPSHOT_SUFFIX}"))
+        if not snapshots:
+            raise ConfigurationError(f"No coverage snapshots in {path / COVERAGE_DIRNAME}")
+        path = snapshots[-1]
+    return CoverageSet.load(path)
+
+
+def coverage_main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="invoke-syz-manager.py coverage",
+        description="Compare coverage snapshots: for each one, the PCs it covers and "
+        "the PCs that none of the others cover. A work dir stands for its latest "
+        "snapshot.",
+    )
+    parser.add_argument(
+        "snapshots", nargs="*", help="Coverage snapshot files or work dirs"
+    )
+    parser.add_argument(
+        "--fetch",
+        metavar="HTTP_ADDR",
+        help="Take a snapshot from the http endpoint of a running syz-manager "
+        "(requires --output)",
+    )
+    parser.add_argument(
+        "--op",
+        choices=["union", "intersection", "difference"],
+        help="Combine the snapshots (default with --output or --list: union, "
+        "difference: the first minus all others)",
+    )
+    parser.add_argument("-o", "--output", help="Write the fetched or combined snapshot")
+    parser.add_argument(
+        "--list", action="store_true", help="Print the PCs of the combined snapshot"
+    )
+    args = parser.parse_args(argv)
+
+    if args.fetch:
+        if not args.output:
+            parser.error("--fetch requires --output")
+        coverage = fetch_coverage(args.fetch)
+        coverage.save(Path(args.output))
+        print(f"[coverage] {len(coverage)} PCs written to {args.output}")
+        return 0
+    if not args.snapshots:
+        parser.error("no snapshots given")
+
+    start = time.perf_counter()
+    coverages = [load_coverage(Path(p)) for p in args.snapshots]
+    loaded = time.perf_counter()
+
+    if args.op or args.output or args.list:
+        result = coverages[0]
+        for coverage in coverages[1:]:
+            if args.op in (None, "union"):
+                result = result | coverage
+            elif args.op == "intersection":
+                result = result & coverage
+            else:
+                result = result - coverage
+        op = args.op or "union"
+        print(
+            f"[coverage] {op}: {len(result)} PCs "
+            f"(load {loaded - start:.3f}s, {op} {time.perf_counter() - loaded:.3f}s)",
+            file=sys.stderr if args.list else sys.stdout,
+        )
+        if args.output:
+            result.save(Path(args.output))
+        if args.list:
+            for pc in result.pcs():
+                print(f"0x{pc:x}")
+        return 0
+
+    width = max(len(p) for p in args.snapshots)
+    print(f"{'snapshot':<{width}}  {'PCs':>10}  {'only here':>10}")
+    for i, coverage in enumerate(coverages):
+        others = CoverageSet()
+        for j, other in enumerate(coverages):
+            if j != i:
+                others = others | other
+        print(f"{args.snapshots[i]:<{width}}  {len(coverage):>10}  {len(coverage - others):>10}")
+    print(
+        f"[coverage] load {loaded - start:.3f}s, compare {time.perf_counter() - loaded:.3f}s"
+    )
+    return 0
@@ -0,0 +1,154 @@
+"""
+Crash lines of syz-manager logs and their per-title counts.
+"""
+
+import argparse
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .artifacts import open_artifact
+from .constants import CRASH_LINE_RE, CRASH_TITLE_MARKERS, STORED_ARTIFACT_SUFFIX
+from .errors import ConfigurationError
+from .logs import find_logs, format_log_timestamp, parse_log_timestamp
+
+
+def normalize_crash_title(title: bytes) -> tuple[bytes, bool]:
+    """
+    Strip the [corrupted] and [suppressed] markers from a crash title.
+    Returns the title and whether the report was marked corrupted.
+    """
+    corrupted = False
+    for marker in CRASH_TITLE_MARKERS:
+        if title.endswith(marker):
+            title = title[: -len(marker)]
+            corrupted = corrupted or marker == b" [corrupted]"
+    return title, corrupted
+
+
+def parse_crash_line(match: re.Match) -> tuple[int, str, bytes, bool, bool]:
+    """
+    Split a CRASH_LINE_RE match into its timestamp, VM, normalized title,
+    whether the report is corrupted and whether it is a tail report.
+
+    This is the crash policy of every log reader: a "crash:" line is one
+    crash. The "crash(tailN):" lines printed right after it are the further
+    reports syz-manager found in the rest of the same console output; they
+    are reports of their titles, but not crashes of their own.
+    """
+    stamp, vm, kind, title = match.groups()
+    title, corrupted = normalize_crash_title(title)
+    return parse_log_timestamp(stamp), vm.decode(), title, corrupted, kind is not None
+
+
+def record_crash(crashes: dict[str, list], match: re.Match):
+    """
+    Count one CRASH_LINE_RE match into crashes, which maps each normalized title
+    to [count, corrupted count, first timestamp, last timestamp, {vm: count},
+    tail count]. Only crash lines count as crashes (see parse_crash_line); tail
+    reports only add to the tail count and the first and last timestamps.
+    """
+    timestamp, vm, title, corrupted, tail = parse_crash_line(match)
+    title = title.decode(errors="replace")
+    entry = crashes.get(title)
+    if entry is None:
+        entry = crashes[title] = [0, 0, timestamp, timestamp, {}, 0]
+    entry[3] = timestamp
+    if tail:
+        entry[5] += 1
+        return
+    entry[0] += 1
+    entry[1] += corrupted
+    entry[4][vm] = entry[4].get(vm, 0) + 1
+
+
+def aggregate_crashes(log_file: Path) -> dict[str, list]:
+    """
+    Count the crashes and tail reports of one log by normalized title, see
+    record_crash.
+    """
+    crashes = {}
+    if log_file.name.endswith(STORED_ARTIFACT_SUFFIX):
+        with open_artifact(log_file) as f:
+            data = f.read()
+    elif log_file.stat().st_size == 0:
+        return crashes
+    else:
+        with open(log_file, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    for match in CRASH_LINE_RE.finditer(data):
+        record_crash(crashes, match)
+    return crashes
+
+
+def merge_crashes(total: dict[str, list], crashes: dict[str, list]):
+    for title, (count, corrupted, first, last, vms, tails) in crashes.items():
+        entry = total.get(title)
+        if entry is None:
+            total[title] = [count, corrupted, first, last, dict(vms), tails]
+            continue
+        entry[0] += count
+        entry[1] += corrupted
+        entry[2] = min(entry[2], first)
+        entry[3] = max(entry[3], last)
+        entry[5] += tails
+        for vm, vm_count in vms.items():
+            entry[4][vm] = entry[4].get(vm, 0) + vm_count
+
+
+def crashes_main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="invoke-syz-manager.py crashes",
+        description="Aggregate the crashes reported in syz-manager logs by title. "
+        "Tail reports, the crash(tailN) lines that follow a crash, are counted "
+        "separately from crashes.",
+    )
+    parser.add_argument(
+        "paths", nargs="+", help="Log files, or directories to search for logs"
+    )
+    parser.add_argument(
+        "--top", type=int, default=0, help="Only show the N most frequent titles"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of logs scanned in parallel (default: number of cores)",
+    )
+    args = parser.parse_args(argv)
+
+    logs = find_logs([Path(p) for p in args.paths])
+    if not logs:
+        raise ConfigurationError(f"No syz-manager logs found in {args.paths}")
+
+    total = {}
+    if len(logs) == 1 or args.jobs <= 1:
+        for log in logs:
+            merge_crashes(total, aggregate_crashes(log))
+    else:
+        with ProcessPoolExecutor(max_workers=min(args.jobs, len(logs))) as pool:
+            for crashes in pool.map(aggregate_crashes, logs):
+                merge_crashes(total, crashes)
+
+    ranked = sorted(total.items(), key=lambda item: (item[1][0], item[1][5]), reverse=True)
+    if args.top:
+        ranked = ranked[: args.top]
+
+    print(f"{'count':>7} {'corrupt':>7} {'tail':>7}  {'first':19}  {'last':19}  {'per VM':24} title")
+    for title, (count, corrupted, first, last, vms, tails) in ranked:
+        per_vm = " ".join(
+            f"{vm}:{vm_count}" for vm, vm_count in sorted(vms.items(), key=lambda v: int(v[0]))
+        )
+        print(
+            f"{count:>7} {corrupted:>7} {tails:>7}  {format_log_timestamp(first)}  "
+            f"{format_log_timestamp(last)}  {per_vm:24} {title}"
+        )
+    print(
+        f"[ok] {sum(e[0] for e in total.values())} crashes, "
+        f"{sum(e[5] for e in total.values())} tail reports, {len(total)} titles in {len(logs)} logs"
+    )
+    return 0
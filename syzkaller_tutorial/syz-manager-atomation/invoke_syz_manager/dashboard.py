@@ -0,0 +1,258 @@
+"""
+Live terminal dashboard of the syz-manager logs of work trees.
+"""
+
+import argparse
+import collections
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+from .constants import (
+    CRASH_LINE_RE,
+    DASHBOARD_LOG_GLOB,
+    DASHBOARD_RATE_WINDOW,
+    DASHBOARD_RESCAN_INTERVAL,
+    DASHBOARD_SPARK_CHARS,
+    LOG_TIMESTAMP_RE,
+    STATS_LINE_RE,
+)
+from .crashes import parse_crash_line, record_crash
+from .errors import ConfigurationError
+from .logs import parse_log_timestamp
+from .status import find_work_dirs
+
+
+class LogFollower:
+    """
+    Follows the newest syz-manager log of a work dir for the dashboard: it
+    starts from the last history_bytes of the log, then only reads the bytes
+    appended since the previous poll. A rotated log is read to its end before
+    following the new file, and a newer log (a relaunch) is switched to when
+    one appears. It keeps the last width exec/sec and coverage samples, the
+    crashes by title as counted by record_crash, and the crash and VM boot
+    times of the last DASHBOARD_RATE_WINDOW seconds of log time.
+    """
+
+    def __init__(self, work_dir: Path, width: int, history_bytes: int):
+        self.work_dir = work_dir
+        self.width = width
+        self.history_bytes = history_bytes
+        self.log = None
+        self.file = None
+        self.inode = None
+        self.partial = b""
+        self.next_rescan = 0.0
+        self.reset()
+
+    def reset(self):
+        self.exec_rates = collections.deque(maxlen=self.width)
+        self.coverage = collections.deque(maxlen=self.width)
+        self.stats = None  # last (corpus, coverage, exec total)
+        self.crashes = {}
+        self.crash_times = collections.deque()
+        self.boot_times = collections.deque()
+        self.first = None  # earliest and latest log timestamps
+        self.now = None
+
+    def newest_log(self) -> Path | None:
+        newest = None
+        for path in self.work_dir.glob(DASHBOARD_LOG_GLOB):
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                continue  # rotated or removed since the listing
+            if newest is None or mtime > newest[0]:
+                newest = (mtime, path)
+        return None if newest is None else newest[1]
+
+    def open(self, log: Path, start_from_tail: bool):
+        file = open(log, "rb")
+        if self.file is not None:
+            self.file.close()
+        self.log = log
+        self.file = file
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        self.partial = b""
+        if start_from_tail:
+            self.reset()
+            size = os.fstat(self.file.fileno()).st_size
+            if size > self.history_bytes:
+                self.file.seek(size - self.history_bytes)
+                self.file.readline()  # skip the partial first line
+
+    def poll(self):
+        now = time.monotonic()
+        if now >= self.next_rescan:
+            self.next_rescan = now + DASHBOARD_RESCAN_INTERVAL
+            newest = self.newest_log()
+            if newest is not None and newest != self.log:
+                try:
+                    self.open(newest, start_from_tail=True)
+                except FileNotFoundError:
+                    self.next_rescan = now
+        if self.file is None:
+            return
+        self.read()
+        try:
+            inode = self.log.stat().st_ino
+        except FileNotFoundError:
+            return
+        if inode != self.inode:
+            # Rotated: the rest of the old file was just read
+            try:
+                self.open(self.log, start_from_tail=False)
+            except FileNotFoundError:
+                return
+            self.read()
+
+    def read(self):
+        data = self.file.read()
+        if not data:
+            return
+        *lines, self.partial = (self.partial + data).split(b"\n")
+        for line in lines:
+            self.feed(line)
+
+    def feed(self, line: bytes):
+        match = STATS_LINE_RE.match(line)
+        if match:
+            rate = int(match.group(6))
+            self.exec_rates.append(rate if match.group(7) == b"sec" else rate / 60)
+            self.coverage.append(int(match.group(4)))
+            self.stats = (int(match.group(3)), int(match.group(4)), int(match.group(5)))
+            self.advance(parse_log_timestamp(match.group(1)))
+        elif b"pool: booting instance" in line:
+            match = LOG_TIMESTAMP_RE.match(line)
+            if match:
+                self.boot_times.append(self.advance(parse_log_timestamp(match.group(1))))
+        elif b": crash" in line:
+            match = CRASH_LINE_RE.match(line)
+            if match:
+                record_crash(self.crashes, match)
+                timestamp, _, _, _, tail = parse_crash_line(match)
+                if not tail:
+                    self.crash_times.append(self.advance(timestamp))
+
+    def advance(self, timestamp: int) -> int:
+        self.first = min(self.first or timestamp, timestamp)
+        self.now = max(self.now or timestamp, timestamp)
+        for times in (self.crash_times, self.boot_times):
+            while times and times[0] < self.now - DASHBOARD_RATE_WINDOW:
+                times.popleft()
+        return timestamp
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def sparkline(values) -> str:
+    if not values:
+        return ""
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    top = len(DASHBOARD_SPARK_CHARS) - 1
+    return "".join(DASHBOARD_SPARK_CHARS[round((v - low) / span * top)] for v in values)
+
+
+def format_age(seconds: float) -> str:
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds / 3600:.1f}h"
+
+
+def render_dashboard(followers: list[LogFollower], top: int) -> str:
+    columns = shutil.get_terminal_size().columns
+    lines = [time.strftime("%H:%M:%S") + f"  {len(followers)} work dirs"]
+    for follower in followers:
+        lines.append("")
+        if follower.log is None:
+            lines.append(f"{follower.work_dir.name}  no log")
+            continue
+        age = format_age(max(time.time() - os.fstat(follower.file.fileno()).st_mtime, 0))
+        header = f"{follower.work_dir.name}  {follower.log.name}, last output {age} ago"
+        if follower.stats is not None:
+            corpus, coverage, exec_total = follower.stats
+            header += f"  corpus {corpus}  exec total {exec_total}"
+        lines.append(header[:columns])
+        window = min(DASHBOARD_RATE_WINDOW, follower.now - follower.first) if follower.now else 0
+        hours = max(window, 1) / 3600
+        rate = follower.exec_rates[-1] if follower.exec_rates else 0
+        coverage = follower.coverage[-1] if follower.coverage else 0
+        lines.append(
+            f"  exec/sec {rate:8.1f} {sparkline(follower.exec_rates)}"[:columns]
+        )
+        lines.append(f"  coverage {coverage:8} {sparkline(follower.coverage)}"[:columns])
+        crashes = follower.crashes.values()
+        lines.append(
+            f"  crashes {sum(e[0] for e in crashes)} ({len(follower.crash_times) / hours:.1f}/h),"
+            f" {sum(e[5] for e in crashes)} tail reports  VM boots {len(follower.boot_times) / hours:.1f}/h"
+        )
+        ranked = sorted(follower.crashes.items(), key=lambda item: (item[1][0], item[1][5]), reverse=True)
+        for title, entry in ranked[:top]:
+            lines.append(f"  {entry[0]:6} {entry[5]:6}  {title}"[:columns])
+    return "\n".join(lines)
+
+
+def dashboard_main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="invoke-syz-manager.py dashboard",
+        description="Show the exec/sec and coverage (as sparklines of the last stats "
+        "samples), top crash titles, and crash and VM boot rates of the last hour of "
+        "running work dirs, following the newest syz-manager log of each. Logs are "
+        "read incrementally, starting from their last --history-bytes.",
+    )
+    parser.add_argument(
+        "paths", nargs="+", type=Path, help="Work dirs, or directories of work dirs"
+    )
+    parser.add_argument(
+        "--interval", type=float, default=1.0, help="Refresh interval in seconds (default: 1)"
+    )
+    parser.add_argument(
+        "--width", type=int, default=60, help="Samples per sparkline (default: 60)"
+    )
+    parser.add_argument(
+        "--top", type=int, default=3, help="Crash titles shown per work dir (default: 3)"
+    )
+    parser.add_argument(
+        "--history-bytes",
+        type=int,
+        default=4 * 1024 * 1024,
+        help="Bytes read from the end of each log at startup (default: 4 MiB)",
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="Print the dashboard once and exit"
+    )
+    args = parser.parse_args(argv)
+
+    work_dirs = find_work_dirs(args.paths)
+    if not work_dirs:
+        raise ConfigurationError(f"No work dirs found in {[str(p) for p in args.paths]}")
+    followers = [LogFollower(work_dir, args.width, args.history_bytes) for work_dir in work_dirs]
+    try:
+        if args.once:
+            for follower in followers:
+                follower.poll()
+            print(render_dashboard(followers, args.top))
+            return 0
+        sys.stdout.write("\033[?25l")  # hide the cursor
+        while True:
+            for follower in followers:
+                follower.poll()
+            # Home and clear below rather than clearing the whole screen, which
+            # flickers
+            sys.stdout.write("\033[H" + render_dashboard(followers, args.top) + "\033[J")
+            sys.stdout.flush()
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        if not args.once:
+            sys.stdout.write("\033[?25h\n")
+        for follower in followers:
+            follower.close()
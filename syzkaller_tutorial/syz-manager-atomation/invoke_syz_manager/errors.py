@@ -0,0 +1,13 @@
+"""
+Exceptions reported by the launcher without a traceback.
+"""
+
+
+class ReproductionError(Exception):
+    """Raised when the reproduction package is invalid or inconsistent."""
+
+    pass
+
+
+class ConfigurationError(Exception):
+    pass
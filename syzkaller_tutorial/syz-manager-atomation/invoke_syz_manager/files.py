@@ -0,0 +1,60 @@
+"""
+File helpers shared by the launcher modules.
+"""
+
+import errno
+import fcntl
+import gzip
+import os
+import shutil
+from pathlib import Path
+
+from .constants import FICLONE, HASH_CHUNK_SIZE
+
+
+def write_file_atomically(path: Path, content: bytes):
+    """
+    Atomically replace path with content, creating its parent directory if needed.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+
+
+def link_or_copy(src: Path, dst: Path):
+    """
+    Materialize src at dst with a hardlink, or a copy if src is on another
+    filesystem or cannot be linked.
+    """
+    try:
+        os.link(src, dst)
+        return
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+    shutil.copyfile(src, dst)
+
+
+def clone_or_copy(src: Path, dst: Path) -> bool:
+    """
+    Copy src to dst as a reflink, or a plain copy if the filesystem has no
+    reflinks. Return whether it was reflinked.
+    """
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return True
+        except OSError:
+            shutil.copyfileobj(fsrc, fdst, HASH_CHUNK_SIZE)
+            return False
+
+
+def compress_file(path: Path):
+    """
+    Replace path with a gzipped path.gz.
+    """
+    gz_path = path.with_name(path.name + ".gz")
+    with open(path, "rb") as fsrc, gzip.open(gz_path, "wb", compresslevel=6) as fdst:
+        shutil.copyfileobj(fsrc, fdst, HASH_CHUNK_SIZE)
+    path.unlink()
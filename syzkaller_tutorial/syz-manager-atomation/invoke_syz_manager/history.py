@@ -0,0 +1,389 @@
+"""
+Git provenance of the Linux and syzkaller trees: upstream ancestors, tags and
+patches on top of them.
+"""
+
+import hashlib
+import subprocess
+from pathlib import Path
+
+from .artifacts import write_artifact
+from .errors import ConfigurationError
+from .files import write_file_atomically
+from .tracing import check_subprocess_output, run_subprocess
+
+
+def rev_list_parents(
+    repo_source_root: Path, include: list[str], exclude: list[str], boundary=False
+) -> tuple[dict[str, list[str]], list[str]]:
+    """
+    Walk the commits reachable from include but not from exclude in a single
+    git process. Returns the parent map of the walked commits and, if boundary
+    is set, the excluded commits that are parents of walked commits.
+    """
+    revs = include + [f"^{rev}" for rev in exclude]
+    cmd = ["git", "-C", str(repo_source_root), "rev-list", "--parents", "--stdin"]
+    if boundary:
+        cmd.append("--boundary")
+    output = check_subprocess_output(cmd, input="\n".join(revs) + "\n", text=True)
+
+    parents = {}
+    boundaries = []
+    for line in output.splitlines():
+        if line.startswith("-"):
+            boundaries.append(line[1:].split()[0])
+        else:
+            commit, *commit_parents = line.split()
+            parents[commit] = commit_parents
+    return parents, boundaries
+
+
+def reachable_within(parents: dict[str, list[str]], start: str) -> set[str]:
+    """
+    Return the commits of a parent map that are reachable from start.
+    """
+    seen = set()
+    stack = [start]
+    while stack:
+        commit = stack.pop()
+        if commit in seen or commit not in parents:
+            continue
+        seen.add(commit)
+        stack.extend(parents[commit])
+    return seen
+
+
+def get_closest_upstream_ancestor(
+    repo_source_root: Path,
+) -> tuple[str, str, str, str] | None:
+    """
+    Find the most recent common ancestor with any branch that has an upstream.
+    Returns (ancestor_hash, ancestor_message, remote_url, branch) or None if not found.
+
+    All upstreams are resolved with one for-each-ref and excluded from a single
+    rev-list walk from HEAD, so the number of git processes does not grow with
+    the number of tracking branches. The closest ancestor is always one of the
+    boundary commits of that walk.
+    """
+    output = check_subprocess_output(
+        [
+            "git",
+            "-C",
+            str(repo_source_root),
+            "for-each-ref",
+            "--format=%(objectname) %(refname) %(upstream) %(upstream:remotename)",
+            "refs/heads/",
+            "refs/remotes/",
+        ],
+        text=True,
+    ).strip()
+
+    ref_hashes = {}
+    upstream_lines = []
+    for line in output.splitlines():
+        parts = line.split()
+        ref_hashes[parts[1]] = parts[0]
+        if parts[1].startswith("refs/heads/") and len(parts) >= 3:
+            upstream_lines.append(parts)
+
+    # (branch, upstream ref, remote name), skipping upstreams that no longer exist
+    candidates = [
+        (parts[1].removeprefix("refs/heads/"), parts[2], parts[3] if len(parts) > 3 else None)
+        for parts in upstream_lines
+        if parts[2] in ref_hashes
+    ]
+    if not candidates:
+        return None
+
+    upstream_hashes = sorted({ref_hashes[upstream] for _, upstream, _ in candidates})
+    local_only, boundaries = rev_list_parents(
+        repo_source_root, ["HEAD"], upstream_hashes, boundary=True
+    )
+
+    if not local_only:
+        # HEAD itself is contained in an upstream
+        head = check_subprocess_output(
+            ["git", "-C", str(repo_source_root), "rev-parse", "HEAD"], text=True
+        ).strip()
+        distances = {head: 0}
+    elif len(boundaries) == 1:
+        distances = {boundaries[0]: len(local_only)}
+    elif boundaries:
+        # Commits below every boundary are ancestors of all of them, so only the
+        # region between the boundaries and their common bases needs walking.
+        try:
+            bases = check_subprocess_output(
+                ["git", "-C", str(repo_source_root), "merge-base", "--octopus", "--all"]
+                + boundaries,
+                text=True,
+            ).split()
+        except subprocess.CalledProcessError:
+            bases = []
+        region, _ = rev_list_parents(repo_source_root, boundaries, bases)
+        distances = {
+            b: len(local_only) + len(region) - len(reachable_within(region, b))
+            for b in boundaries
+        }
+    else:
+        return None
+
+    min_distance = min(distances.values())
+    best_ancestor = None
+    best_index = len(candidates)
+    for ancestor, distance in distances.items():
+        if distance != min_distance:
+            continue
+        containing_refs = set(
+            check_subprocess_output(
+                [
+                    "git",
+                    "-C",
+                    str(repo_source_root),
+                    "for-each-ref",
+                    "--format=%(refname)",
+                    "--contains",
+                    ancestor,
+                    "refs/heads/",
+                    "refs/remotes/",
+                ],
+                text=True,
+            ).split()
+        )
+        for index, (_, upstream, _) in enumerate(candidates[:best_index]):
+            if upstream in containing_refs:
+                best_ancestor, best_index = ancestor, index
+                break
+
+    if best_ancestor is None:
+        return None
+    best_cand_branch, _, remote_name = candidates[best_index]
+
+    ancestor_msg = check_subprocess_output(
+        ["git", "-C", str(repo_source_root), "log", "-1", best_ancestor, "--pretty=%s"],
+        text=True,
+    ).strip()
+
+    if not remote_name:
+        return None
+
+    remote_url = check_subprocess_output(
+        ["git", "-C", str(repo_source_root), "remote", "get-url", remote_name],
+        text=True,
+    ).strip()
+
+    return best_ancestor, ancestor_msg, remote_url, best_cand_branch
+
+
+def get_syzkaller_history_info(repo_source_root: Path) -> dict[str, str | None]:
+    """
+    Return commit info up to the local HEAD from the syzkaller repo.
+    For syzkaller we assume we are on a branch that is tracked remotely,
+    or we find the closest ancestor that is.
+    """
+    branch = check_subprocess_output(
+        ["git", "-C", str(repo_source_root), "rev-parse", "--abbrev-ref", "HEAD"],
+        text=True,
+    ).strip()
+
+    remote_name = get_remote(repo_source_root, branch)
+
+    if remote_name is not None:
+        ancestor_branch = branch
+        remote_url = check_subprocess_output(
+            ["git", "-C", str(repo_source_root), "remote", "get-url", remote_name],
+            text=True,
+        ).strip()
+
+        ancestor_hash = check_subprocess_output(
+            ["git", "-C", str(repo_source_root), "rev-parse", "@{u}"], text=True
+        ).strip()
+        ancestor_msg = check_subprocess_output(
+            ["git", "-C", str(repo_source_root), "log", "-1", "@{u}", "--pretty=%s"],
+            text=True,
+        ).strip()
+    else:
+        closest_ancestor_info = get_closest_upstream_ancestor(repo_source_root)
+        if closest_ancestor_info is None:
+            raise ConfigurationError(
+                f"Current branch {branch} in syzkaller repo at {repo_source_root} has no upstream, "
+                "and no common ancestor with any upstream branch was found."
+            )
+        ancestor_hash, ancestor_msg, remote_url, ancestor_branch = closest_ancestor_info
+
+    untracked_commits = commits_to_head(repo_source_root, ancestor_hash)
+
+    ancestor_info = {
+        "hash": ancestor_hash,
+        "message": ancestor_msg,
+        "branch": ancestor_branch,
+        "upstream": remote_url,
+    }
+    difference = {"distance": len(untracked_commits), "commits": untracked_commits}
+    return {"last_ancestor": ancestor_info, "difference": difference}
+
+
+def get_linux_history_info(repo_source_root: Path) -> dict[str, str | None]:
+    """
+    Return commit info up to the local HEAD from the Linux repo.
+    For Linux we report the difference from the closest tag.
+    """
+
+    last_ancestor = get_last_tag(repo_source_root)
+    untracked_commits = commits_to_head(repo_source_root, last_ancestor["commit_hash"])
+    ancestor_info = {
+        "hash": last_ancestor["commit_hash"],
+        "message": last_ancestor["commit_message"],
+        "tag": last_ancestor["tag"],
+    }
+    difference = {"distance": len(untracked_commits), "commits": untracked_commits}
+
+    return {"last_ancestor": ancestor_info, "difference": difference}
+
+
+def get_remote(repo_source_root: Path, branch: str) -> str | None:
+    """
+    Return the remote name for the given branch, or None if it has no remote.
+    """
+    try:
+        remote_name = check_subprocess_output(
+            ["git", "-C", str(repo_source_root), "config", f"branch.{branch}.remote"],
+            text=True,
+        ).strip()
+    except subprocess.CalledProcessError:
+        remote_name = None
+    return remote_name
+
+
+def commits_to_head(repo_source_root: Path, ancestor_hash: str) -> list[dict[str, str]]:
+    """
+    Return list of commits from ancestor_hash (exclusive) to HEAD (inclusive).
+    """
+    commit_lines = (
+        check_subprocess_output(
+            [
+                "git",
+                "-C",
+                str(repo_source_root),
+                "log",
+                f"{ancestor_hash}..HEAD",
+                "--pretty=%H,%s",
+            ],
+            text=True,
+        )
+        .strip()
+        .splitlines()
+    )
+
+    commits = []
+    for line in commit_lines:
+        commit_hash, commit_msg = line.split(",", 1)
+        commits.append({"hash": commit_hash, "message": commit_msg})
+    return commits
+
+
+def get_last_tag(repo_source_root: Path) -> dict[str, str]:
+    """
+    Return the closest tag, and the commit hash and message at that tag.
+    """
+    og_tag = (
+        check_subprocess_output(
+            ["git", "-C", str(repo_source_root), "describe"], text=True
+        )
+        .strip()
+    )
+    tag = og_tag.split("-")[0]
+
+    cmd = [
+                "git",
+                "-C",
+                str(repo_source_root),
+                "log",
+                "-1",
+                "--pretty=%H,%s",
+                f"tags/{tag}",
+            ]
+    try:
+        commit_hash_and_message = check_subprocess_output(cmd, text=True).strip()
+    except subprocess.CalledProcessError as e:
+        raise ConfigurationError(
+            "Getting the linux commit of the closest tag failed, probably "
+            f"because current tag is {og_tag} but {tag} does not exist yet.\n\n"
+            "command ran:\n"
+            f"  {' '.join(cmd)}\n\n"
+            "received output:\n"
+            f"  {e.output}"
+        )
+
+    commit_hash, commit_msg = commit_hash_and_message.split(",", 1)
+
+    return {
+        "commit_hash": commit_hash,
+        "tag": tag,
+        "commit_message": commit_msg,
+    }
+
+
+def create_patch_from_info(
+    history_info: dict[str, str],
+    output_path: Path,
+    repo_source_root: Path,
+    cache_entry: Path | None = None,
+    artifact_store: Path | None = None,
+):
+    """
+    Create a patch file from the ancestor to HEAD using git diff,
+    or copy it from the provenance cache entry if it was already created.
+    """
+    if history_info["difference"]["distance"] == 0:
+        print(
+            f"[info] No unpushed commits in repo at {repo_source_root}, skipping patch creation."
+        )
+        return
+
+    cached_patch = None if cache_entry is None else cache_entry / output_path.name
+    if cached_patch is not None and cached_patch.exists():
+        write_artifact(output_path, cached_patch.read_bytes(), artifact_store)
+        print(f"[write] copy cached git patch to {output_path}")
+        return
+
+    ancestor_hash = history_info["last_ancestor"]["hash"]
+    patch = run_subprocess(
+        ["git", "-C", str(repo_source_root), "diff", f"{ancestor_hash}..HEAD"],
+        stdout=subprocess.PIPE,
+    ).stdout
+    write_artifact(output_path, patch, artifact_store)
+    print(f"[write] create git patch at {output_path}")
+    if cached_patch is not None:
+        write_file_atomically(cached_patch, patch)
+
+
+def get_repo_fingerprint(repo_source_root: Path) -> str:
+    """
+    Return a hash of everything the history info and patches of a repo depend
+    on: HEAD, the current branch, all refs with their upstreams, and remote URLs.
+    """
+    digest = hashlib.sha256()
+    for cmd in (
+        ["rev-parse", "HEAD", "--symbolic-full-name", "HEAD"],
+        ["for-each-ref", "--format=%(objectname) %(refname) %(upstream)"],
+        ["config", "--get-regexp", r"^remote\..*\.url$"],
+    ):
+        # config exits with 1 when there are no remotes, which is a valid state
+        result = run_subprocess(
+            ["git", "-C", str(repo_source_root)] + cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        digest.update(result.stdout)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def has_commit(repo: Path, commit: str) -> bool:
+    return (
+        run_subprocess(
+            ["git", "-C", str(repo), "cat-file", "-e", f"{commit}^{{commit}}"],
+            stderr=subprocess.DEVNULL,
+        ).returncode
+        == 0
+    )
@@ -0,0 +1,118 @@
+"""
+Running syz-manager on the config of a reproduction package.
+"""
+
+import os
+import json
+from pathlib import Path
+
+from . import tracing
+from .config import get_syz_manager_bin
+from .constants import REAL_CFG_FILENAME
+from .stats import StatsRecorder, stats_path_for_log
+from .supervisor import RotatingLogWriter, next_log_file, supervise_syz_manager
+from .tracing import finish_trace
+from .watchdog import record_watchdog_event
+
+
+def watch_syz_manager(
+    syzkaller_src: Path,
+    repro_dir: Path,
+    log_file: Path,
+    verbosity: int,
+    new_watchdog,
+    max_restarts: int,
+    log_max_bytes: int = 0,
+    compress_logs: bool = False,
+    echo: bool = True,
+    new_ndjson_sink=None,
+) -> int:
+    """
+    Run syz-manager in supervise mode under a Watchdog from new_watchdog(), and
+    restart it in the same work dir, so with the same corpus, whenever the
+    watchdog fires, up to max_restarts times. Each run logs to a new log file,
+    and to NDJSON streams of that log from new_ndjson_sink(log file) if given.
+    """
+    syz_manager_bin = get_syz_manager_bin(syzkaller_src)
+    cfg_path = repro_dir / REAL_CFG_FILENAME
+    cmd = [str(syz_manager_bin), "-vv", str(verbosity), "-config", str(cfg_path)]
+    restarts = 0
+    while True:
+        candidate = next_log_file(log_file)
+        print(f"running {' '.join(cmd)} (supervised with watchdog, log at {candidate})")
+        watchdog = new_watchdog()
+        log = RotatingLogWriter(candidate, log_max_bytes, compress_logs)
+        recorder = StatsRecorder(stats_path_for_log(candidate))
+        line_handlers = [recorder.feed, watchdog.feed]
+        sink = None if new_ndjson_sink is None else new_ndjson_sink(candidate)
+        if sink is not None:
+            line_handlers.append(sink.feed)
+        try:
+            returncode = supervise_syz_manager(
+                cmd,
+                log,
+                line_handlers,
+                echo,
+                stop_when=lambda: watchdog.event is not None,
+            )
+        finally:
+            recorder.close()
+            if sink is not None:
+                sink.close()
+        event = watchdog.event
+        if event is None:
+            return returncode
+
+        print(f"[watchdog] {event['reason']} at {event['at']}: {json.dumps(event)}")
+        if restarts >= max_restarts:
+            print(f"[watchdog] not restarting syz-manager after {restarts} restarts")
+            return returncode
+        record_watchdog_event(repro_dir, event, candidate)
+        restarts += 1
+        print(f"[watchdog] restarting syz-manager ({restarts}/{max_restarts})")
+
+
+def run_syz_manager(
+    syzkaller_src: Path,
+    cfg_path: Path,
+    log_file: Path,
+    verbosity: int,
+    supervise: bool = False,
+    log_max_bytes: int = 0,
+    compress_logs: bool = False,
+    echo: bool = True,
+    new_ndjson_sink=None,
+) -> int:
+    """
+    Run syz-manager with the given config and verbosity level, redirecting output with tee,
+    or with supervise_syz_manager in supervise mode, where the output also goes
+    to NDJSON streams from new_ndjson_sink(log file) if given.
+    """
+    syz_manager_bin = get_syz_manager_bin(syzkaller_src)
+    candidate = next_log_file(log_file)
+
+    if supervise:
+        cmd = [str(syz_manager_bin), "-vv", str(verbosity), "-config", str(cfg_path)]
+        print(f"running {' '.join(cmd)} (supervised, log at {candidate})")
+        log = RotatingLogWriter(candidate, log_max_bytes, compress_logs)
+        recorder = StatsRecorder(stats_path_for_log(candidate))
+        line_handlers = [recorder.feed]
+        sink = None if new_ndjson_sink is None else new_ndjson_sink(candidate)
+        if sink is not None:
+            line_handlers.append(sink.feed)
+        try:
+            return supervise_syz_manager(cmd, log, line_handlers, echo)
+        finally:
+            recorder.close()
+            if sink is not None:
+                sink.close()
+
+    cmd = f"{syz_manager_bin} -vv {verbosity} -config {cfg_path} 2>&1 | tee {candidate}"
+    print(f"running {cmd}")
+
+    # Hand over execution: replace current process with syz-manager+tee. Its
+    # startup is not traced as nothing is left to read its output.
+    if tracing.TRACER is not None:
+        tracing.TRACER.instant("exec syz-manager", "subprocess", {"cmd": cmd})
+    finish_trace()
+    os.execvp("bash", ["bash", "-c", cmd])
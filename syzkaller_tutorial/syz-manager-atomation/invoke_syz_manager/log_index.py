@@ -0,0 +1,267 @@
+"""
+Incremental index of stats, crashes and time offsets of syz-manager logs.
+"""
+
+import argparse
+import bisect
+import contextlib
+import hashlib
+import sys
+import json
+import time
+from pathlib import Path
+from calendar import timegm
+
+from .artifacts import find_artifact, open_artifact
+from .constants import (
+    CRASH_LINE_RE,
+    INDEX_FILE_SUFFIX,
+    LOG_INDEX_HEAD_BYTES,
+    LOG_INDEX_VERSION,
+    STATS_FILE_SUFFIX,
+    STORED_ARTIFACT_SUFFIX,
+)
+from .crashes import record_crash
+from .errors import ConfigurationError
+from .files import write_file_atomically
+from .logs import find_logs, parse_log_timestamp
+from .stats import StatsSeries, format_stats_row, stats_path_for_log
+
+
+def index_path_for_log(log_file: Path) -> Path:
+    return log_file.with_name(log_file.stem + INDEX_FILE_SUFFIX)
+
+
+def new_log_index(log_file: Path) -> dict:
+    return {
+        "version": LOG_INDEX_VERSION,
+        "file": log_file.name,
+        "inode": None,
+        "head_size": 0,
+        "head_sha256": None,
+        "offset": 0,
+        # Sparse [timestamp, file name, byte offset] table, one entry per minute
+        "timestamps": [],
+        "crashes": {},
+        "stats_samples": 0,
+        "stats_crashes": 0,
+    }
+
+
+def log_head_sha256(path: Path, size: int) -> str:
+    with open_artifact(path) as f:
+        return hashlib.sha256(f.read(size)).hexdigest()
+
+
+def rotated_segments(log_file: Path) -> list[Path]:
+    """
+    Return the rotated segments of a log (log.1, log.2.gz, ...), oldest first.
+    """
+    segments = []
+    for path in log_file.parent.glob(log_file.name + ".*"):
+        number = path.name[len(log_file.name) + 1 :].removesuffix(STORED_ARTIFACT_SUFFIX)
+        if number.isdigit():
+            segments.append((int(number), path))
+    return [path for _, path in sorted(segments)]
+
+
+def index_log_bytes(
+    path: Path,
+    index: dict,
+    start: int,
+    series: StatsSeries,
+    stats_file,
+    final: bool,
+) -> int:
+    """
+    Parse the bytes of path from start on into index and series, appending new
+    stats samples to stats_file, if any. Unless the file is final, a trailing
+    partial line is left for the next run. Returns the offset parsing stopped at.
+    """
+    with open_artifact(path) as f:
+        if path.name.endswith(STORED_ARTIFACT_SUFFIX):
+            f.read(start)
+        else:
+            f.seek(start)
+        data = f.read()
+    end = len(data) if final else data.rfind(b"\n") + 1
+
+    timestamps = index["timestamps"]
+    last_minute = None
+    offset = start
+    for line in data[:end].splitlines(keepends=True):
+        minute = line[:16]
+        if minute != last_minute and len(line) >= 19 and line[4:5] == b"/":
+            last_minute = minute
+            timestamp = parse_log_timestamp(line[:19])
+            if not timestamps or timestamp >= timestamps[-1][0] + 60:
+                timestamps.append([timestamp, path.name, offset])
+        if series.feed(line):
+            if stats_file is not None:
+                stats_file.write(format_stats_row(series.row(len(series) - 1)))
+        elif b": crash" in line:
+            match = CRASH_LINE_RE.match(line)
+            if match is not None:
+                record_crash(index["crashes"], match)
+        offset += len(line)
+    return offset
+
+
+def update_log_index(log_file: Path, series: StatsSeries | None = None) -> tuple[dict, int]:
+    """
+    Bring the index of a log up to date, parsing only the bytes appended since
+    the last run, and append the new stats samples to the log's stats file.
+    If the log was rotated since, the rest of the indexed segment and any newer
+    segments are parsed first. Returns the index and the number of bytes parsed.
+
+    Given a series, nothing is written next to the log, which may be read-only
+    or archived: the stored index, if any, is brought up to date in memory and
+    the stats samples of the whole log are appended to series.
+    """
+    index_path = index_path_for_log(log_file)
+    stats_path = stats_path_for_log(log_file)
+    try:
+        index = json.loads(index_path.read_text())
+    except (OSError, json.JSONDecodeError):
+        index = None
+    if index is None or index.get("version") != LOG_INDEX_VERSION or not stats_path.exists():
+        index = new_log_index(log_file)
+
+    st = log_file.stat()
+    pending = []  # (path, start offset, final)
+    if index["head_sha256"] is not None and (
+        index["inode"] != st.st_ino
+        or st.st_size < index["offset"]
+        or log_head_sha256(log_file, index["head_size"]) != index["head_sha256"]
+    ):
+        # The indexed file is the segment with its inode, or once gzipped, with
+        # its head. An empty head (nothing was indexed yet) matches any file.
+        segments = rotated_segments(log_file)
+        matched = None
+        for i, segment in enumerate(segments):
+            if segment.stat().st_ino == index["inode"] or (
+                index["head_size"] > 0
+                and log_head_sha256(segment, index["head_size"]) == index["head_sha256"]
+            ):
+                matched = i
+                break
+        if matched is None:
+            print(f"[info] {log_file} was replaced, indexing it from the start")
+            index = new_log_index(log_file)
+        else:
+            for entry in index["timestamps"]:
+                if entry[1] == log_file.name:
+                    entry[1] = segments[matched].name
+            pending.append((segments[matched], index["offset"], True))
+            pending.extend((segment, 0, True) for segment in segments[matched + 1 :])
+            index["offset"] = 0
+    pending.append((log_file, index["offset"], False))
+
+    read_only = series is not None
+    if read_only:
+        if index["stats_samples"]:
+            stored = StatsSeries.read_csv(stats_path)
+            for i in range(len(stored)):
+                series.append(stored.row(i))
+    else:
+        series = StatsSeries()
+    series.crashes = index["stats_crashes"]
+    known = len(series)
+    parsed = 0
+    with (
+        contextlib.nullcontext()
+        if read_only
+        else open(stats_path, "a" if index["stats_samples"] else "w")
+    ) as stats_file:
+        if stats_file is not None and not index["stats_samples"]:
+            stats_file.write(",".join(StatsSeries.COLUMNS) + "\n")
+        for path, start, final in pending:
+            end = index_log_bytes(path, index, start, series, stats_file, final)
+            parsed += end - start
+        index["offset"] = end
+
+    index["stats_samples"] += len(series) - known
+    index["stats_crashes"] = series.crashes
+    index["inode"] = st.st_ino
+    index["head_size"] = min(LOG_INDEX_HEAD_BYTES, index["offset"])
+    index["head_sha256"] = log_head_sha256(log_file, index["head_size"])
+    if not read_only:
+        write_file_atomically(index_path, json.dumps(index).encode())
+    return index, parsed
+
+
+def print_log_at(log_file: Path, index: dict, when: int, lines: int):
+    """
+    Print the first lines of a log (or of its rotated segments) logged at or
+    after the given time, seeking with the index instead of scanning the log.
+    """
+    table = index["timestamps"]
+    position = bisect.bisect_right([entry[0] for entry in table], when) - 1
+    if position < 0:
+        position = 0
+    _, name, offset = table[position]
+    # The segment may have been gzipped since it was indexed
+    path = find_artifact(log_file.with_name(name.removesuffix(STORED_ARTIFACT_SUFFIX)))
+    if path is None:
+        raise ConfigurationError(f"{log_file.with_name(name)} indexed in {log_file} is missing")
+    with open_artifact(path) as f:
+        if path.name.endswith(STORED_ARTIFACT_SUFFIX):
+            f.read(offset)
+        else:
+            f.seek(offset)
+        printing = False
+        for line in f:
+            if not printing and len(line) >= 19 and line[4:5] == b"/":
+                printing = parse_log_timestamp(line[:19]) >= when
+            if printing:
+                sys.stdout.buffer.write(line)
+                lines -= 1
+                if lines == 0:
+                    break
+
+
+def parse_user_time(value: str) -> int:
+    for fmt in ("%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M"):
+        try:
+            return timegm(time.strptime(value, fmt))
+        except ValueError:
+            continue
+    raise ConfigurationError(f"Invalid time {value!r}, expected YYYY/MM/DD HH:MM[:SS]")
+
+
+def index_main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="invoke-syz-manager.py index",
+        description="Incrementally index syz-manager logs: only bytes appended since the "
+        f"last run are parsed. The index is kept in <log name>{INDEX_FILE_SUFFIX} and the "
+        f"stats time series in <log name>{STATS_FILE_SUFFIX}.",
+    )
+    parser.add_argument(
+        "paths", nargs="+", help="Log files, or directories to search for logs"
+    )
+    parser.add_argument(
+        "--at",
+        help="Print the log lines starting at this time (YYYY/MM/DD HH:MM[:SS])",
+    )
+    parser.add_argument(
+        "--lines", type=int, default=20, help="Number of lines printed with --at"
+    )
+    args = parser.parse_args(argv)
+
+    when = parse_user_time(args.at) if args.at else None
+    logs = find_logs([Path(p) for p in args.paths], include_segments=False)
+    if not logs:
+        raise ConfigurationError(f"No syz-manager logs found in {args.paths}")
+
+    for log_file in logs:
+        start = time.perf_counter()
+        index, parsed = update_log_index(log_file)
+        crashes = sum(entry[0] for entry in index["crashes"].values())
+        print(
+            f"[index] {log_file}: parsed {parsed} new bytes in {time.perf_counter() - start:.3f}s, "
+            f"{index['stats_samples']} stats samples, {crashes} crashes, "
+            f"{len(index['crashes'])} titles"
+        )
+        if when is not None and index["timestamps"]:
+            print_log_at(log_file, index, when, args.lines)
+    return 0
@@ -0,0 +1,56 @@
+"""
+Finding syz-manager logs and parsing their timestamps.
+"""
+
+import functools
+import time
+from pathlib import Path
+from calendar import timegm
+
+from .constants import LOG_FILE_RE
+
+
+@functools.lru_cache(maxsize=64)
+def log_day_start(date: bytes) -> int:
+    return timegm((int(date[0:4]), int(date[5:7]), int(date[8:10]), 0, 0, 0))
+
+
+def parse_log_timestamp(stamp: bytes) -> int:
+    """
+    Convert a syz-manager log timestamp (b"2025/09/05 20:00:03") to seconds since
+    the epoch. The log has no timezone, so it is read as UTC; only differences
+    between timestamps are meaningful.
+    """
+    return (
+        log_day_start(stamp[:10])
+        + int(stamp[11:13]) * 3600
+        + int(stamp[14:16]) * 60
+        + int(stamp[17:19])
+    )
+
+
+def find_logs(paths: list[Path], include_segments: bool = True) -> list[Path]:
+    """
+    Return the given log files, plus every syz-manager log (including rotated
+    segments, unless include_segments is False) found recursively under the
+    given directories.
+    """
+    logs = []
+    for path in paths:
+        if path.is_dir():
+            logs.extend(
+                sorted(
+                    p
+                    for p in path.rglob("*")
+                    if p.is_file()
+                    and LOG_FILE_RE.match(p.name)
+                    and (include_segments or p.suffix == ".log")
+                )
+            )
+        else:
+            logs.append(path)
+    return logs
+
+
+def format_log_timestamp(timestamp: int) -> str:
+    return time.strftime("%Y/%m/%d %H:%M:%S", time.gmtime(timestamp))
@@ -0,0 +1,205 @@
+"""
+Classification of syz-manager log lines and their NDJSON streams.
+"""
+
+import argparse
+import collections
+import os
+import json
+import time
+from pathlib import Path
+
+from .artifacts import open_artifact
+from .constants import (
+    CRASH_LINE_RE,
+    LOG_CATEGORY_LEVELS,
+    LOG_CATEGORY_WORDS,
+    LOG_FLUSH_INTERVAL,
+    LOG_TIMESTAMP_RE,
+    LOG_VM_INDEX_RE,
+    NDJSON_DEFAULT_LEVEL,
+    NDJSON_DEFAULT_RETAIN,
+    NDJSON_SUFFIX,
+    STATS_LINE_RE,
+)
+from .errors import ConfigurationError
+from .log_index import rotated_segments
+from .logs import parse_log_timestamp
+
+
+def classify_log_line(line: bytes) -> tuple[str, dict]:
+    """
+    Return the category of a timestamped syz-manager log line and its NDJSON
+    record: the time, the fields of stats and crash lines, and otherwise the
+    message and, for VM lifecycle lines, the VM index.
+    """
+    timestamp = parse_log_timestamp(line[:19])
+    rest = line[20:]
+    if rest.startswith(b"candidates="):
+        match = STATS_LINE_RE.match(line)
+        if match:
+            rate = int(match.group(6))
+            return "stats", {
+                "t": timestamp,
+                "candidates": int(match.group(2)),
+                "corpus": int(match.group(3)),
+                "coverage": int(match.group(4)),
+                "exec_total": int(match.group(5)),
+                "exec_per_sec": rate if match.group(7) == b"sec" else rate / 60,
+            }
+    word = rest.split(b" ", 1)[0]
+    if word == b"VM":
+        match = CRASH_LINE_RE.match(line)
+        if match:
+            record = {"t": timestamp, "vm": int(match.group(2)), "title": match.group(4).decode(errors="replace")}
+            if match.group(3):
+                record["kind"] = match.group(3).decode()
+            return "crash", record
+    if word == b"running":
+        category = "ssh" if rest.startswith(b"running ssh") else "vm"
+    else:
+        category = LOG_CATEGORY_WORDS.get(word, "manager")
+    record = {"t": timestamp, "msg": rest.decode(errors="replace")}
+    if category == "vm":
+        match = LOG_VM_INDEX_RE.match(rest)
+        if match:
+            record["vm"] = int(match.group(1))
+    return category, record
+
+
+class NdjsonLogSink:
+    """
+    Line handler writing syz-manager log lines as compact NDJSON records, one
+    stream per category (<log stem>.<category>.ndjson), so that tools can read
+    only the crashes or the stats. Lines without timestamp (crash reports, ssh
+    debug output, machine check tables) are added to the "more" list of the
+    record they follow, which is written once the next record starts.
+    Categories whose LOG_CATEGORY_LEVELS exceed level are dropped, and a stream
+    that grows past its retain bytes is rotated to .1, replacing the previous
+    one.
+    """
+
+    def __init__(self, log_file: Path, level: int = NDJSON_DEFAULT_LEVEL, retain: dict | None = None):
+        self.log_file = log_file
+        self.level = level
+        self.retain = NDJSON_DEFAULT_RETAIN if retain is None else retain
+        self.streams = {}  # category -> [file, size]
+        self.counts = collections.Counter()
+        self.pending = None  # (category, record), or None when dropping
+        self.last_flush = time.monotonic()
+
+    def stream_path(self, category: str) -> Path:
+        return self.log_file.with_name(f"{self.log_file.stem}.{category}{NDJSON_SUFFIX}")
+
+    def feed(self, line: bytes):
+        line = line.rstrip(b"\r\n")
+        if not LOG_TIMESTAMP_RE.match(line):
+            if self.pending is not None:
+                self.pending[1].setdefault("more", []).append(line.decode(errors="replace"))
+            elif line and not self.counts:
+                # Output before the first timestamped line
+                self.pending = ("manager", {"msg": line.decode(errors="replace")})
+            return
+        self.emit()
+        category, record = classify_log_line(line)
+        if LOG_CATEGORY_LEVELS[category] <= self.level:
+            self.pending = (category, record)
+        self.counts[category] += 1
+        if time.monotonic() - self.last_flush >= LOG_FLUSH_INTERVAL:
+            self.flush()
+
+    def emit(self):
+        if self.pending is None:
+            return
+        category, record = self.pending
+        self.pending = None
+        data = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+        stream = self.streams.get(category)
+        if stream is None:
+            stream = self.streams[category] = [open(self.stream_path(category), "ab"), 0]
+            stream[1] = stream[0].tell()
+        retain = self.retain.get(category, 0)
+        if retain and stream[1] + len(data) > retain:
+            stream[0].close()
+            path = self.stream_path(category)
+            os.replace(path, path.with_name(path.name + ".1"))
+            stream[:] = [open(path, "ab"), 0]
+        stream[0].write(data)
+        stream[1] += len(data)
+
+    def flush(self):
+        for file, _ in self.streams.values():
+            file.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.emit()
+        for file, _ in self.streams.values():
+            file.close()
+        self.streams = {}
+
+
+def parse_retain(values: list[str]) -> dict[str, int]:
+    retain = dict(NDJSON_DEFAULT_RETAIN)
+    for value in values:
+        category, _, size = value.partition("=")
+        if category not in LOG_CATEGORY_LEVELS or not size.isdigit():
+            raise ConfigurationError(
+                f"Invalid retention {value!r}, expected CATEGORY=BYTES with a category "
+                f"in {', '.join(LOG_CATEGORY_LEVELS)}"
+            )
+        retain[category] = int(size)
+    return retain
+
+
+def ndjson_main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="invoke-syz-manager.py ndjson",
+        description="Split existing syz-manager logs, with their rotated segments, "
+        f"into per-category <log stem>.<category>{NDJSON_SUFFIX} streams next to "
+        "them. Categories: "
+        + ", ".join(f"{c} (level {l})" for c, l in LOG_CATEGORY_LEVELS.items()),
+    )
+    parser.add_argument("logs", nargs="+", help="syz-manager log files")
+    parser.add_argument(
+        "--level",
+        type=int,
+        default=NDJSON_DEFAULT_LEVEL,
+        help=f"Keep the categories up to this level (default: {NDJSON_DEFAULT_LEVEL})",
+    )
+    parser.add_argument(
+        "--retain",
+        action="append",
+        default=[],
+        metavar="CATEGORY=BYTES",
+        help="Rotate the stream of a category past this size, 0 to never rotate "
+        "(repeatable; default: "
+        + ", ".join(f"{c}={b}" for c, b in NDJSON_DEFAULT_RETAIN.items())
+        + ")",
+    )
+    args = parser.parse_args(argv)
+    retain = parse_retain(args.retain)
+
+    for log in args.logs:
+        log_file = Path(log)
+        start = time.perf_counter()
+        sink = NdjsonLogSink(log_file, args.level, retain)
+        for category in LOG_CATEGORY_LEVELS:
+            path = sink.stream_path(category)
+            path.unlink(missing_ok=True)
+            path.with_name(path.name + ".1").unlink(missing_ok=True)
+        size = 0
+        for path in rotated_segments(log_file) + [log_file]:
+            with open_artifact(path) as f:
+                for line in f:
+                    size += len(line)
+                    sink.feed(line)
+        sink.close()
+        written = [c for c in LOG_CATEGORY_LEVELS if sink.stream_path(c).exists()]
+        out_size = sum(sink.stream_path(c).stat().st_size for c in written)
+        counts = ", ".join(f"{c} {n}" for c, n in sink.counts.most_common())
+        print(
+            f"[write] {len(written)} streams for {log_file}, {out_size / 2**20:.1f} of "
+            f"{size / 2**20:.1f} MiB ({counts}) in {time.perf_counter() - start:.3f}s"
+        )
+    return 0
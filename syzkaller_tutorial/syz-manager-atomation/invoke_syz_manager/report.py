@@ -0,0 +1,203 @@
+"""
+Comparison of the metrics of fuzzing runs.
+"""
+
+import argparse
+import bisect
+import math
+import re
+import statistics
+from pathlib import Path
+
+from .errors import ConfigurationError
+from .log_index import update_log_index
+from .logs import find_logs
+from .stats import StatsSeries
+
+
+def parse_duration(value: str) -> int:
+    """
+    Parse a duration such as 90 (seconds), 30m, 6h or 2d into seconds.
+    """
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    try:
+        if value[-1] in units:
+            return int(float(value[:-1]) * units[value[-1]])
+        return int(value)
+    except (ValueError, IndexError):
+        raise ConfigurationError(f"Invalid duration {value!r}, expected e.g. 90, 30m, 6h or 2d")
+
+
+def load_run(path: Path) -> tuple[StatsSeries, dict[str, int]]:
+    """
+    Load the stats and crashes of a run: a log, or a directory whose logs, the
+    restarts of one run, are joined in time order. The logs are indexed in
+    memory, reusing the stored index of a log if the index command made one,
+    so that the runs reported on are left as they are. Returns the stats
+    series, with exec total and crashes counted across the logs, and
+    {crash title: first timestamp}.
+    """
+    logs = find_logs([path], include_segments=False)
+    if not logs:
+        raise ConfigurationError(f"No syz-manager logs found in {path}")
+    parts = []
+    first_crashes: dict[str, int] = {}
+    for log_file in logs:
+        series = StatsSeries()
+        index, _ = update_log_index(log_file, series)
+        for title, entry in index["crashes"].items():
+            first_crashes[title] = min(entry[2], first_crashes.get(title, entry[2]))
+        if len(series):
+            parts.append(series)
+
+    run = StatsSeries()
+    for series in sorted(parts, key=lambda series: series.columns["timestamp"][0]):
+        for name, column in run.columns.items():
+            if name in ("exec_total", "crashes") and column:
+                offset = column[-1]
+                column.extend(value + offset for value in series.columns[name])
+            else:
+                column.extend(series.columns[name])
+    return run, first_crashes
+
+
+def run_metrics(
+    series: StatsSeries,
+    first_crashes: dict[str, int],
+    title_re: re.Pattern | None,
+    checkpoints: list[tuple[str, int]],
+    window: int,
+) -> dict[str, float | None]:
+    """
+    Compute the report metrics of one run, on time elapsed since its first
+    stats sample. The first crash time is infinite if the run never hit the
+    title, and metrics at checkpoints past the end of the run are None.
+    """
+    timestamps = series.columns["timestamp"]
+    exec_totals = series.columns["exec_total"]
+    coverage = series.columns["coverage"]
+    start = timestamps[0]
+    duration = timestamps[-1] - start
+    metrics: dict[str, float | None] = {"duration_h": duration / 3600}
+    if title_re is not None:
+        hits = [when for title, when in first_crashes.items() if title_re.search(title)]
+        metrics["first_crash_h"] = (min(hits) - start) / 3600 if hits else math.inf
+    metrics["exec_per_sec"] = (exec_totals[-1] - exec_totals[0]) / duration if duration else None
+
+    for label, elapsed in checkpoints:
+        end = bisect.bisect_right(timestamps, start + elapsed) - 1
+        if elapsed > duration:
+            metrics[f"coverage@{label}"] = metrics[f"exec_per_sec@{label}"] = None
+            continue
+        begin = bisect.bisect_left(timestamps, start + elapsed - window)
+        metrics[f"coverage@{label}"] = coverage[end]
+        # No rate if the window falls into a gap between two logs of the run
+        metrics[f"exec_per_sec@{label}"] = (
+            (exec_totals[end] - exec_totals[begin]) / (timestamps[end] - timestamps[begin])
+            if begin < end
+            else None
+        )
+    return metrics
+
+
+def format_metric(value: float | None) -> str:
+    if value is None:
+        return "-"
+    if math.isinf(value):
+        return "never"
+    return f"{value:.1f}" if abs(value) < 1000 else f"{value:.0f}"
+
+
+def report_main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="invoke-syz-manager.py report",
+        description="Compare repeated syz-manager runs: time to the first crash with a "
+        "title, exec/sec and coverage at points of elapsed time, as the median, "
+        "minimum and maximum across the runs of each group. A run is a log or a "
+        "directory with the logs of its restarts.",
+    )
+    parser.add_argument("runs", nargs="*", help="Runs of the default group")
+    parser.add_argument(
+        "--group",
+        nargs="+",
+        action="append",
+        default=[],
+        metavar=("NAME", "RUN"),
+        help="A named group of runs, e.g. --group instrumented run_1 run_2 (repeatable)",
+    )
+    parser.add_argument(
+        "--title", help="Regex of the crash title whose first occurrence is timed"
+    )
+    parser.add_argument(
+        "--at",
+        default="1h,6h,24h,72h",
+        help="Comma-separated elapsed times of the coverage and exec/sec columns "
+        "(default: 1h,6h,24h,72h)",
+    )
+    parser.add_argument(
+        "--window",
+        default="30m",
+        help="Window over which exec/sec is averaged at each time (default: 30m)",
+    )
+    parser.add_argument(
+        "--per-run", action="store_true", help="Also print the metrics of every run"
+    )
+    args = parser.parse_args(argv)
+
+    groups = [("runs", args.runs)] if args.runs else []
+    for name, *runs in args.group:
+        if not runs:
+            parser.error(f"group {name} has no runs")
+        groups.append((name, runs))
+    if not groups:
+        parser.error("no runs given")
+    title_re = re.compile(args.title) if args.title else None
+    checkpoints = [(label, parse_duration(label)) for label in args.at.split(",")]
+    window = parse_duration(args.window)
+
+    # {(group, run): metrics}
+    results: dict[tuple[str, str], dict] = {}
+    for name, runs in groups:
+        for run in runs:
+            series, first_crashes = load_run(Path(run))
+            if not len(series):
+                print(f"[warning] {run} has no stats samples, skipped")
+                continue
+            results[name, run] = run_metrics(series, first_crashes, title_re, checkpoints, window)
+    if not results:
+        raise ConfigurationError("None of the runs has stats samples")
+
+    metric_names = list(next(iter(results.values())))
+    group_width = max(len(name) for name, _ in groups)
+    print(
+        f"{'metric':<22} {'group':<{group_width}} {'runs':>5} "
+        f"{'median':>10} {'min':>10} {'max':>10}"
+    )
+    for metric in metric_names:
+        for name, _ in groups:
+            values = [
+                metrics[metric]
+                for (group, _), metrics in results.items()
+                if group == name and metrics[metric] is not None
+            ]
+            if not values:
+                continue
+            runs = sum(group == name for group, _ in results)
+            count = (
+                f"{sum(not math.isinf(v) for v in values)}/{runs}"
+                if metric == "first_crash_h"
+                else str(len(values))
+            )
+            print(
+                f"{metric:<22} {name:<{group_width}} {count:>5} "
+                f"{format_metric(statistics.median(values)):>10} "
+                f"{format_metric(min(values)):>10} {format_metric(max(values)):>10}"
+            )
+
+    if args.per_run:
+        print()
+        for (name, run), metrics in results.items():
+            print(f"{name} {run}: " + ", ".join(
+                f"{metric}={format_metric(value)}" for metric, value in metrics.items()
+            ))
+    return 0
@@ -0,0 +1,196 @@
+"""
+Restoring the Linux and syzkaller trees a reproduction package was made from.
+"""
+
+import argparse
+import hashlib
+import subprocess
+import json
+import time
+from pathlib import Path
+
+from .artifacts import describe_mismatch, find_artifact, open_artifact, read_artifact_text
+from .config import load_source_paths, modify_cfg
+from .constants import (
+    LAUNCHER_PATH,
+    LINUX_COMMIT_FILENAME,
+    LINUX_CONFIG_FILENAME,
+    LINUX_DIFF_FILENAME,
+    REAL_CFG_FILENAME,
+    REPRO_PACKAGE_DIRNAME,
+    SYZKALLER_COMMIT_FILENAME,
+    SYZKALLER_DIFF_FILENAME,
+)
+from .errors import ConfigurationError, ReproductionError
+from .history import has_commit
+from .tracing import check_subprocess_output, run_subprocess
+
+
+def restore_tree(repo: Path, history_info: dict, patch: bytes, out_dir: Path, name: str) -> Path:
+    """
+    Restore the tree a package was made from as a detached git worktree of repo
+    under out_dir, sharing its object store. If repo still has the recorded HEAD
+    commit, the worktree checks it out; otherwise it checks out the recorded
+    ancestor, and the stored patch is applied and committed on top. Trees are
+    named after the state they restore, so packages made from the same state
+    share one, and an existing tree is reused. The diff from the ancestor is
+    then checked against the stored patch.
+    """
+    ancestor = history_info["last_ancestor"]["hash"]
+    commits = history_info["difference"]["commits"]
+    head = commits[0]["hash"] if commits else ancestor
+    if has_commit(repo, head):
+        rev, apply_patch = head, False
+        tree = out_dir / f"{name}-{head[:12]}"
+    elif has_commit(repo, ancestor):
+        rev, apply_patch = ancestor, bool(patch)
+        key = hashlib.sha256(ancestor.encode() + patch).hexdigest()
+        tree = out_dir / f"{name}-{ancestor[:12]}-{key[:8]}"
+    else:
+        where = history_info["last_ancestor"].get("tag") or history_info["last_ancestor"].get(
+            "upstream"
+        )
+        raise ConfigurationError(
+            f"{repo} has neither the HEAD {head} nor the ancestor {ancestor} of the "
+            f"package, fetch {where} into it first."
+        )
+
+    if tree.exists():
+        print(f"[restore] reusing {tree}")
+    else:
+        check_subprocess_output(
+            ["git", "-C", str(repo), "worktree", "add", "-q", "--detach", str(tree), rev]
+        )
+        if apply_patch:
+            run_subprocess(
+                ["git", "-C", str(tree), "apply", "--index"], input=patch, check=True
+            )
+            check_subprocess_output(
+                [
+                    "git",
+                    "-C",
+                    str(tree),
+                    "-c",
+                    "user.name=invoke-syz-manager",
+                    "-c",
+                    "user.email=invoke-syz-manager@localhost",
+                    "commit",
+                    "-q",
+                    "--no-verify",
+                    "-m",
+                    f"Restore {len(commits)} commits from {ancestor}",
+                ]
+            )
+        print(
+            f"[restore] {tree} at {rev[:12]}"
+            + (f" with the {len(commits)} commits applied as one" if apply_patch else "")
+        )
+
+    restored_patch = run_subprocess(
+        ["git", "-C", str(tree), "diff", f"{ancestor}..HEAD"], stdout=subprocess.PIPE
+    ).stdout
+    if commits and restored_patch != patch:
+        raise ReproductionError(
+            f"Diff of {tree} from {ancestor} does not match the package patch; "
+            "it may contain binary changes that the patch does not carry."
+        )
+    return tree
+
+
+def restore_package(
+    package: Path, linux_src: Path, syzkaller_src: Path, out_dir: Path
+) -> tuple[Path, Path, Path]:
+    """
+    Restore the Linux and syzkaller trees of a work dir or repro_package as
+    worktrees of the given repos, put the package .config in the Linux tree,
+    and write a cfg template pointing at them. Return the Linux and syzkaller
+    trees and the template.
+    """
+    repro_dir = package / REPRO_PACKAGE_DIRNAME
+    if not repro_dir.is_dir():
+        repro_dir = package
+    trees = {}
+    for name, repo, commit_filename, diff_filename in [
+        ("linux", linux_src, LINUX_COMMIT_FILENAME, LINUX_DIFF_FILENAME),
+        ("syzkaller", syzkaller_src, SYZKALLER_COMMIT_FILENAME, SYZKALLER_DIFF_FILENAME),
+    ]:
+        commit_file = find_artifact(repro_dir / commit_filename)
+        if commit_file is None:
+            raise ConfigurationError(f"{repro_dir} has no {commit_filename}")
+        history_info = json.loads(read_artifact_text(commit_file))
+        patch_file = find_artifact(repro_dir / diff_filename)
+        patch = b""
+        if patch_file is not None:
+            with open_artifact(patch_file) as f:
+                patch = f.read()
+        trees[name] = restore_tree(repo, history_info, patch, out_dir, name)
+
+    config_file = find_artifact(repro_dir / LINUX_CONFIG_FILENAME)
+    if config_file is None:
+        raise ConfigurationError(f"{repro_dir} has no {LINUX_CONFIG_FILENAME}")
+    expected_config = read_artifact_text(config_file)
+    restored_config = trees["linux"] / LINUX_CONFIG_FILENAME
+    if not restored_config.exists():
+        restored_config.write_text(expected_config)
+    elif restored_config.read_text() != expected_config:
+        # A reused tree whose .config was changed since it was restored
+        raise ReproductionError(describe_mismatch(restored_config, expected_config))
+
+    cfg_file = find_artifact(repro_dir / REAL_CFG_FILENAME)
+    if cfg_file is None:
+        raise ConfigurationError(f"{repro_dir} has no {REAL_CFG_FILENAME}")
+    config = json.loads(read_artifact_text(cfg_file))
+    template = out_dir / f"{repro_dir.resolve().parent.name}.cfg"
+    template.write_text(
+        json.dumps(
+            modify_cfg(config, Path(config["workdir"]), trees["syzkaller"], trees["linux"]),
+            indent=4,
+        )
+    )
+    return trees["linux"], trees["syzkaller"], template
+
+
+def restore_main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="invoke-syz-manager.py restore",
+        description="Recreate the Linux and syzkaller trees recorded in repro packages "
+        "as git worktrees of local repos, which share their object stores, so no "
+        "clone is needed. The recorded HEAD is checked out if the repo still has it, "
+        "else the recorded ancestor with the package patch applied. Each package gets "
+        "a cfg template pointing at its trees, and its .config is put in its Linux tree.",
+    )
+    parser.add_argument(
+        "packages", nargs="+", type=Path, help="Work dirs or repro_package dirs to restore"
+    )
+    parser.add_argument(
+        "-o", "--output", required=True, type=Path, help="Directory to restore into"
+    )
+    parser.add_argument("--linux-src", help="Linux repo to add the worktrees to")
+    parser.add_argument("--syzkaller-src", help="syzkaller repo to add the worktrees to")
+    parser.add_argument(
+        "--config",
+        default="config.json",
+        help="Path to the configuration file (default: config.json)",
+    )
+    args = parser.parse_args(argv)
+
+    linux_src, syzkaller_src, _ = load_source_paths(
+        args.linux_src, args.syzkaller_src, Path(args.config)
+    )
+    out_dir = args.output.resolve()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    for package in args.packages:
+        linux, syzkaller, template = restore_package(
+            package, Path(linux_src), Path(syzkaller_src), out_dir
+        )
+        print(
+            f"[ok] {package} restored, relaunch with: {LAUNCHER_PATH.name} "
+            f"--linux-src {linux} --syzkaller-src {syzkaller} --cfg-template {template} "
+            f"--work-name <new work name>"
+        )
+    print(
+        f"[restore] {len(args.packages)} packages in {time.perf_counter() - start:.1f}s; "
+        "the kernels still have to be built. Remove the trees with git worktree remove."
+    )
+    return 0
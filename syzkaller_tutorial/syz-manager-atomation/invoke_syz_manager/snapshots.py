@@ -0,0 +1,224 @@
+"""
+Point-in-time copies of work trees, and forks of a work tree from them.
+"""
+
+import argparse
+import collections
+import os
+import shutil
+import json
+import time
+from pathlib import Path
+
+from .constants import (
+    CORPUS_FILENAME,
+    CRASHES_DIRNAME,
+    PREVIOUS_RUN_PREFIX,
+    SNAPSHOTS_DIRNAME,
+    SNAPSHOT_FILENAME,
+    SNAPSHOT_TMP_SUFFIX,
+)
+from .errors import ConfigurationError
+from .files import clone_or_copy, write_file_atomically
+from .logs import format_log_timestamp
+
+
+def snapshot_sources(work_dir: Path) -> list[Path]:
+    """
+    Return the files of the work dir state captured by snapshots: corpus.db
+    and everything under crashes/.
+    """
+    sources = []
+    if (work_dir / CORPUS_FILENAME).exists():
+        sources.append(work_dir / CORPUS_FILENAME)
+    crashes = work_dir / CRASHES_DIRNAME
+    if crashes.is_dir():
+        sources += sorted(path for path in crashes.rglob("*") if path.is_file())
+    return sources
+
+
+def find_snapshots(work_dir: Path) -> list[tuple[Path, dict]]:
+    """
+    Return the snapshots of a work dir (in snapshots/ and the previous_run_N
+    dirs) with their metadata, oldest first.
+    """
+    snapshots = []
+    for snapshot_dir in list(work_dir.glob(f"{SNAPSHOTS_DIRNAME}/*")) + list(
+        work_dir.glob(f"{PREVIOUS_RUN_PREFIX}*")
+    ):
+        try:
+            metadata = json.loads((snapshot_dir / SNAPSHOT_FILENAME).read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        snapshots.append((snapshot_dir, metadata))
+    return sorted(snapshots, key=lambda snapshot: snapshot[1]["created"])
+
+
+def snapshot_work_dir(work_dir: Path, snapshot_dir: Path, move_corpus: bool = False) -> dict[str, int]:
+    """
+    Capture the corpus.db and crashes of work_dir into snapshot_dir, and return
+    how many files were reflinked, hardlinked, copied and moved.
+
+    Files are reflinked where the filesystem supports it, so that the snapshot
+    takes no space until the work dir copy changes, and copied in chunks
+    otherwise. Hardlinks are only made to the previous snapshot, for files
+    unchanged since it (same inode, size and modification time), since
+    syz-manager rewrites its files in place but snapshots are never written
+    to. With move_corpus, corpus.db is moved into the snapshot instead. The
+    snapshot is built in a temporary dir and renamed into place, so it is
+    either complete or absent; on an error, a moved corpus.db is moved back.
+    """
+    previous = find_snapshots(work_dir)
+    previous_dir, previous_metadata = previous[-1] if previous else (None, {"files": {}})
+    tmp_dir = snapshot_dir.with_name(snapshot_dir.name + SNAPSHOT_TMP_SUFFIX)
+    recover_stranded_corpus(work_dir)
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    files = {}
+    counts = collections.Counter()
+    moved = None
+    try:
+        for src in snapshot_sources(work_dir):
+            name = str(src.relative_to(work_dir))
+            st = src.stat()
+            files[name] = [st.st_ino, st.st_size, st.st_mtime_ns]
+            dst = tmp_dir / name
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            if move_corpus and name == CORPUS_FILENAME:
+                src.rename(dst)
+                moved = (dst, src)
+                counts["moved"] += 1
+                continue
+            if previous_metadata["files"].get(name) == files[name]:
+                try:
+                    os.link(previous_dir / name, dst)
+                    counts["hardlinked"] += 1
+                    continue
+                except OSError:
+                    pass
+            counts["reflinked" if clone_or_copy(src, dst) else "copied"] += 1
+
+        write_file_atomically(
+            tmp_dir / SNAPSHOT_FILENAME,
+            json.dumps(
+                {"work_dir": str(work_dir.resolve()), "created": time.time(), "files": files},
+                indent=4,
+            ).encode(),
+        )
+        tmp_dir.rename(snapshot_dir)
+    except BaseException:
+        if moved is not None:
+            moved[0].rename(moved[1])
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return counts
+
+
+def recover_stranded_corpus(work_dir: Path):
+    """
+    Move corpus.db back into a work dir that has none from the temporary dir
+    of a snapshot with move_corpus that was killed before it could finish.
+    """
+    if (work_dir / CORPUS_FILENAME).exists():
+        return
+    for tmp_dir in work_dir.glob(f"*{SNAPSHOT_TMP_SUFFIX}"):
+        stranded = tmp_dir / CORPUS_FILENAME
+        if stranded.is_file():
+            stranded.rename(work_dir / CORPUS_FILENAME)
+            print(f"[snapshot] recovered {work_dir / CORPUS_FILENAME} from {tmp_dir}")
+            return
+
+
+def fork_snapshot(snapshot_dir: Path, new_work_dir: Path) -> dict[str, int]:
+    """
+    Create new_work_dir with the corpus.db and crashes of a snapshot, reflinked
+    where possible and copied otherwise (never hardlinked, syz-manager will
+    write to them), and return how many files were reflinked and copied.
+    """
+    metadata = json.loads((snapshot_dir / SNAPSHOT_FILENAME).read_text())
+    new_work_dir.mkdir(parents=False)
+    counts = collections.Counter()
+    for name in metadata["files"]:
+        dst = new_work_dir / name
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        counts["reflinked" if clone_or_copy(snapshot_dir / name, dst) else "copied"] += 1
+    return counts
+
+
+def format_snapshot_counts(counts: dict[str, int]) -> str:
+    return ", ".join(f"{n} files {how}" for how, n in counts.items()) or "no files"
+
+
+def snapshot_main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="invoke-syz-manager.py snapshot",
+        description="Capture the corpus.db and crashes of a work dir, even while it "
+        f"is fuzzing, into <work dir>/{SNAPSHOTS_DIRNAME}/<name>. Files are reflinked "
+        "where the filesystem supports it and copied otherwise, and files unchanged "
+        "since the previous snapshot are hardlinked to it.",
+    )
+    parser.add_argument("work_dir", type=Path, help="Work dir to snapshot")
+    parser.add_argument(
+        "--name", help="Snapshot name (default: the current time, YYYYmmdd-HHMMSS)"
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List the snapshots of the work dir instead"
+    )
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for snapshot_dir, metadata in find_snapshots(args.work_dir):
+            size = sum(entry[1] for entry in metadata["files"].values())
+            print(
+                f"{format_log_timestamp(int(metadata['created']))}  "
+                f"{len(metadata['files']):6} files {size / 2**20:9.1f} MiB  {snapshot_dir}"
+            )
+        return 0
+
+    if not snapshot_sources(args.work_dir):
+        raise ConfigurationError(f"{args.work_dir} has no {CORPUS_FILENAME} or {CRASHES_DIRNAME}")
+    snapshot_dir = args.work_dir / SNAPSHOTS_DIRNAME / (args.name or time.strftime("%Y%m%d-%H%M%S"))
+    if snapshot_dir.exists():
+        raise ConfigurationError(f"Snapshot {snapshot_dir} already exists")
+    start = time.perf_counter()
+    counts = snapshot_work_dir(args.work_dir, snapshot_dir)
+    print(
+        f"[snapshot] {snapshot_dir}: {format_snapshot_counts(counts)} in "
+        f"{time.perf_counter() - start:.2f}s"
+    )
+    return 0
+
+
+def fork_main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="invoke-syz-manager.py fork",
+        description="Start a new work dir from the corpus.db and crashes of a snapshot, "
+        "or of a work dir, which is snapshotted first. Launch it with --work-name to "
+        "continue fuzzing from that state, e.g. with another cfg template.",
+    )
+    parser.add_argument("source", type=Path, help="Snapshot dir, or work dir")
+    parser.add_argument("new_work_dir", type=Path, help="Work dir to create")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    snapshot_dir = args.source
+    if not (snapshot_dir / SNAPSHOT_FILENAME).exists():
+        if not snapshot_sources(args.source):
+            raise ConfigurationError(
+                f"{args.source} is neither a snapshot nor a work dir with a "
+                f"{CORPUS_FILENAME} or {CRASHES_DIRNAME}"
+            )
+        snapshot_dir = args.source / SNAPSHOTS_DIRNAME / f"fork-{args.new_work_dir.name}"
+        if snapshot_dir.exists():
+            raise ConfigurationError(f"Snapshot {snapshot_dir} already exists")
+        counts = snapshot_work_dir(args.source, snapshot_dir)
+        print(f"[snapshot] {snapshot_dir}: {format_snapshot_counts(counts)}")
+    if args.new_work_dir.exists():
+        raise ConfigurationError(f"{args.new_work_dir} already exists")
+    counts = fork_snapshot(snapshot_dir, args.new_work_dir)
+    print(
+        f"[fork] {args.new_work_dir} from {snapshot_dir}: {format_snapshot_counts(counts)} "
+        f"in {time.perf_counter() - start:.2f}s; launch it with --work-name {args.new_work_dir}"
+    )
+    return 0
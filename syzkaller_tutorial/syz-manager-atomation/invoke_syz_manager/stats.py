@@ -0,0 +1,167 @@
+"""
+Time series of the periodic syz-manager stats lines.
+"""
+
+import argparse
+import time
+from pathlib import Path
+from array import array
+
+from .artifacts import open_artifact
+from .constants import CRASH_LINE_RE, STATS_FILE_SUFFIX, STATS_LINE_RE
+from .crashes import parse_crash_line
+from .logs import parse_log_timestamp
+
+
+class StatsSeries:
+    """
+    Time series of the periodic syz-manager stats lines, stored column-wise in
+    arrays. crashes is the number of crashes seen up to each sample; tail
+    reports are not crashes, see parse_crash_line.
+    """
+
+    COLUMNS = (
+        "timestamp",
+        "candidates",
+        "corpus",
+        "coverage",
+        "exec_total",
+        "exec_per_sec",
+        "crashes",
+    )
+
+    def __init__(self):
+        self.columns = {
+            name: array("d" if name == "exec_per_sec" else "q") for name in self.COLUMNS
+        }
+        self.crashes = 0
+
+    def __len__(self) -> int:
+        return len(self.columns["timestamp"])
+
+    def feed(self, line: bytes) -> bool:
+        """
+        Parse one log line. Returns True if it added a sample to the series.
+        """
+        if b"exec total=" in line:
+            match = STATS_LINE_RE.match(line)
+            if match is None:
+                return False
+            stamp, candidates, corpus, coverage, exec_total, rate, unit = match.groups()
+            self.append(
+                (
+                    parse_log_timestamp(stamp),
+                    int(candidates),
+                    int(corpus),
+                    int(coverage),
+                    int(exec_total),
+                    int(rate) / 60 if unit == b"min" else float(rate),
+                    self.crashes,
+                )
+            )
+            return True
+        if b": crash" in line:
+            match = CRASH_LINE_RE.match(line)
+            if match is not None and not parse_crash_line(match)[4]:
+                self.crashes += 1
+        return False
+
+    def append(self, row: tuple):
+        for name, value in zip(self.COLUMNS, row):
+            self.columns[name].append(value)
+
+    def row(self, index: int) -> tuple:
+        return tuple(self.columns[name][index] for name in self.COLUMNS)
+
+    def write_csv(self, path: Path):
+        with open(path, "w") as f:
+            f.write(",".join(self.COLUMNS) + "\n")
+            for index in range(len(self)):
+                f.write(format_stats_row(self.row(index)))
+
+    @classmethod
+    def read_csv(cls, path: Path) -> "StatsSeries":
+        series = cls()
+        with open(path) as f:
+            next(f)
+            for line in f:
+                values = line.split(",")
+                series.append(
+                    tuple(
+                        float(value) if name == "exec_per_sec" else int(value)
+                        for name, value in zip(cls.COLUMNS, values)
+                    )
+                )
+        if len(series):
+            series.crashes = series.columns["crashes"][-1]
+        return series
+
+
+def format_stats_row(row: tuple) -> str:
+    return ",".join(f"{value:g}" if isinstance(value, float) else str(value) for value in row) + "\n"
+
+
+def stats_path_for_log(log_file: Path) -> Path:
+    """
+    Return the stats file that belongs to a log, e.g. syz-manager_1.stats.csv
+    for syz-manager_1.log.
+    """
+    return log_file.with_name(log_file.stem + STATS_FILE_SUFFIX)
+
+
+def parse_stats_log(log_file: Path) -> StatsSeries:
+    series = StatsSeries()
+    with open_artifact(log_file) as f:
+        for line in f:
+            series.feed(line)
+    return series
+
+
+class StatsRecorder:
+    """
+    Supervisor line handler that appends each new stats sample to stats_path
+    as soon as syz-manager prints it.
+    """
+
+    def __init__(self, stats_path: Path):
+        self.series = StatsSeries()
+        self.file = open(stats_path, "w")
+        self.file.write(",".join(StatsSeries.COLUMNS) + "\n")
+        self.file.flush()
+
+    def feed(self, line: bytes):
+        if self.series.feed(line):
+            self.file.write(format_stats_row(self.series.row(len(self.series) - 1)))
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def stats_main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="invoke-syz-manager.py stats",
+        description="Extract the stats time series of existing syz-manager logs "
+        f"into <log name>{STATS_FILE_SUFFIX} files next to them.",
+    )
+    parser.add_argument("logs", nargs="+", help="syz-manager log files")
+    args = parser.parse_args(argv)
+
+    for log in args.logs:
+        log_file = Path(log)
+        start = time.perf_counter()
+        series = parse_stats_log(log_file)
+        stats_path = stats_path_for_log(log_file)
+        series.write_csv(stats_path)
+        elapsed = time.perf_counter() - start
+        if len(series):
+            last = series.row(len(series) - 1)
+            duration = last[0] - series.columns["timestamp"][0]
+            print(
+                f"[write] {stats_path} ({len(series)} samples over {duration}s, "
+                f"coverage={last[3]} exec total={last[4]} crashes={last[6]}, "
+                f"parsed in {elapsed:.3f}s)"
+            )
+        else:
+            print(f"[warning] no stats lines found in {log_file}")
+    return 0
@@ -0,0 +1,252 @@
+"""
+Status of work trees against the current Linux and syzkaller trees.
+"""
+
+import argparse
+import hashlib
+import os
+import json
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from .artifacts import find_artifact, find_stale_artifacts, read_artifact_text
+from .cache import get_provenance_cache_entry, read_cached_provenance
+from .config import get_linux_config
+from .constants import (
+    CACHE_DIR,
+    CORPUS_FILENAME,
+    LINUX_COMMIT_FILENAME,
+    LINUX_CONFIG_FILENAME,
+    REAL_CFG_FILENAME,
+    REPRO_PACKAGE_DIRNAME,
+    SYZKALLER_COMMIT_FILENAME,
+)
+from .errors import ConfigurationError
+from .files import write_file_atomically
+from .history import get_linux_history_info, get_repo_fingerprint, get_syzkaller_history_info
+from .tracing import run_concurrently
+
+
+def get_expected_provenance(
+    linux_src: Path, syzkaller_src: Path, use_cache: bool = True
+) -> dict[str, str]:
+    """
+    Return the expected contents of the provenance artifacts (.config and the
+    commit files) of a package made from the given trees, by file name, using
+    and filling the provenance cache like a launch does.
+    """
+    phases = {"linux_config": (get_linux_config, linux_src)}
+    if use_cache:
+        phases["linux_fingerprint"] = (get_repo_fingerprint, linux_src)
+        phases["syzkaller_fingerprint"] = (get_repo_fingerprint, syzkaller_src)
+    provenance = run_concurrently(phases, {})
+
+    cache_entry = None
+    cached_provenance = None
+    if use_cache:
+        cache_entry = get_provenance_cache_entry(
+            CACHE_DIR,
+            provenance["linux_fingerprint"],
+            provenance["syzkaller_fingerprint"],
+            provenance["linux_config"],
+        )
+        cached_provenance = read_cached_provenance(cache_entry)
+    if cached_provenance is not None:
+        linux_commit, syzkaller_commit = cached_provenance
+    else:
+        history = run_concurrently(
+            {
+                "linux_history": (get_linux_history_info, linux_src),
+                "syzkaller_history": (get_syzkaller_history_info, syzkaller_src),
+            },
+            {},
+        )
+        linux_commit = history["linux_history"]
+        syzkaller_commit = history["syzkaller_history"]
+        if cache_entry is not None:
+            write_file_atomically(
+                cache_entry / LINUX_COMMIT_FILENAME,
+                json.dumps(linux_commit, indent=4).encode(),
+            )
+            write_file_atomically(
+                cache_entry / SYZKALLER_COMMIT_FILENAME,
+                json.dumps(syzkaller_commit, indent=4).encode(),
+            )
+    return {
+        LINUX_CONFIG_FILENAME: provenance["linux_config"],
+        LINUX_COMMIT_FILENAME: json.dumps(linux_commit, indent=4),
+        SYZKALLER_COMMIT_FILENAME: json.dumps(syzkaller_commit, indent=4),
+    }
+
+
+def find_work_dirs(paths: list[Path]) -> list[Path]:
+    """
+    Return the given work dirs, and the work dirs directly inside the other
+    given directories, each once (by real path) in the order first found.
+    """
+    work_dirs = {}
+    for path in paths:
+        if (path / REPRO_PACKAGE_DIRNAME).is_dir():
+            work_dirs[path.resolve()] = None
+        elif path.is_dir():
+            work_dirs.update(
+                dict.fromkeys(
+                    sorted(
+                        child.resolve()
+                        for child in path.iterdir()
+                        if (child / REPRO_PACKAGE_DIRNAME).is_dir()
+                    )
+                )
+            )
+    return list(work_dirs)
+
+
+def get_work_dir_sources(work_dir: Path) -> tuple[Path, Path] | None:
+    """
+    Return the Linux and syzkaller trees the cfg of a work dir points at, or
+    None if it has no readable cfg. Relative trees are taken relative to the
+    cfg, not to the current directory.
+    """
+    cfg_file = find_artifact(work_dir / REPRO_PACKAGE_DIRNAME / REAL_CFG_FILENAME)
+    if cfg_file is None:
+        return None
+    try:
+        cfg = json.loads(read_artifact_text(cfg_file))
+        kernel_src, syzkaller = cfg["kernel_src"], cfg["syzkaller"]
+    except (json.JSONDecodeError, KeyError):
+        return None
+    return (cfg_file.parent / kernel_src).resolve(), (cfg_file.parent / syzkaller).resolve()
+
+
+def work_dir_status(work_dir: Path, expected_digests: dict[str, tuple[str, int]]) -> dict:
+    """
+    Validate a work dir against the digests of its expected provenance
+    artifacts, by file name. Run in the status process pool.
+    """
+    repro_dir = work_dir / REPRO_PACKAGE_DIRNAME
+    corpus = work_dir / CORPUS_FILENAME
+    stale = find_stale_artifacts(
+        repro_dir, {repro_dir / name: digest for name, digest in expected_digests.items()}
+    )
+    return {
+        "work_dir": work_dir,
+        "stale": [fpath.name for fpath, _, _ in stale],
+        "corpus": corpus.stat().st_size if corpus.exists() else None,
+    }
+
+
+def status_main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="invoke-syz-manager.py status",
+        description="Check which work dirs are stale: their .config or commit files "
+        "no longer match the Linux and syzkaller trees their cfg points at, or an "
+        "artifact no longer matches their manifest. The expected provenance is "
+        "computed once per pair of source trees and the work dirs are checked in "
+        "parallel. Work dirs whose trees cannot be read, e.g. not a git checkout or "
+        "without a .config, are reported as errors without stopping the others. "
+        "Exits with status 1 if any work dir is stale or could not be checked.",
+    )
+    parser.add_argument(
+        "paths", nargs="+", type=Path, help="Work dirs, or directories of work dirs"
+    )
+    parser.add_argument(
+        "--linux-src", help="Check against this Linux tree instead of the cfg kernel_src"
+    )
+    parser.add_argument(
+        "--syzkaller-src", help="Check against this syzkaller tree instead of the cfg one"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Do not use the provenance cache in {CACHE_DIR}",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of work dirs checked in parallel (default: number of cores)",
+    )
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    work_dirs = find_work_dirs(args.paths)
+    if not work_dirs:
+        raise ConfigurationError(f"No work dirs found in {[str(p) for p in args.paths]}")
+
+    groups = {}  # (linux tree, syzkaller tree) -> work dirs
+    unreadable = []
+    for work_dir in work_dirs:
+        sources = get_work_dir_sources(work_dir)
+        if sources is None:
+            unreadable.append(work_dir)
+            continue
+        sources = (
+            Path(args.linux_src).resolve() if args.linux_src else sources[0],
+            Path(args.syzkaller_src).resolve() if args.syzkaller_src else sources[1],
+        )
+        groups.setdefault(sources, []).append(work_dir)
+
+    errors = {}  # (linux tree, syzkaller tree) -> why its provenance failed
+
+    def expected_provenance(sources):
+        # A tree that is not a git checkout or has no .config only fails the
+        # work dirs pointing at it
+        try:
+            return get_expected_provenance(*sources, not args.no_cache)
+        except subprocess.CalledProcessError as e:
+            errors[sources] = f"{' '.join(map(str, e.cmd))} exited with status {e.returncode}"
+        except (ConfigurationError, OSError) as e:
+            errors[sources] = str(e)
+        return None
+
+    # Expected provenance once per pair of trees, concurrently as it is mostly
+    # waiting for git
+    with ThreadPoolExecutor(max_workers=max(1, len(groups))) as pool:
+        expected = dict(zip(groups, pool.map(expected_provenance, groups)))
+    tasks = []
+    for sources, group in groups.items():
+        if sources in errors:
+            continue
+        digests = {
+            name: (hashlib.sha256(content.encode()).hexdigest(), len(content.encode()))
+            for name, content in expected[sources].items()
+        }
+        tasks += [(work_dir, digests) for work_dir in group]
+
+    if len(tasks) <= 1 or args.jobs <= 1:
+        results = [work_dir_status(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(args.jobs, len(tasks))) as pool:
+            results = list(pool.map(work_dir_status, *zip(*tasks)))
+
+    print(f"{'state':7} {'corpus':>10}  {'work dir':40} stale artifacts")
+    for result in sorted(results, key=lambda r: r["work_dir"]):
+        corpus = (
+            "missing" if result["corpus"] is None else f"{result['corpus'] / 2**20:.1f} MiB"
+        )
+        state = "stale" if result["stale"] else "valid"
+        print(
+            f"{state:7} {corpus:>10}  {str(result['work_dir']):40} "
+            f"{', '.join(result['stale']) or '-'}"
+        )
+    failed = sorted(
+        (work_dir, reason) for sources, reason in errors.items() for work_dir in groups[sources]
+    )
+    for work_dir, reason in failed:
+        print(f"{'error':7} {'':>10}  {str(work_dir):40} {reason}")
+    for work_dir in unreadable:
+        print(f"{'no cfg':7} {'':>10}  {str(work_dir):40} {REAL_CFG_FILENAME}")
+
+    stale = sum(bool(r["stale"]) for r in results)
+    no_corpus = sum(r["corpus"] is None for r in results)
+    print(
+        f"[{'stale' if stale or failed or unreadable else 'ok'}] {len(work_dirs)} work dirs "
+        f"against {len(groups)} pairs of source trees: "
+        f"{len(results) - stale} valid, {stale} stale, {len(failed)} failed, "
+        f"{len(unreadable)} without cfg, {no_corpus} without corpus "
+        f"({time.perf_counter() - start:.2f}s)"
+    )
+    return 1 if stale or failed or unreadable else 0
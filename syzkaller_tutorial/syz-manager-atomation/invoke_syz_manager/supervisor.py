@@ -0,0 +1,181 @@
+"""
+Running syz-manager with its output fed to a rotating log and line handlers.
+"""
+
+import os
+import sys
+import subprocess
+import select
+import signal
+import threading
+import time
+from pathlib import Path
+
+from . import tracing
+from .constants import (
+    FORWARDED_SIGNALS,
+    LOG_BUFFER_SIZE,
+    LOG_FLUSH_INTERVAL,
+    MANAGER_STOP_GRACE_SECONDS,
+    PIPE_READ_SIZE,
+)
+from .files import compress_file
+from .tracing import manager_trace_recorder
+
+
+class RotatingLogWriter:
+    """
+    Buffered log file that is rotated to path.1, path.2, ... once it grows past
+    max_bytes. Rotated segments are optionally gzipped in a background thread,
+    so that rotation never stalls the writer.
+    """
+
+    def __init__(self, path: Path, max_bytes: int = 0, compress: bool = False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.segment = 0
+        self.compressors = []
+        self.file = open(path, "ab", buffering=LOG_BUFFER_SIZE)
+        self.size = self.file.tell()
+        self.last_flush = time.monotonic()
+
+    def write(self, data: bytes):
+        if self.max_bytes and self.size + len(data) >= self.max_bytes:
+            # Rotate on a line boundary so that no line is split across segments
+            cut = data.rfind(b"\n") + 1
+            if cut:
+                self.file.write(data[:cut])
+                self.rotate()
+                data = data[cut:]
+        self.file.write(data)
+        self.size += len(data)
+        if time.monotonic() - self.last_flush >= LOG_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self.file.flush()
+        self.last_flush = time.monotonic()
+
+    def rotate(self):
+        self.file.close()
+        self.segment += 1
+        segment_path = self.path.with_name(f"{self.path.name}.{self.segment}")
+        os.replace(self.path, segment_path)
+        if self.compress:
+            compressor = threading.Thread(
+                target=compress_file, args=(segment_path,), daemon=True
+            )
+            compressor.start()
+            self.compressors.append(compressor)
+        self.file = open(self.path, "ab", buffering=LOG_BUFFER_SIZE)
+        self.size = 0
+
+    def close(self):
+        self.file.close()
+        for compressor in self.compressors:
+            compressor.join()
+
+
+def supervise_syz_manager(
+    cmd: list[str],
+    log: RotatingLogWriter,
+    line_handlers: list | None = None,
+    echo: bool = True,
+    duration: float | None = None,
+    stop_when=None,
+) -> int:
+    """
+    Run syz-manager as a child process, copying its combined output to the log,
+    and to stdout if echo is set, as soon as it is read. Each complete output line is also
+    passed to the line_handlers, as is a last line left unterminated at exit.
+    Termination signals received by this process are forwarded to syz-manager,
+    which runs in its own session so that a terminal Ctrl+C reaches it only
+    once. If a duration (seconds) is given,
+    syz-manager is interrupted after it, and likewise as soon as stop_when()
+    returns True after a chunk of output was handled. An interrupted
+    syz-manager is killed if it has not exited MANAGER_STOP_GRACE_SECONDS later.
+    Returns the syz-manager exit code.
+    """
+    line_handlers = line_handlers or []
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, start_new_session=True
+    )
+    output_bytes = 0
+    if tracing.TRACER is not None:
+        line_handlers = line_handlers + [manager_trace_recorder(tracing.TRACER, proc.pid, start)]
+
+    def forward(signum, frame):
+        proc.send_signal(signum)
+
+    previous_handlers = {sig: signal.signal(sig, forward) for sig in FORWARDED_SIGNALS}
+    partial = b""
+    try:
+        fd = proc.stdout.fileno()
+        stop_at = None if duration is None else time.monotonic() + duration
+        kill_at = None
+        while True:
+            deadline = stop_at if stop_at is not None else kill_at
+            if deadline is not None:
+                now = time.monotonic()
+                if now >= deadline:
+                    if stop_at is not None:
+                        proc.send_signal(signal.SIGINT)
+                        stop_at = None
+                        kill_at = now + MANAGER_STOP_GRACE_SECONDS
+                    else:
+                        proc.kill()
+                        kill_at = None
+                    continue
+                if not select.select([fd], [], [], deadline - now)[0]:
+                    continue
+            # os.read returns whatever is available, so output is never held back
+            # waiting for a full buffer
+            chunk = os.read(fd, PIPE_READ_SIZE)
+            if not chunk:
+                # The last line may lack its newline when syz-manager exits
+                if partial:
+                    for handler in line_handlers:
+                        handler(partial)
+                break
+            if echo:
+                sys.stdout.buffer.write(chunk)
+                sys.stdout.buffer.flush()
+            log.write(chunk)
+            output_bytes += len(chunk)
+            if line_handlers:
+                *lines, partial = (partial + chunk).split(b"\n")
+                for line in lines:
+                    for handler in line_handlers:
+                        handler(line)
+            if stop_when is not None and stop_when():
+                stop_when = None
+                stop_at = time.monotonic()
+        return proc.wait()
+    finally:
+        for sig, handler in previous_handlers.items():
+            signal.signal(sig, handler)
+        log.close()
+        if tracing.TRACER is not None:
+            tracing.TRACER.complete(
+                "syz-manager",
+                "manager",
+                start,
+                {"cmd": " ".join(cmd), "returncode": proc.poll(), "stdout_bytes": output_bytes},
+            )
+
+
+def next_log_file(log_file: Path) -> Path:
+    """
+    Return log_file, or if it exists, log_file with an increasing number appended.
+    """
+    base = log_file.stem
+    ext = log_file.suffix
+    parent = log_file.parent
+    candidate = log_file
+    counter = 1
+    while candidate.exists():
+        candidate = parent / f"{base}_{counter}{ext}"
+        counter += 1
+    return candidate
@@ -0,0 +1,322 @@
+"""
+Kernel symbol tables and coverage focusing of the syzkaller config.
+"""
+
+import argparse
+import bisect
+import hashlib
+import mmap
+import os
+import sys
+import json
+import re
+import struct
+import time
+from pathlib import Path
+from array import array
+
+from .cache import evict_cache
+from .config import load_cfg_template
+from .constants import (
+    CACHE_DIR,
+    SYMBOL_CACHE_DIRNAME,
+    SYMBOL_CACHE_MAX_BYTES,
+    SYMBOL_TABLE_FILENAME,
+    SYMBOL_TABLE_VERSION,
+    SYSCALL_DESCRIPTION_RE,
+    SYSTEM_MAP_FILENAME,
+    VMLINUX_FILENAME,
+)
+from .errors import ConfigurationError
+from .files import write_file_atomically
+from .tracing import check_subprocess_output, traced
+
+
+class SymbolTable:
+    """
+    Function symbols of a kernel, sorted by address in array columns, with the
+    names joined into one newline-separated string so that a glob over all of
+    them is a single regex scan. Built from the ELF symtab of vmlinux, or from
+    System.map, where a function ends at the next symbol.
+    """
+
+    def __init__(self, addresses: array, sizes: array, names: list[str]):
+        self.addresses = addresses
+        self.sizes = sizes
+        self.names = names
+        self.joined_names = "\n".join(names)
+
+    @classmethod
+    def from_elf(cls, path: Path) -> "SymbolTable":
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as elf:
+            if elf[:4] != b"\x7fELF" or elf[4] != 2:
+                raise ConfigurationError(f"{path} is not a 64-bit ELF file")
+            shoff, = struct.unpack_from("<Q", elf, 0x28)
+            shentsize, shnum = struct.unpack_from("<HH", elf, 0x3A)
+            sections = [
+                struct.unpack_from("<IIQQQQIIQQ", elf, shoff + i * shentsize)
+                for i in range(shnum)
+            ]
+            symtab = next((sh for sh in sections if sh[1] == 2), None)  # SHT_SYMTAB
+            if symtab is None:
+                raise ConfigurationError(f"{path} has no symbol table, is it stripped?")
+            strtab = sections[symtab[6]]
+            strings = elf[strtab[4] : strtab[4] + strtab[5]]
+            symbols = {}
+            for name, info, _, shndx, value, size in struct.iter_unpack(
+                "<IBBHQQ", elf[symtab[4] : symtab[4] + symtab[5]]
+            ):
+                # STT_FUNC symbols defined in a section
+                if info & 0xF == 2 and shndx and value:
+                    end = strings.index(b"\0", name)
+                    symbols[value, strings[name:end].decode()] = size
+        ordered = sorted(symbols)
+        return cls(
+            array("Q", [address for address, _ in ordered]),
+            array("Q", [symbols[key] for key in ordered]),
+            [name for _, name in ordered],
+        )
+
+    @classmethod
+    def from_system_map(cls, path: Path) -> "SymbolTable":
+        entries = []
+        with open(path) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 3:
+                    entries.append((int(fields[0], 16), fields[1] in "Tt", fields[2]))
+        entries.sort()
+        addresses, sizes, names = array("Q"), array("Q"), []
+        for i, (address, is_text, name) in enumerate(entries):
+            if is_text:
+                next_address = entries[i + 1][0] if i + 1 < len(entries) else address
+                addresses.append(address)
+                sizes.append(next_address - address)
+                names.append(name)
+        return cls(addresses, sizes, names)
+
+    @classmethod
+    def load(cls, path: Path) -> "SymbolTable":
+        data = path.read_bytes()
+        version, count = struct.unpack_from("<II", data)
+        if version != SYMBOL_TABLE_VERSION:
+            raise ValueError(f"unsupported symbol table version {version}")
+        addresses, sizes = array("Q"), array("Q")
+        addresses.frombytes(data[8 : 8 + 8 * count])
+        sizes.frombytes(data[8 + 8 * count : 8 + 16 * count])
+        names = data[8 + 16 * count :].decode().split("\n") if count else []
+        return cls(addresses, sizes, names)
+
+    def save(self, path: Path):
+        write_file_atomically(
+            path,
+            struct.pack("<II", SYMBOL_TABLE_VERSION, len(self.names))
+            + self.addresses.tobytes()
+            + self.sizes.tobytes()
+            + self.joined_names.encode(),
+        )
+
+    def lookup(self, address: int) -> str | None:
+        """
+        Return the name of the function that contains address.
+        """
+        i = bisect.bisect_right(self.addresses, address) - 1
+        if i >= 0 and address < self.addresses[i] + max(self.sizes[i], 1):
+            return self.names[i]
+        return None
+
+
+def match_glob(glob: str, joined: str) -> list[str]:
+    """
+    Return the lines of a newline-separated string that match a shell-style glob.
+    """
+    pattern = "".join(
+        "[^\n]*" if c == "*" else "[^\n]" if c == "?" else re.escape(c) for c in glob
+    )
+    return re.findall(f"^{pattern}$", joined, re.MULTILINE)
+
+
+@traced
+def load_symbol_table(kernel_obj: Path) -> SymbolTable:
+    """
+    Return the symbol table of the vmlinux, or else the System.map, in
+    kernel_obj (or of the file kernel_obj). Tables are cached by the path,
+    size and modification time of the file they were built from, so that
+    only the first use of a kernel build parses it.
+    """
+    if kernel_obj.is_dir():
+        source = kernel_obj / VMLINUX_FILENAME
+        if not source.exists():
+            source = kernel_obj / SYSTEM_MAP_FILENAME
+    else:
+        source = kernel_obj
+    try:
+        stat = source.stat()
+    except FileNotFoundError:
+        raise ConfigurationError(f"No {VMLINUX_FILENAME} or {SYSTEM_MAP_FILENAME} in {kernel_obj}")
+
+    key = hashlib.sha256(
+        f"{source.resolve()}\0{stat.st_size}\0{stat.st_mtime_ns}".encode()
+    ).hexdigest()
+    entry = CACHE_DIR / SYMBOL_CACHE_DIRNAME / key
+    try:
+        table = SymbolTable.load(entry / SYMBOL_TABLE_FILENAME)
+        os.utime(entry)
+        return table
+    except (FileNotFoundError, ValueError, struct.error):
+        pass
+
+    if source.name == SYSTEM_MAP_FILENAME:
+        table = SymbolTable.from_system_map(source)
+    else:
+        table = SymbolTable.from_elf(source)
+    table.save(entry / SYMBOL_TABLE_FILENAME)
+    evict_cache(CACHE_DIR / SYMBOL_CACHE_DIRNAME, SYMBOL_CACHE_MAX_BYTES)
+    return table
+
+
+def load_syscall_names(syzkaller_src: Path) -> str:
+    """
+    Return the newline-separated names of the syscalls (with their $variants)
+    described in syzkaller_src/sys/linux.
+    """
+    names = set()
+    for description in (syzkaller_src / "sys" / "linux").glob("*.txt"):
+        names.update(SYSCALL_DESCRIPTION_RE.findall(description.read_text()))
+    return "\n".join(sorted(names))
+
+
+def expand_globs(globs: list[str], joined: str, what: str) -> list[str]:
+    """
+    Return the distinct lines of joined matching any of the globs, in order.
+    A glob that matches nothing is an error, as it is most likely a typo.
+    """
+    expanded = {}
+    for glob in globs:
+        matches = match_glob(glob, joined)
+        if not matches:
+            raise ConfigurationError(f"No {what} matches {glob!r}")
+        expanded.update(dict.fromkeys(matches))
+    return list(expanded)
+
+
+@traced
+def focus_cfg(
+    cfg_text: str,
+    kernel_obj: Path,
+    linux_src: Path,
+    syzkaller_src: Path,
+    function_globs: list[str],
+    file_globs: list[str],
+    syscall_globs: list[str],
+) -> str:
+    """
+    Return the syzkaller cfg with the functions and source files matching the
+    globs as its coverage filter, and the syscalls matching the syscall globs
+    as its enable_syscalls. The filter goes into the first focus area if the
+    cfg has Experimental.focus_areas, and into cover_filter otherwise.
+    """
+    config = json.loads(cfg_text)
+    cover_filter = {}
+    if function_globs:
+        names = load_symbol_table(kernel_obj).joined_names
+        cover_filter["functions"] = [
+            f"^{re.escape(name)}$"
+            for name in expand_globs(function_globs, names, "function")
+        ]
+    if file_globs:
+        files = check_subprocess_output(["git", "-C", str(linux_src), "ls-files"], text=True)
+        cover_filter["files"] = [
+            f"^{re.escape(name)}$" for name in expand_globs(file_globs, files, "file")
+        ]
+    if cover_filter:
+        focus_areas = config.get("Experimental", {}).get("focus_areas")
+        if focus_areas:
+            focus_areas[0]["filter"] = cover_filter
+        else:
+            config["cover_filter"] = cover_filter
+    if syscall_globs:
+        config["enable_syscalls"] = expand_globs(
+            syscall_globs, load_syscall_names(syzkaller_src), "syscall"
+        )
+    return json.dumps(config, indent=4)
+
+
+def symbols_main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="invoke-syz-manager.py symbols",
+        description="Expand function, source file and syscall globs against a kernel "
+        "build and syzkaller's descriptions, and optionally write a cfg focused on "
+        "them. The symbol table of a kernel build is cached after its first use.",
+    )
+    parser.add_argument(
+        "kernel_obj",
+        help=f"Kernel build directory, or a {VMLINUX_FILENAME} or {SYSTEM_MAP_FILENAME} file",
+    )
+    parser.add_argument(
+        "-f", "--function", action="append", default=[], help="Function glob (repeatable)"
+    )
+    parser.add_argument(
+        "--file",
+        action="append",
+        default=[],
+        help="Source file glob, relative to the Linux tree (repeatable, requires --linux-src)",
+    )
+    parser.add_argument(
+        "--syscall",
+        action="append",
+        default=[],
+        help="Syscall glob, e.g. 'ioctl$FIDEDUPE*' (repeatable, requires --syzkaller-src)",
+    )
+    parser.add_argument("--linux-src", help="Linux source tree, for --file")
+    parser.add_argument("--syzkaller-src", help="syzkaller source tree, for --syscall")
+    parser.add_argument(
+        "--addr",
+        action="append",
+        default=[],
+        help="Print the function containing this address (repeatable)",
+    )
+    parser.add_argument("--cfg-template", help="syzkaller cfg to focus, requires -o")
+    parser.add_argument("-o", "--output", help="Write the focused cfg here")
+    args = parser.parse_args(argv)
+    if bool(args.cfg_template) != bool(args.output):
+        parser.error("--cfg-template and -o go together")
+    if args.file and not args.linux_src:
+        parser.error("--file requires --linux-src")
+    if args.syscall and not args.syzkaller_src:
+        parser.error("--syscall requires --syzkaller-src")
+
+    start = time.perf_counter()
+    table = load_symbol_table(Path(args.kernel_obj))
+    print(
+        f"[symbols] {len(table.names)} functions loaded in {time.perf_counter() - start:.3f}s",
+        file=sys.stderr,
+    )
+    for address in args.addr:
+        print(f"{address} {table.lookup(int(address, 16)) or '?'}")
+
+    if args.cfg_template:
+        cfg = focus_cfg(
+            json.dumps(load_cfg_template(Path(args.cfg_template)), indent=4),
+            Path(args.kernel_obj),
+            Path(args.linux_src or "."),
+            Path(args.syzkaller_src or "."),
+            args.function,
+            args.file,
+            args.syscall,
+        )
+        Path(args.output).write_text(cfg)
+        print(f"[symbols] focused cfg written to {args.output}", file=sys.stderr)
+        return 0
+
+    if args.function:
+        for name in expand_globs(args.function, table.joined_names, "function"):
+            print(name)
+    if args.file:
+        files = check_subprocess_output(["git", "-C", args.linux_src, "ls-files"], text=True)
+        for name in expand_globs(args.file, files, "file"):
+            print(name)
+    if args.syscall:
+        for name in expand_globs(args.syscall, load_syscall_names(Path(args.syzkaller_src)), "syscall"):
+            print(name)
+    return 0
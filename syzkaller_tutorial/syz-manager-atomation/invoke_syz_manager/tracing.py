@@ -0,0 +1,300 @@
+"""
+Timing and tracing of launcher phases and subprocesses.
+"""
+
+import functools
+import os
+import subprocess
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .constants import MANAGER_TRACE_INSTANTS, MANAGER_TRACE_SPANS, STATS_LINE_RE
+from .files import write_file_atomically
+
+
+class Tracer:
+    """
+    Collect Chrome trace events (for chrome://tracing or ui.perfetto.dev) of the
+    launcher phases, its subprocesses and the syz-manager startup. Timestamps
+    are CLOCK_MONOTONIC microseconds, so the traces of the runs of a campaign,
+    all on the same host, line up when merged.
+    """
+
+    def __init__(self, path: Path, name: str):
+        self.path = path
+        self.events = []
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.start = time.perf_counter()
+        self.metadata(self.pid, None, "process_name", name)
+
+    def add(self, event: dict):
+        with self.lock:
+            self.events.append(event)
+
+    def metadata(self, pid: int, tid: int | None, name: str, value: str):
+        event = {"name": name, "ph": "M", "pid": pid, "args": {"name": value}}
+        if tid is not None:
+            event["tid"] = tid
+        self.add(event)
+
+    def complete(
+        self,
+        name: str,
+        cat: str,
+        start: float,
+        args: dict | None = None,
+        pid: int | None = None,
+        tid: int | None = None,
+    ):
+        """
+        Record a span from start (a time.perf_counter() value) until now.
+        """
+        self.add(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": (time.perf_counter() - start) * 1e6,
+                "pid": self.pid if pid is None else pid,
+                "tid": threading.get_native_id() if tid is None else tid,
+                "args": args or {},
+            }
+        )
+
+    def instant(
+        self,
+        name: str,
+        cat: str,
+        args: dict | None = None,
+        pid: int | None = None,
+        tid: int | None = None,
+    ):
+        self.add(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "i",
+                "s": "t",
+                "ts": time.perf_counter() * 1e6,
+                "pid": self.pid if pid is None else pid,
+                "tid": threading.get_native_id() if tid is None else tid,
+                "args": args or {},
+            }
+        )
+
+    def write(self):
+        with self.lock:
+            trace = {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        write_file_atomically(self.path, json.dumps(trace).encode())
+
+    def summary(self) -> str:
+        spans = [e for e in self.events if e["ph"] == "X"]
+        subprocesses = [e for e in spans if e["cat"] == "subprocess"]
+        parts = [f"{len(subprocesses)} subprocesses "
+                 f"{sum(e['dur'] for e in subprocesses) / 1e6:.3f}s"]
+        if subprocesses:
+            slowest = max(subprocesses, key=lambda e: e["dur"])
+            parts[0] += f" (slowest {slowest['name']} {slowest['dur'] / 1e6:.3f}s)"
+        parts.append(f"{sum(e['cat'] == 'phase' for e in spans)} phases")
+        startups = [e for e in spans if e["name"] == "syz-manager startup"]
+        if startups:
+            parts.append(f"syz-manager startup {startups[-1]['dur'] / 1e6:.1f}s")
+        return (
+            f"[trace] {len(self.events)} events in {self.path}: {', '.join(parts)}, "
+            f"wall {time.perf_counter() - self.start:.3f}s"
+        )
+
+
+def subprocess_span_name(argv: list[str]) -> str:
+    """
+    Name a subprocess span after the program and its first operand, skipping
+    options and the directory of -C, e.g. "git describe".
+    """
+    words = [Path(argv[0]).name] if argv else ["subprocess"]
+    rest = iter(argv[1:])
+    for arg in rest:
+        if arg == "-C":
+            next(rest, None)
+        elif not arg.startswith("-"):
+            words.append(arg)
+            break
+    return " ".join(words)
+
+
+def output_size(output: bytes | str | None) -> int:
+    if output is None:
+        return 0
+    return len(output.encode() if isinstance(output, str) else output)
+
+
+# The active Tracer, None unless --trace is given so that tracing costs a global
+# lookup when disabled
+TRACER: Tracer | None = None
+
+
+def start_trace(path: Path, name: str):
+    global TRACER
+    TRACER = Tracer(path, name)
+
+
+def finish_trace():
+    """
+    Write the trace, if one is being recorded, and print its one-line summary.
+    Safe to call more than once, e.g. before exec'ing syz-manager and at exit.
+    """
+    global TRACER
+    if TRACER is None:
+        return
+    TRACER.write()
+    print(TRACER.summary())
+    TRACER = None
+
+
+def run_subprocess(cmd: list, **kwargs) -> subprocess.CompletedProcess:
+    """
+    subprocess.run for the commands of the launcher. When tracing, the command,
+    its duration and the bytes it wrote to captured pipes are recorded as a
+    span, whether it succeeds or not.
+    """
+    tracer = TRACER
+    if tracer is None:
+        return subprocess.run(cmd, **kwargs)
+    argv = [str(a) for a in cmd]
+    start = time.perf_counter()
+    result = None
+    try:
+        result = subprocess.run(cmd, **kwargs)
+        return result
+    except subprocess.CalledProcessError as e:
+        result = e
+        raise
+    finally:
+        tracer.complete(
+            subprocess_span_name(argv),
+            "subprocess",
+            start,
+            {
+                "cmd": " ".join(argv),
+                "returncode": getattr(result, "returncode", None),
+                "stdout_bytes": output_size(getattr(result, "stdout", None)),
+                "stderr_bytes": output_size(getattr(result, "stderr", None)),
+            },
+        )
+
+
+def check_subprocess_output(cmd: list, **kwargs):
+    """
+    subprocess.check_output through run_subprocess.
+    """
+    return run_subprocess(cmd, stdout=subprocess.PIPE, check=True, **kwargs).stdout
+
+
+def traced(fn):
+    """
+    Decorator recording each call of fn as a span named after it when tracing.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if TRACER is None:
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if TRACER is not None:
+                TRACER.complete(fn.__name__, "function", start)
+
+    return wrapper
+
+
+def run_concurrently(
+    phases: dict[str, tuple], timings: dict[str, float]
+) -> dict[str, object]:
+    """
+    Run independent (function, *args) phases in a thread pool and return their
+    results by phase name, recording the duration of each phase in timings.
+    All phases run to completion; the first failing phase (in the given order)
+    then has its exception re-raised in the calling thread.
+    """
+
+    def timed(name, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            timings[name] = time.perf_counter() - start
+            if TRACER is not None:
+                TRACER.complete(name, "phase", start)
+
+    timings.update((name, 0.0) for name in phases)
+    with ThreadPoolExecutor(max_workers=len(phases)) as pool:
+        futures = {
+            name: pool.submit(timed, name, fn, *args)
+            for name, (fn, *args) in phases.items()
+        }
+    return {name: future.result() for name, future in futures.items()}
+
+
+def print_timing_summary(timings: dict[str, float], wall: float):
+    phases = ", ".join(f"{name} {duration:.3f}s" for name, duration in timings.items())
+    print(f"[timing] {phases} (serial {sum(timings.values()):.3f}s, wall {wall:.3f}s)")
+
+
+def manager_trace_recorder(tracer: Tracer, pid: int, start: float):
+    """
+    Return a supervisor line handler that records the syz-manager startup in
+    the trace, under the syz-manager pid: a "syz-manager startup" span from
+    start until the first stats line, the MANAGER_TRACE_SPANS (each VM boot on
+    its own track) and the MANAGER_TRACE_INSTANTS. The trace is written out as
+    soon as the startup span ends, so it can be inspected during long runs.
+    """
+    tracer.metadata(pid, None, "process_name", "syz-manager")
+    tracer.metadata(pid, 0, "thread_name", "syz-manager")
+    open_spans = {}  # span name -> start
+    vm_tids = set()
+    started = False
+
+    def tid_for(name: str) -> int:
+        match = re.match(r"VM (\d+) ", name)
+        if match is None:
+            return 0
+        tid = int(match.group(1)) + 1
+        if tid not in vm_tids:
+            vm_tids.add(tid)
+            tracer.metadata(pid, tid, "thread_name", f"VM {match.group(1)}")
+        return tid
+
+    def handle(line: bytes):
+        nonlocal started
+        if not started and STATS_LINE_RE.match(line):
+            started = True
+            tracer.complete("syz-manager startup", "manager", start, pid=pid, tid=0)
+            tracer.write()
+            return
+        for begin, end, name in MANAGER_TRACE_SPANS:
+            match = begin.search(line)
+            if match:
+                open_spans[name.format(*(g.decode() for g in match.groups()))] = time.perf_counter()
+                return
+            match = end.search(line)
+            if match:
+                name = name.format(*(g.decode() for g in match.groups()))
+                if name in open_spans:
+                    span_start = open_spans.pop(name)
+                    tracer.complete(name, "manager", span_start, pid=pid, tid=tid_for(name))
+                return
+        if not started:
+            for pattern, name in MANAGER_TRACE_INSTANTS:
+                if pattern.search(line):
+                    tracer.instant(name, "manager", pid=pid, tid=0)
+                    return
+
+    return handle
@@ -0,0 +1,188 @@
+"""
+Tuning procs and VM count of the syzkaller config by short measured runs.
+"""
+
+import bisect
+import os
+import json
+from pathlib import Path
+
+from .campaign import get_reserved_resources, read_meminfo_mib
+from .config import get_syz_manager_bin, load_cfg_template, modify_cfg
+from .constants import (
+    REAL_CFG_FILENAME,
+    SYZ_MANAGER_LOG_FILENAME,
+    TUNED_TEMPLATE_FILENAME,
+    TUNING_DIRNAME,
+)
+from .errors import ConfigurationError
+from .stats import StatsSeries, stats_path_for_log
+from .supervisor import RotatingLogWriter, supervise_syz_manager
+from .tracing import traced
+
+
+def parse_int_list(value: str) -> list[int]:
+    try:
+        return [int(v) for v in value.split(",")]
+    except ValueError:
+        raise ConfigurationError(f"Invalid comma-separated list of integers {value!r}")
+
+
+def apply_tuning(template: dict, result: dict) -> dict:
+    """
+    Return a copy of a cfg template with the procs and vm settings of a tuning
+    trial result.
+    """
+    variant = json.loads(json.dumps(template))
+    variant["procs"] = result["procs"]
+    variant.setdefault("vm", {}).update(result["vm"])
+    return variant
+
+
+def write_tuned_template(cfg_template: Path, work_dir: Path, tuning_results: list[dict]) -> Path:
+    """
+    Write the cfg template with the settings of the best tuning trial to
+    work_dir/tuning and return its path.
+    """
+    best = max(tuning_results, key=lambda result: result["exec_per_sec"])
+    tuned_template = work_dir / TUNING_DIRNAME / TUNED_TEMPLATE_FILENAME
+    tuned_template.parent.mkdir(parents=True, exist_ok=True)
+    tuned_template.write_text(
+        json.dumps(apply_tuning(load_cfg_template(cfg_template), best), indent=4)
+    )
+    return tuned_template
+
+
+def tuning_variants(template: dict, args) -> list[dict]:
+    """
+    Return the variants of a cfg template for every combination of the procs,
+    vm.count, vm.cpu and vm.mem candidates that fits into the host cores and
+    memory left by the other launchers' reservations. The template value is
+    used when no candidates are given, and for procs the default candidates
+    are half, the same and double the template value.
+    """
+    procs = template.get("procs", 1)
+    vm = template.get("vm", {})
+    candidates = {
+        "procs": sorted({max(1, procs // 2), procs, procs * 2}),
+        "count": [vm.get("count", 1)],
+        "cpu": [vm.get("cpu", 1)],
+        "mem": [vm.get("mem", 1024)],
+    }
+    for key, value in (
+        ("procs", args.tune_procs),
+        ("count", args.tune_vm_count),
+        ("cpu", args.tune_vm_cpu),
+        ("mem", args.tune_vm_mem),
+    ):
+        if value:
+            candidates[key] = parse_int_list(value)
+    # The reservation of this launcher, when run by a campaign, is its own
+    reserved_cpus, reserved_mem = get_reserved_resources({os.getpid()})
+    max_cpus = len(os.sched_getaffinity(0)) - reserved_cpus
+    max_mem = read_meminfo_mib("MemAvailable") - reserved_mem
+
+    variants = []
+    for procs in candidates["procs"]:
+        for count in candidates["count"]:
+            for cpu in candidates["cpu"]:
+                for mem in candidates["mem"]:
+                    if count * cpu > max_cpus or count * mem > max_mem:
+                        continue
+                    variants.append(
+                        apply_tuning(
+                            template,
+                            {"procs": procs, "vm": {"count": count, "cpu": cpu, "mem": mem}},
+                        )
+                    )
+    if not variants:
+        raise ConfigurationError(
+            f"No tuning variant fits into the {max_cpus} cores and {max_mem} MiB left "
+            f"on the host ({reserved_cpus} cores and {reserved_mem} MiB are reserved "
+            "by other launchers)."
+        )
+    return variants
+
+
+def measure_exec_rate(series: StatsSeries, warmup: int) -> float:
+    """
+    Return the executions per second after the first warmup seconds of a run,
+    from the exec total of its stats samples.
+    """
+    timestamps = series.columns["timestamp"]
+    exec_totals = series.columns["exec_total"]
+    if not timestamps:
+        return 0.0
+    start = bisect.bisect_left(timestamps, timestamps[0] + warmup)
+    if start >= len(timestamps) - 1:
+        return 0.0
+    elapsed = timestamps[-1] - timestamps[start]
+    return (exec_totals[-1] - exec_totals[start]) / elapsed if elapsed else 0.0
+
+
+@traced
+def tune_cfg(
+    cfg_template: Path,
+    work_dir: Path,
+    syzkaller_src: Path,
+    linux_src: Path,
+    args,
+) -> tuple[Path, list[dict]]:
+    """
+    Run a short timed syz-manager trial for every tuning variant of the cfg
+    template, each in its own work dir under work_dir/tuning. Returns the
+    template of the variant with the highest exec/sec, and the trial results.
+    """
+    template = load_cfg_template(cfg_template)
+    syz_manager_bin = get_syz_manager_bin(syzkaller_src)
+    tuning_dir = work_dir / TUNING_DIRNAME
+    tuning_dir.mkdir(parents=True, exist_ok=True)
+
+    variants = tuning_variants(template, args)
+    results = []
+    for trial, variant in enumerate(variants):
+        trial_dir = tuning_dir / f"trial_{trial}"
+        trial_dir.mkdir(exist_ok=True)
+        trial_cfg = trial_dir / REAL_CFG_FILENAME
+        trial_cfg.write_text(
+            json.dumps(
+                modify_cfg(json.loads(json.dumps(variant)), trial_dir, syzkaller_src, linux_src),
+                indent=4,
+            )
+        )
+        vm = variant["vm"]
+        print(
+            f"[tune] trial {trial + 1}/{len(variants)}: procs={variant['procs']} "
+            f"vm.count={vm['count']} vm.cpu={vm['cpu']} vm.mem={vm['mem']} "
+            f"for {args.tune_seconds}s"
+        )
+        series = StatsSeries()
+        log_file = trial_dir / SYZ_MANAGER_LOG_FILENAME
+        supervise_syz_manager(
+            [str(syz_manager_bin), "-vv", "0", "-config", str(trial_cfg)],
+            RotatingLogWriter(log_file),
+            [series.feed],
+            echo=False,
+            duration=args.tune_seconds,
+        )
+        series.write_csv(stats_path_for_log(log_file))
+        exec_per_sec = measure_exec_rate(series, args.tune_warmup)
+        print(f"[tune] trial {trial + 1}: {exec_per_sec:.1f} exec/sec ({len(series)} samples)")
+        results.append(
+            {
+                "trial": trial,
+                "procs": variant["procs"],
+                "vm": {key: vm[key] for key in ("count", "cpu", "mem")},
+                "exec_per_sec": round(exec_per_sec, 2),
+                "samples": len(series),
+                "log": str(log_file),
+            }
+        )
+
+    best = max(range(len(results)), key=lambda i: results[i]["exec_per_sec"])
+    tuned_template = write_tuned_template(cfg_template, work_dir, results)
+    print(
+        f"[tune] best: trial {best + 1} with {results[best]['exec_per_sec']} exec/sec, "
+        f"template written to {tuned_template}"
+    )
+    return tuned_template, results
@@ -0,0 +1,144 @@
+"""
+Detection of crash storms and coverage collapse in a running syz-manager.
+"""
+
+import collections
+import json
+import re
+from pathlib import Path
+
+from .artifacts import write_manifest
+from .constants import CRASH_LINE_RE, REAL_CFG_FILENAME, STATS_LINE_RE, WATCHDOG_FILENAME
+from .crashes import parse_crash_line
+from .files import write_file_atomically
+from .logs import format_log_timestamp, parse_log_timestamp
+
+
+class Watchdog:
+    """
+    Supervisor line handler that watches syz-manager output for a crash storm,
+    the same crash title being reported threshold times within storm_window
+    seconds, or an exec/sec collapse, the exec/sec over collapse_window seconds
+    falling below collapse_ratio of its peak. Windows are measured in log time.
+    The first of them is recorded in event.
+
+    Tail reports count towards the storm of their title, as some titles (e.g.
+    SYZFAIL: failed to recv rpc) only ever show up in the tail of another
+    crash, but each title counts at most once per crash, see parse_crash_line.
+    """
+
+    def __init__(
+        self,
+        storm_window: int,
+        storm_threshold: int,
+        collapse_window: int,
+        collapse_ratio: float,
+    ):
+        self.storm_window = storm_window
+        self.storm_threshold = storm_threshold
+        self.collapse_window = collapse_window
+        self.collapse_ratio = collapse_ratio
+        self.crash_times: dict[bytes, collections.deque] = {}
+        # Timestamp and titles of the last crash of each VM
+        self.last_crash: dict[str, tuple[int, set[bytes]]] = {}
+        self.samples = collections.deque()
+        self.peak_rate = 0.0
+        self.event = None
+
+    def feed(self, line: bytes):
+        if self.event is not None:
+            return
+        if b": crash" in line:
+            match = CRASH_LINE_RE.match(line)
+            if match is None:
+                return
+            timestamp, vm, title, corrupted, tail = parse_crash_line(match)
+            last_time, titles = self.last_crash.get(vm, (None, None))
+            if not tail or last_time != timestamp:
+                titles = set()
+                self.last_crash[vm] = (timestamp, titles)
+            # Corrupted reports have no meaningful title to ignore
+            if corrupted or title in titles:
+                return
+            titles.add(title)
+            times = self.crash_times.setdefault(title, collections.deque())
+            times.append(timestamp)
+            while timestamp - times[0] > self.storm_window:
+                times.popleft()
+            if len(times) >= self.storm_threshold:
+                self.event = {
+                    "reason": "crash_storm",
+                    "at": format_log_timestamp(timestamp),
+                    "title": title.decode(errors="replace"),
+                    "crashes": len(times),
+                }
+        elif b"exec total=" in line:
+            match = STATS_LINE_RE.match(line)
+            if match is None:
+                return
+            timestamp = parse_log_timestamp(match.group(1))
+            self.samples.append((timestamp, int(match.group(5))))
+            # Keep the shortest run of samples that still spans the window
+            while (
+                len(self.samples) > 2
+                and timestamp - self.samples[1][0] >= self.collapse_window
+            ):
+                self.samples.popleft()
+            start, start_exec = self.samples[0]
+            if timestamp - start < self.collapse_window:
+                return
+            rate = (int(match.group(5)) - start_exec) / (timestamp - start)
+            self.peak_rate = max(self.peak_rate, rate)
+            if rate < self.collapse_ratio * self.peak_rate:
+                self.event = {
+                    "reason": "exec_collapse",
+                    "at": format_log_timestamp(timestamp),
+                    "exec_per_sec": round(rate, 2),
+                    "peak_exec_per_sec": round(self.peak_rate, 2),
+                }
+
+
+def apply_watchdog_ignores(cfg_text: str, repro_dir: Path) -> str:
+    """
+    Return the syzkaller cfg with the crash titles ignored by earlier watchdog
+    restarts, recorded in the repro package, added to its ignores.
+    """
+    watchdog_file = repro_dir / WATCHDOG_FILENAME
+    if not watchdog_file.exists():
+        return cfg_text
+    patterns = [
+        event["ignore"]
+        for event in json.loads(watchdog_file.read_text())
+        if "ignore" in event
+    ]
+    if not patterns:
+        return cfg_text
+    config = json.loads(cfg_text)
+    ignores = config.setdefault("ignores", [])
+    for pattern in patterns:
+        if pattern not in ignores:
+            ignores.append(pattern)
+    return json.dumps(config, indent=4)
+
+
+def record_watchdog_event(repro_dir: Path, event: dict, log_file: Path):
+    """
+    Append a watchdog event to the repro package, and for a crash storm add
+    its title to the ignores of the package syzkaller cfg. The manifest is
+    rewritten to cover the changed files.
+    """
+    watchdog_file = repro_dir / WATCHDOG_FILENAME
+    events = json.loads(watchdog_file.read_text()) if watchdog_file.exists() else []
+    event = dict(event, log=str(log_file))
+    if event["reason"] == "crash_storm":
+        event["ignore"] = re.escape(event["title"])
+    events.append(event)
+    write_file_atomically(watchdog_file, json.dumps(events, indent=4).encode())
+
+    cfg_path = repro_dir / REAL_CFG_FILENAME
+    cfg_text = cfg_path.read_text()
+    updated_cfg = apply_watchdog_ignores(cfg_text, repro_dir)
+    if updated_cfg != cfg_text:
+        write_file_atomically(cfg_path, updated_cfg.encode())
+        print(f"[watchdog] added {event['ignore']!r} to the ignores of {cfg_path}")
+    write_manifest(repro_dir)
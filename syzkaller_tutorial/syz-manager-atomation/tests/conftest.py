@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+TESTS_DIR = Path(__file__).resolve().parent
+BENCHMARKS_DIR = TESTS_DIR.parent / "benchmarks"
+REPLAY_SCRIPT = BENCHMARKS_DIR / "replay_syz_manager.py"
+RUN_2_LOG = (
+    TESTS_DIR.parents[1]
+    / "statefuzz-crash-reproduction"
+    / "CVE-2020-28097"
+    / "instrumented_results"
+    / "run_2"
+    / "syz-manager.log"
+)
+
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from synthetic import SCRIPT_PATH, make_launch_env  # noqa: E402
+
+
+@pytest.fixture
+def launch_env(tmp_path):
+    """
+    A small synthetic launch environment, see make_launch_env.
+    """
+    return make_launch_env(
+        tmp_path, history=30, branches=3, unpushed=2, tags=2, config_lines=50, patch_lines=5
+    )
+
+
+def run_launcher(root: Path, env: dict[str, Path], *extra: str) -> subprocess.CompletedProcess:
+    """
+    Launch the work tree root/work non-interactively, without the provenance
+    cache and with the cache dir under root.
+    """
+    return subprocess.run(
+        [
+            sys.executable,
+            str(SCRIPT_PATH),
+            "--linux-src",
+            str(env["linux"]),
+            "--syzkaller-src",
+            str(env["syzkaller"]),
+            "--cfg-template",
+            str(env["cfg_template"]),
+            "--work-name",
+            "work",
+            "--non-interactive",
+            "--no-cache",
+            *extra,
+        ],
+        cwd=root,
+        env={**os.environ, "XDG_CACHE_HOME": str(root / "cache")},
+        capture_output=True,
+        text=True,
+    )
@@ -0,0 +1,89 @@
+// Writes corpus.db, the test fixture of tests/test_corpus.py, with the record
+// layout of syzkaller pkg/db (serializeHeader and serializeRecord):
+//
+//	header: magic uint32, version uint64
+//	record: magic uint32, key length uint32, key, seq uint64,
+//	        then unless seq is seqDeleted: value length uint32, value
+//
+// where the value is deflated with flate.BestCompression and its length is
+// that of the compressed bytes, patched in after compressing.
+//
+// Run with: go run make_corpus_db.go
+package main
+
+import (
+	"bytes"
+	"compress/flate"
+	"crypto/sha1"
+	"encoding/binary"
+	"encoding/hex"
+	"os"
+	"strings"
+)
+
+const (
+	dbMagic    = uint32(0xbaddb)
+	recMagic   = uint32(0xfee1bad)
+	version    = uint64(5)
+	seqDeleted = ^uint64(0)
+)
+
+func serializeUint32(w *bytes.Buffer, v uint32) {
+	binary.Write(w, binary.LittleEndian, v)
+}
+
+func serializeUint64(w *bytes.Buffer, v uint64) {
+	binary.Write(w, binary.LittleEndian, v)
+}
+
+func serializeRecord(w *bytes.Buffer, key string, val []byte, seq uint64) {
+	serializeUint32(w, recMagic)
+	serializeUint32(w, uint32(len(key)))
+	w.WriteString(key)
+	serializeUint64(w, seq)
+	if seq == seqDeleted {
+		return
+	}
+	if len(val) == 0 {
+		serializeUint32(w, 0)
+		return
+	}
+	lenPos := w.Len()
+	serializeUint32(w, 0)
+	startPos := w.Len()
+	fw, err := flate.NewWriter(w, flate.BestCompression)
+	if err != nil {
+		panic(err)
+	}
+	if _, err := fw.Write(val); err != nil {
+		panic(err)
+	}
+	if err := fw.Close(); err != nil {
+		panic(err)
+	}
+	binary.LittleEndian.PutUint32(w.Bytes()[lenPos:lenPos+4], uint32(w.Len()-startPos))
+}
+
+func hash(data []byte) string {
+	sum := sha1.Sum(data)
+	return hex.EncodeToString(sum[:])
+}
+
+func main() {
+	progs := [][]byte{
+		[]byte("r0 = openat(0xffffffffffffff9c, &(0x7f0000000000)='./file0\\x00', 0x0, 0x0)\nclose(r0)\n"),
+		[]byte(strings.Repeat("mmap(&(0x7f0000000000/0x1000)=nil, 0x1000, 0x3, 0x32, 0xffffffffffffffff, 0x0)\n", 50)),
+		[]byte("getpid()\n"),
+	}
+	w := new(bytes.Buffer)
+	serializeUint32(w, dbMagic)
+	serializeUint64(w, version)
+	serializeRecord(w, hash(progs[0]), progs[0], 0)
+	serializeRecord(w, hash(progs[1]), progs[1], 1)
+	serializeRecord(w, hash(nil), nil, 2)
+	serializeRecord(w, hash(progs[1]), nil, seqDeleted)
+	serializeRecord(w, hash(progs[2]), progs[2], 3)
+	if err := os.WriteFile("corpus.db", w.Bytes(), 0o644); err != nil {
+		panic(err)
+	}
+}
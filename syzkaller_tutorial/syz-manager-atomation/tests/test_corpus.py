@@ -0,0 +1,117 @@
+import hashlib
+import struct
+import zlib
+from pathlib import Path
+
+from invoke_syz_manager import constants, corpus
+
+SYZKALLER_DB = Path(__file__).resolve().parent / "data" / "corpus.db"
+
+PROGRAMS = {
+    "a" * 40: b"r0 = openat(0xffffffffffffff9c, &(0x7f0000000000)='./file0\\x00', 0x0, 0x0)\n",
+    "b" * 40: b"",
+    "c" * 40: b"mmap(&(0x7f0000000000/0x1000)=nil, 0x1000, 0x3, 0x32, 0xffffffffffffffff, 0x0)\n" * 50,
+}
+
+
+def write_db(path, records, version=4):
+    with open(path, "wb") as f:
+        writer = corpus.CorpusDBWriter(f, version)
+        for key, seq, value in records:
+            writer.write(key, seq, value)
+
+
+def read_db(path):
+    return [record[1:] for record in corpus.CorpusDBReader(path).records()]
+
+
+def test_corpus_db_round_trip(tmp_path):
+    records = [(key, seq, value) for seq, (key, value) in enumerate(PROGRAMS.items())]
+    records.append(("b" * 40, constants.CORPUS_SEQ_DELETED, None))
+    write_db(tmp_path / "corpus.db", records)
+
+    reader = corpus.CorpusDBReader(tmp_path / "corpus.db")
+    assert reader.version == 4
+    assert [record[1:] for record in reader.records()] == records
+
+
+def pkg_db_records(data):
+    """
+    Parse the records of a corpus.db the way syzkaller pkg/db does: the length
+    before a value is that of its deflate-compressed bytes.
+    """
+    records, pos = [], 12
+    while pos < len(data):
+        magic, key_len = struct.unpack_from("<II", data, pos)
+        assert magic == constants.CORPUS_RECORD_MAGIC
+        key = data[pos + 8 : pos + 8 + key_len].decode()
+        (seq,) = struct.unpack_from("<Q", data, pos + 8 + key_len)
+        pos += 16 + key_len
+        if seq == constants.CORPUS_SEQ_DELETED:
+            records.append((key, seq, None))
+            continue
+        (value_len,) = struct.unpack_from("<I", data, pos)
+        value = zlib.decompress(data[pos + 4 : pos + 4 + value_len], -zlib.MAX_WBITS) if value_len else b""
+        pos += 4 + value_len
+        records.append((key, seq, value))
+    assert pos == len(data)
+    return records
+
+
+def test_corpus_db_reads_syzkaller_records():
+    # Written by data/make_corpus_db.go with the record layout of pkg/db
+    programs = [
+        b"r0 = openat(0xffffffffffffff9c, &(0x7f0000000000)='./file0\\x00', 0x0, 0x0)\nclose(r0)\n",
+        b"mmap(&(0x7f0000000000/0x1000)=nil, 0x1000, 0x3, 0x32, 0xffffffffffffffff, 0x0)\n" * 50,
+        b"",
+        b"getpid()\n",
+    ]
+    keys = [hashlib.sha1(program).hexdigest() for program in programs]
+
+    reader = corpus.CorpusDBReader(SYZKALLER_DB)
+    assert reader.version == 5
+    assert [record[1:] for record in reader.records()] == [
+        (keys[0], 0, programs[0]),
+        (keys[1], 1, programs[1]),
+        (keys[2], 2, programs[2]),
+        (keys[1], constants.CORPUS_SEQ_DELETED, None),
+        (keys[3], 3, programs[3]),
+    ]
+    assert read_db(SYZKALLER_DB) == pkg_db_records(SYZKALLER_DB.read_bytes())
+
+
+def test_corpus_db_writes_compressed_lengths(tmp_path):
+    records = [(key, seq, value) for seq, (key, value) in enumerate(PROGRAMS.items())]
+    records.append(("b" * 40, constants.CORPUS_SEQ_DELETED, None))
+    write_db(tmp_path / "corpus.db", records)
+
+    assert pkg_db_records((tmp_path / "corpus.db").read_bytes()) == records
+
+
+def test_merge_of_syzkaller_db(tmp_path):
+    counts = corpus.merge_corpus_dbs([SYZKALLER_DB], tmp_path / "corpus.db")
+
+    assert counts == {"records": 5, "kept": 3, "duplicates": 0, "stale": 2}
+    # The deleted program is dropped with its deletion
+    records = read_db(SYZKALLER_DB)
+    assert pkg_db_records((tmp_path / "corpus.db").read_bytes()) == [records[0], records[2], records[4]]
+
+
+def test_truncated_record_ends_the_db(tmp_path):
+    write_db(tmp_path / "corpus.db", [(key, 0, value) for key, value in PROGRAMS.items()])
+    data = (tmp_path / "corpus.db").read_bytes()
+    (tmp_path / "corpus.db").write_bytes(data[:-10])
+
+    assert read_db(tmp_path / "corpus.db") == [(key, 0, value) for key, value in list(PROGRAMS.items())[:2]]
+
+
+def test_merge_keeps_each_live_program_once(tmp_path):
+    a, b, c = PROGRAMS
+    write_db(tmp_path / "old.db", [(a, 0, PROGRAMS[a]), (b, 1, PROGRAMS[b]), (a, 2, b"replaced\n")], version=3)
+    write_db(tmp_path / "new.db", [(a, 0, PROGRAMS[a]), (c, 1, PROGRAMS[c]), (c, constants.CORPUS_SEQ_DELETED, None)])
+
+    counts = corpus.merge_corpus_dbs([tmp_path / "old.db", tmp_path / "new.db"], tmp_path / "corpus.db")
+
+    assert counts == {"records": 6, "kept": 2, "duplicates": 1, "stale": 3}
+    assert corpus.CorpusDBReader(tmp_path / "corpus.db").version == 3
+    assert read_db(tmp_path / "corpus.db") == [(b, 1, PROGRAMS[b]), (a, 2, b"replaced\n")]
@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from conftest import run_launcher
+from invoke_syz_manager import constants, coverage, errors
+
+PCS = [0xFFFFFFFF81000000 + 4 * i for i in range(0, 30000, 7)]
+
+
+class RawCoverHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the /rawcover page of the syz-manager http endpoint.
+    """
+
+    def do_GET(self):
+        if self.path != "/rawcover":
+            self.send_error(404)
+            return
+        body = "".join(f"0x{pc:x}\n" for pc in self.server.pcs).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def manager_http():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RawCoverHandler)
+    server.pcs = PCS
+    server.addr = f"127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def wait_for_snapshots(coverage_dir, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        snapshots = sorted(coverage_dir.glob("*.cover"))
+        if snapshots:
+            return snapshots
+        time.sleep(0.05)
+    return []
+
+
+def test_coverage_set_operations_match_python_sets():
+    a = set(PCS[::2]) | {0xFFFFFFFF82000000, 0xFFFFFFFFC0001000}
+    b = set(PCS[::3]) | {0xFFFFFFFF80FFFFF0, 0xFFFFFFFFC0001000, 0xFFFFFFFFC0002004}
+    set_a, set_b = coverage.CoverageSet.from_pcs(sorted(a)), coverage.CoverageSet.from_pcs(sorted(b))
+
+    assert list((set_a | set_b).pcs()) == sorted(a | b)
+    assert list((set_a & set_b).pcs()) == sorted(a & b)
+    assert list((set_a - set_b).pcs()) == sorted(a - b)
+    assert len(set_b - set_b) == 0
+    assert set_b - set_b == coverage.CoverageSet()
+    assert len(set_a | coverage.CoverageSet()) == len(a)
+
+
+def test_coverage_set_of_core_and_module_text_stays_small(tmp_path):
+    # Core kernel and module text are about 1 GiB apart
+    module_pcs = [0xFFFFFFFFC0000000 + 4 * i for i in range(0, 3000, 5)]
+    pcs = PCS + module_pcs
+    covered = coverage.CoverageSet.from_pcs(pcs)
+
+    assert list(covered.pcs()) == pcs
+    assert sum(bits.bit_length() for bits in covered.regions.values()) < 2**20
+    covered.save(tmp_path / "snapshot.cover")
+    assert (tmp_path / "snapshot.cover").stat().st_size < 2**16
+    assert coverage.CoverageSet.load(tmp_path / "snapshot.cover") == covered
+    assert list((covered - coverage.CoverageSet.from_pcs(PCS)).pcs()) == module_pcs
+
+
+def test_coverage_set_save_and_load(tmp_path):
+    saved = coverage.CoverageSet.from_pcs(PCS)
+    saved.save(tmp_path / "snapshot.cover")
+    loaded = coverage.CoverageSet.load(tmp_path / "snapshot.cover")
+    assert loaded == saved
+    assert len(loaded) == len(PCS)
+
+    data = (tmp_path / "snapshot.cover").read_bytes()
+    (tmp_path / "corrupt.cover").write_bytes(data[:-8])
+    with pytest.raises(errors.ConfigurationError):
+        coverage.CoverageSet.load(tmp_path / "corrupt.cover")
+
+
+def test_fetch_coverage(manager_http):
+    assert list(coverage.fetch_coverage(manager_http.addr).pcs()) == PCS
+
+
+def test_snapshotter_saves_changed_coverage_only(manager_http, tmp_path):
+    snapshotter = coverage.CoverageSnapshotter(manager_http.addr, tmp_path / "coverage", 0.05)
+    try:
+        snapshots = wait_for_snapshots(tmp_path / "coverage")
+        time.sleep(0.3)
+    finally:
+        snapshotter.stop()
+    assert len(snapshots) == 1
+    assert sorted((tmp_path / "coverage").glob("*.cover")) == snapshots
+    assert coverage.load_coverage(tmp_path) == coverage.CoverageSet.from_pcs(PCS)
+
+
+def test_exec_launch_takes_snapshots(manager_http, tmp_path, launch_env):
+    manager = launch_env["syzkaller"] / "bin" / "syz-manager"
+    manager.write_text("#!/bin/sh\nsleep 3\n")
+    template = json.loads(launch_env["cfg_template"].read_text())
+    template["http"] = manager_http.addr
+    launch_env["cfg_template"].write_text(json.dumps(template))
+
+    result = run_launcher(tmp_path, launch_env, "--coverage-interval", "1")
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert wait_for_snapshots(tmp_path / "work" / constants.COVERAGE_DIRNAME)
+    assert coverage.load_coverage(tmp_path / "work") == coverage.CoverageSet.from_pcs(PCS)
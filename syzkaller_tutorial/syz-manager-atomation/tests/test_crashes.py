@@ -0,0 +1,77 @@
+import collections
+import re
+
+from conftest import RUN_2_LOG
+from invoke_syz_manager import crashes, ndjson, stats
+
+
+def shipped_crash_lines():
+    """
+    Return the (kind, vm, title) of the crash lines of the run_2 log, with the
+    [corrupted]/[suppressed] markers stripped.
+    """
+    lines = []
+    for line in RUN_2_LOG.read_bytes().decode(errors="replace").splitlines():
+        match = re.match(r"^\S+ \S+ VM (\d+): (crash(?:\(tail\d+\))?): (.*)$", line)
+        if match:
+            title = match.group(3).rstrip()
+            for marker in (" [corrupted]", " [suppressed]"):
+                title = title.removesuffix(marker)
+            lines.append((match.group(2), match.group(1), title))
+    return lines
+
+
+def test_crash_lines_count_primaries_and_tails_apart():
+    expected = collections.defaultdict(lambda: [0, 0])
+    for kind, vm, title in shipped_crash_lines():
+        expected[title][kind != "crash"] += 1
+
+    counted = crashes.aggregate_crashes(RUN_2_LOG)
+
+    assert {title: [entry[0], entry[5]] for title, entry in counted.items()} == expected
+    assert sum(entry[0] for entry in counted.values()) == 83
+    assert sum(entry[5] for entry in counted.values()) == 53
+    for count, corrupted, first, last, vms, tails in counted.values():
+        assert sum(vms.values()) == count
+        assert corrupted <= count
+        assert first <= last
+
+
+def test_normalize_crash_title():
+    assert crashes.normalize_crash_title(b"KASAN: use-after-free Read in foo [corrupted]") == (
+        b"KASAN: use-after-free Read in foo",
+        True,
+    )
+    assert crashes.normalize_crash_title(b"lost connection to test machine [suppressed]") == (
+        b"lost connection to test machine",
+        False,
+    )
+
+
+def test_classify_log_line_on_shipped_log():
+    categories = collections.Counter()
+    crash_kinds = collections.Counter()
+    for line in RUN_2_LOG.read_bytes().splitlines():
+        if len(line) < 20 or line[4:5] != b"/":
+            continue
+        category, record = ndjson.classify_log_line(line)
+        categories[category] += 1
+        assert record["t"] > 0
+        if category == "crash":
+            crash_kinds[record.get("kind", "crash")] += 1
+        elif category == "stats":
+            assert record["exec_total"] >= 0 and record["exec_per_sec"] >= 0
+
+    assert categories["stats"] == RUN_2_LOG.read_bytes().count(b" exec total=")
+    assert crash_kinds["crash"] == 83
+    assert sum(crash_kinds.values()) == len(shipped_crash_lines())
+
+
+def test_stats_series_counts_primary_crashes_only():
+    series = stats.StatsSeries()
+    for line in RUN_2_LOG.read_bytes().splitlines():
+        series.feed(line)
+
+    assert len(series) == RUN_2_LOG.read_bytes().count(b" exec total=")
+    assert series.crashes == 83
+    assert list(series.columns["crashes"]) == sorted(series.columns["crashes"])
@@ -0,0 +1,26 @@
+import pytest
+from bench_ancestor import per_branch_ancestor
+from synthetic import git, make_repo
+
+from invoke_syz_manager import history
+
+
+@pytest.mark.parametrize("branches, unpushed", [(12, 3), (12, 0), (1, 5)])
+def test_ancestor_matches_per_branch_search(tmp_path, branches, unpushed):
+    repo = tmp_path / "repo"
+    make_repo(repo, history=60, branches=branches, unpushed=unpushed)
+
+    assert history.get_closest_upstream_ancestor(repo) == per_branch_ancestor(repo, history.get_remote)
+
+
+def test_ancestor_with_merged_side_branch(tmp_path):
+    repo = tmp_path / "repo"
+    make_repo(repo, history=60, branches=12, unpushed=3)
+    git(repo, "config", "user.name", "Test")
+    git(repo, "config", "user.email", "test@example.invalid")
+    git(repo, "checkout", "-q", "-b", "side", "master~30")
+    git(repo, "commit", "-q", "--allow-empty", "-m", "side change")
+    git(repo, "checkout", "-q", "work")
+    git(repo, "merge", "-q", "--no-edit", "side")
+
+    assert history.get_closest_upstream_ancestor(repo) == per_branch_ancestor(repo, history.get_remote)
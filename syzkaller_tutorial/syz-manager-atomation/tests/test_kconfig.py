@@ -0,0 +1,71 @@
+from pathlib import Path
+
+from invoke_syz_manager import artifacts
+
+REPRODUCTIONS_DIR = Path(__file__).resolve().parents[2] / "statefuzz-crash-reproduction"
+# Full .configs of two kernel versions
+CONFIGS = [
+    REPRODUCTIONS_DIR / "CVE-2020-28097" / "syzkaller_defconfig_5.8.9",
+    REPRODUCTIONS_DIR / "CVE-2020-27830" / "syzkaller_speakup_5.9.11.config",
+]
+
+
+def reference_diff(expected_text, actual_text):
+    """
+    Compare two .configs line by line, with a missing symbol read as not set.
+    """
+
+    def values(text):
+        result = {}
+        for line in text.splitlines():
+            if line.startswith("CONFIG_") and "=" in line:
+                symbol, value = line.split("=", 1)
+                result[symbol] = value
+            elif line.startswith("# CONFIG_") and line.endswith(" is not set"):
+                result[line.split()[1]] = "n"
+        return result
+
+    expected, actual = values(expected_text), values(actual_text)
+    added, removed, changed = {}, {}, {}
+    for symbol in expected.keys() | actual.keys():
+        old, new = expected.get(symbol, "n"), actual.get(symbol, "n")
+        if old == new:
+            continue
+        if old == "n":
+            added[symbol] = new
+        elif new == "n":
+            removed[symbol] = old
+        else:
+            changed[symbol] = (old, new)
+    return added, removed, changed
+
+
+def test_parse_kconfig():
+    text = 'CONFIG_KASAN=y\n# CONFIG_KCOV is not set\nCONFIG_CMDLINE="a=b c"\n# comment\n\nCONFIG_NR_CPUS=64\n'
+    assert artifacts.parse_kconfig(text) == {
+        "CONFIG_KASAN": "y",
+        "CONFIG_KCOV": "n",
+        "CONFIG_CMDLINE": '"a=b c"',
+        "CONFIG_NR_CPUS": "64",
+    }
+
+
+def test_diff_kconfig_matches_reference_on_shipped_configs():
+    old, new = (path.read_text() for path in CONFIGS)
+    # They share all their common values, so also change one
+    new = new.replace("CONFIG_KCOV=y", "CONFIG_KCOV=m", 1)
+    diff = artifacts.diff_kconfig(artifacts.parse_kconfig(old), artifacts.parse_kconfig(new))
+    assert diff == reference_diff(old, new)
+    assert all(diff)
+    added, removed, changed = diff
+    assert artifacts.diff_kconfig(artifacts.parse_kconfig(new), artifacts.parse_kconfig(old)) == (
+        removed,
+        added,
+        {symbol: (b, a) for symbol, (a, b) in changed.items()},
+    )
+
+
+def test_not_set_symbols_only_moving_are_not_reported():
+    expected = artifacts.parse_kconfig("CONFIG_A=y\n# CONFIG_B is not set\n")
+    actual = artifacts.parse_kconfig("CONFIG_A=y\n")
+    assert artifacts.diff_kconfig(expected, actual) == ({}, {}, {})
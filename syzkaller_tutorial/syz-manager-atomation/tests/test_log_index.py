@@ -0,0 +1,85 @@
+import gzip
+
+from conftest import RUN_2_LOG
+from invoke_syz_manager import crashes, log_index, stats
+
+DATA = RUN_2_LOG.read_bytes()
+
+
+def full_index(tmp_path):
+    log_file = tmp_path / "full" / "syz-manager.log"
+    log_file.parent.mkdir()
+    log_file.write_bytes(DATA)
+    index, parsed = log_index.update_log_index(log_file)
+    assert parsed == len(DATA)
+    return index, (log_file.parent / "syz-manager.stats.csv").read_text()
+
+
+def test_index_of_shipped_log(tmp_path):
+    index, stats_csv = full_index(tmp_path)
+
+    assert index["crashes"] == crashes.aggregate_crashes(RUN_2_LOG)
+    assert index["stats_samples"] == DATA.count(b" exec total=") == len(stats_csv.splitlines()) - 1
+    assert index["stats_crashes"] == 83
+    assert [entry[0] for entry in index["timestamps"]] == sorted(entry[0] for entry in index["timestamps"])
+
+
+def test_incremental_index_matches_full_index(tmp_path):
+    expected, expected_csv = full_index(tmp_path)
+    log_file = tmp_path / "syz-manager.log"
+    # Split mid-line: the partial line is left for the next run
+    split = len(DATA) // 2 + 17
+    log_file.write_bytes(DATA[:split])
+    _, first = log_index.update_log_index(log_file)
+    with open(log_file, "ab") as f:
+        f.write(DATA[split:])
+    index, second = log_index.update_log_index(log_file)
+
+    assert first + second == len(DATA)
+    for key in ["crashes", "stats_samples", "stats_crashes", "timestamps", "offset"]:
+        assert index[key] == expected[key], key
+    assert (tmp_path / "syz-manager.stats.csv").read_text() == expected_csv
+    assert log_index.update_log_index(log_file)[1] == 0
+
+
+def test_index_follows_rotation_into_compressed_segment(tmp_path):
+    expected, expected_csv = full_index(tmp_path)
+    log_file = tmp_path / "syz-manager.log"
+    split = DATA.index(b"\n", len(DATA) // 3) + 1
+    log_file.write_bytes(DATA[:split])
+    log_index.update_log_index(log_file)
+    # The rest of the segment was written before it was rotated and gzipped
+    rest = DATA.index(b"\n", 2 * len(DATA) // 3) + 1
+    with gzip.open(tmp_path / "syz-manager.log.1.gz", "wb") as f:
+        f.write(DATA[:rest])
+    log_file.unlink()
+    log_file.write_bytes(DATA[rest:])
+
+    index, parsed = log_index.update_log_index(log_file)
+
+    assert parsed == len(DATA) - split
+    for key in ["crashes", "stats_samples", "stats_crashes"]:
+        assert index[key] == expected[key], key
+    assert (tmp_path / "syz-manager.stats.csv").read_text() == expected_csv
+    assert {entry[1] for entry in index["timestamps"]} == {"syz-manager.log.1.gz", "syz-manager.log"}
+
+
+def test_read_only_index_writes_nothing(tmp_path):
+    expected, expected_csv = full_index(tmp_path)
+    log_file = tmp_path / "syz-manager.log"
+    # Indexed up to the middle, then the log grew
+    split = DATA.index(b"\n", len(DATA) // 2) + 1
+    log_file.write_bytes(DATA[:split])
+    log_index.update_log_index(log_file)
+    with open(log_file, "ab") as f:
+        f.write(DATA[split:])
+    stored = {path: path.read_bytes() for path in tmp_path.iterdir() if path.is_file()}
+
+    series = stats.StatsSeries()
+    index, parsed = log_index.update_log_index(log_file, series)
+
+    assert parsed == len(DATA) - split
+    for key in ["crashes", "stats_samples", "stats_crashes", "timestamps", "offset"]:
+        assert index[key] == expected[key], key
+    assert series.columns == stats.StatsSeries.read_csv(tmp_path / "full" / "syz-manager.stats.csv").columns
+    assert {path: path.read_bytes() for path in tmp_path.iterdir() if path.is_file()} == stored
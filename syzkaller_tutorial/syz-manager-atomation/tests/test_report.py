@@ -0,0 +1,20 @@
+import shutil
+
+from conftest import RUN_2_LOG
+from invoke_syz_manager import report
+
+
+def test_report_leaves_runs_untouched(tmp_path, capsys):
+    for name in ["run_1", "run_2"]:
+        (tmp_path / name).mkdir()
+        shutil.copy(RUN_2_LOG, tmp_path / name)
+    before = sorted(tmp_path.rglob("*"))
+
+    assert report.report_main(
+        [str(tmp_path / "run_1"), str(tmp_path / "run_2"), "--title", "SYZFAIL", "--at", "1h"]
+    ) == 0
+
+    assert sorted(tmp_path.rglob("*")) == before
+    rows = {line.split()[0]: line.split()[2:] for line in capsys.readouterr().out.splitlines()[1:]}
+    assert rows["first_crash_h"][0] == "2/2"
+    assert rows["coverage@1h"][0] == "2"
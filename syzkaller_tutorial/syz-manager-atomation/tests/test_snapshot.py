@@ -0,0 +1,45 @@
+import pytest
+from invoke_syz_manager import artifacts, constants, corpus, snapshots
+
+
+def make_work_dir(path):
+    (path / constants.REPRO_PACKAGE_DIRNAME).mkdir(parents=True)
+    (path / constants.CORPUS_FILENAME).write_bytes(b"corpus")
+    return path
+
+
+def test_failed_snapshot_puts_the_corpus_back(tmp_path, monkeypatch):
+    work_dir = make_work_dir(tmp_path / "work")
+
+    def fail(path, data):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(snapshots, "write_file_atomically", fail)
+    with pytest.raises(OSError):
+        snapshots.snapshot_work_dir(work_dir, work_dir / "previous_run_0", move_corpus=True)
+
+    assert (work_dir / constants.CORPUS_FILENAME).read_bytes() == b"corpus"
+    assert not (work_dir / "previous_run_0.tmp").exists()
+    assert not (work_dir / "previous_run_0").exists()
+
+
+def test_stranded_corpus_is_recovered(tmp_path):
+    work_dir = make_work_dir(tmp_path / "work")
+    (work_dir / "previous_run_0.tmp").mkdir()
+    (work_dir / constants.CORPUS_FILENAME).rename(work_dir / "previous_run_0.tmp" / constants.CORPUS_FILENAME)
+
+    _, corpus_db = artifacts.get_existing_work_dir(work_dir)
+
+    assert corpus_db.read_bytes() == b"corpus"
+
+
+def test_new_previous_run_skips_unfinished_snapshots(tmp_path, monkeypatch):
+    work_dir = make_work_dir(tmp_path / "work")
+    (work_dir / "previous_run_0").mkdir()
+    (work_dir / "previous_run_1.tmp").mkdir()
+    monkeypatch.setattr(corpus, "prompt_for_confirm", lambda: False)
+
+    corpus.handle_existing_corpus(work_dir, work_dir / constants.CORPUS_FILENAME)
+
+    assert (work_dir / "previous_run_1" / constants.CORPUS_FILENAME).read_bytes() == b"corpus"
+    assert not (work_dir / "previous_run_1.tmp").exists()
@@ -0,0 +1,25 @@
+from invoke_syz_manager import stats, supervisor
+
+
+STATS_LINE = (
+    b"2025/10/01 11:45:42 candidates=0 corpus=1222 coverage=30535 "
+    b"exec total=2140804 (31/sec) pending=0 reproducing=0"
+)
+
+
+def test_unterminated_last_line_reaches_handlers(tmp_path):
+    lines = []
+    recorder = stats.StatsRecorder(tmp_path / "syz-manager.stats.csv")
+    returncode = supervisor.supervise_syz_manager(
+        ["printf", "%s", b"first line\n" + STATS_LINE],
+        supervisor.RotatingLogWriter(tmp_path / "syz-manager.log"),
+        [lines.append, recorder.feed],
+        echo=False,
+    )
+    recorder.close()
+
+    assert returncode == 0
+    assert lines == [b"first line", STATS_LINE]
+    assert (tmp_path / "syz-manager.log").read_bytes() == b"first line\n" + STATS_LINE
+    rows = (tmp_path / "syz-manager.stats.csv").read_text().splitlines()
+    assert rows[1] == "1759319142,0,1222,30535,2140804,31,0"
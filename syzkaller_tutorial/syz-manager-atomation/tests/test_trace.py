@@ -0,0 +1,29 @@
+import json
+import subprocess
+
+from conftest import run_launcher
+from invoke_syz_manager import tracing
+
+
+def test_launch_trace_records_subprocesses(tmp_path, launch_env):
+    result = run_launcher(
+        tmp_path, launch_env, "--trace", "launch.trace.json", "--supervise", "--no-echo"
+    )
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    events = json.loads((tmp_path / "launch.trace.json").read_text())["traceEvents"]
+    names = {e["name"] for e in events if e.get("cat") == "subprocess"}
+    assert {"git rev-list", "git for-each-ref", "git diff"} <= names
+    assert [e["name"] for e in events if e.get("cat") == "manager"] == ["syz-manager"]
+
+
+def test_tracing_leaves_subprocess_module_alone(tmp_path):
+    run = subprocess.run
+    tracing.start_trace(tmp_path / "trace.json", "test")
+    try:
+        assert subprocess.run is run
+        tracing.run_subprocess(["true"], check=True)
+        assert [e["name"] for e in tracing.TRACER.events if e.get("cat") == "subprocess"] == ["true"]
+    finally:
+        tracing.finish_trace()
+    assert tracing.TRACER is None
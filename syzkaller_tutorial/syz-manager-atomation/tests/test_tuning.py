@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import subprocess
+
+import pytest
+from conftest import run_launcher
+from invoke_syz_manager import campaign, constants, errors, tuning
+
+# Prints stats lines 10s of log time apart whose exec/sec grows with procs
+STUB_MANAGER = """#!/usr/bin/env python3
+import json
+import sys
+
+with open(sys.argv[sys.argv.index("-config") + 1]) as f:
+    procs = json.load(f)["procs"]
+for t in range(6):
+    print(
+        f"2025/10/01 00:00:{t * 10:02} candidates=0 corpus=1 coverage=1 "
+        f"exec total={procs * 100 * t} (1/sec)"
+    )
+"""
+
+
+def launch(root, env, *extra):
+    return run_launcher(root, env, "--supervise", "--no-echo", *extra)
+
+
+def test_tuned_work_tree_relaunches_with_original_template(tmp_path, launch_env):
+    env = launch_env
+    (env["syzkaller"] / "bin" / "syz-manager").write_text(STUB_MANAGER)
+
+    tuned = launch(
+        tmp_path,
+        env,
+        "--tune",
+        "--tune-procs",
+        "1,4",
+        "--tune-vm-count",
+        "1",
+        "--tune-vm-cpu",
+        "1",
+        "--tune-vm-mem",
+        "256",
+        "--tune-seconds",
+        "10",
+        "--tune-warmup",
+        "0",
+    )
+    assert tuned.returncode == 0, tuned.stdout + tuned.stderr
+    repro_dir = tmp_path / "work" / constants.REPRO_PACKAGE_DIRNAME
+    cfg = json.loads((repro_dir / constants.REAL_CFG_FILENAME).read_text())
+    assert cfg["procs"] == 4
+    assert cfg["vm"]["count"] == 1 and cfg["vm"]["cpu"] == 1
+
+    relaunched = launch(tmp_path, env)
+    assert relaunched.returncode == 0, relaunched.stdout + relaunched.stderr
+    assert "was tuned" in relaunched.stdout
+
+    # A changed template is still caught
+    template = json.loads(env["cfg_template"].read_text())
+    template["http"] = "127.0.0.1:1"
+    env["cfg_template"].write_text(json.dumps(template))
+    changed = launch(tmp_path, env)
+    assert changed.returncode == 1
+    assert "ReproductionError" in changed.stderr
+
+
+def test_tuning_leaves_reserved_cores_free(tmp_path, monkeypatch):
+    monkeypatch.setattr(campaign, "CACHE_DIR", tmp_path)
+    args = argparse.Namespace(
+        tune_procs="1", tune_vm_count="1", tune_vm_cpu="1", tune_vm_mem="256"
+    )
+    other = subprocess.Popen(["sleep", "60"])
+    try:
+        reservation = campaign.reserve_resources(
+            other.pid, "other", {"cpus": len(os.sched_getaffinity(0)), "mem": 0}
+        )
+        with pytest.raises(errors.ConfigurationError):
+            tuning.tuning_variants({"procs": 1}, args)
+    finally:
+        other.kill()
+        other.wait()
+    assert len(tuning.tuning_variants({"procs": 1}, args)) == 1
+    assert not reservation.exists()
@@ -0,0 +1,81 @@
+import json
+import re
+import shutil
+
+from conftest import REPLAY_SCRIPT, RUN_2_LOG
+from invoke_syz_manager import constants, launch, watchdog
+
+
+def test_tail_only_crash_storm_restarts_manager(tmp_path, monkeypatch):
+    """
+    Replay the run_2 log through the supervisor: SYZFAIL: failed to recv rpc
+    is only ever a tail report there, and must still trip the watchdog.
+    """
+    syzkaller = tmp_path / "syzkaller"
+    (syzkaller / "bin").mkdir(parents=True)
+    shutil.copy(REPLAY_SCRIPT, syzkaller / "bin" / "syz-manager")
+    work_dir = tmp_path / "work"
+    repro_dir = work_dir / constants.REPRO_PACKAGE_DIRNAME
+    repro_dir.mkdir(parents=True)
+    # Drop every other title, which would storm first at these thresholds
+    cfg_path = repro_dir / constants.REAL_CFG_FILENAME
+    cfg_path.write_text(json.dumps({"ignores": ["^(?!SYZFAIL)"]}))
+    monkeypatch.setenv("REPLAY_LOG", str(RUN_2_LOG))
+
+    returncode = launch.watch_syz_manager(
+        syzkaller,
+        repro_dir,
+        work_dir / constants.SYZ_MANAGER_LOG_FILENAME,
+        0,
+        lambda: watchdog.Watchdog(7200, 3, 10**9, 0.0),
+        max_restarts=1,
+        echo=False,
+    )
+
+    assert returncode == 0
+    events = json.loads((repro_dir / constants.WATCHDOG_FILENAME).read_text())
+    assert [(e["reason"], e["title"]) for e in events] == [
+        ("crash_storm", "SYZFAIL: failed to recv rpc")
+    ]
+    assert re.escape("SYZFAIL: failed to recv rpc") in json.loads(cfg_path.read_text())["ignores"]
+    # The restarted manager ran the whole log with the storming title ignored
+    restarted_log = (work_dir / "syz-manager_1.log").read_text(errors="replace")
+    assert "failed to recv rpc" not in restarted_log
+    assert restarted_log.endswith(RUN_2_LOG.read_text(errors="replace").splitlines()[-1] + "\n")
+
+
+def test_tail_reports_count_once_per_crash():
+    dog = watchdog.Watchdog(3600, 2, 10**9, 0.0)
+    for kind in ["crash", "crash(tail0)", "crash(tail1)"]:
+        dog.feed(b"2025/09/30 23:27:34 VM 0: %s: SYZFAIL: mmap of data segment failed" % kind.encode())
+    assert dog.event is None
+    dog.feed(b"2025/09/30 23:30:00 VM 1: crash(tail0): SYZFAIL: mmap of data segment failed")
+    assert dog.event["title"] == "SYZFAIL: mmap of data segment failed"
+
+
+def test_crash_storm_on_shipped_log():
+    # The first title reported in 3 crashes, its tail reports included
+    seen = {}
+    expected = None
+    group = None
+    for line in RUN_2_LOG.read_bytes().decode(errors="replace").splitlines():
+        match = re.match(r"^(\S+ \S+) VM (\d+): crash(\(tail\d+\))?: (.*)$", line)
+        if not match:
+            continue
+        if match.group(3) is None or group != match.group(1, 2):
+            group, titles = match.group(1, 2), set()
+        if match.group(4).rstrip().endswith(" [corrupted]"):
+            continue
+        title = match.group(4).rstrip().removesuffix(" [suppressed]")
+        if title not in titles:
+            titles.add(title)
+            seen[title] = seen.get(title, 0) + 1
+            if seen[title] == 3:
+                expected = title, match.group(1)
+                break
+
+    dog = watchdog.Watchdog(10**9, 3, 10**9, 0.0)
+    for line in RUN_2_LOG.read_bytes().splitlines():
+        dog.feed(line)
+
+    assert (dog.event["title"], dog.event["at"]) == expected
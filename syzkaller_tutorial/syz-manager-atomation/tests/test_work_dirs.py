@@ -0,0 +1,63 @@
+import hashlib
+import json
+import os
+import shutil
+
+from conftest import run_launcher
+from invoke_syz_manager import constants, status
+
+
+def test_find_work_dirs_lists_each_work_dir_once(tmp_path):
+    for name in ["b", "a"]:
+        (tmp_path / name / constants.REPRO_PACKAGE_DIRNAME).mkdir(parents=True)
+    (tmp_path / "not_a_work_dir").mkdir()
+    (tmp_path / "link").symlink_to(tmp_path / "b")
+
+    work_dirs = status.find_work_dirs([tmp_path / "b", tmp_path, tmp_path / "link"])
+
+    assert work_dirs == [(tmp_path / "b").resolve(), (tmp_path / "a").resolve()]
+
+
+def set_cfg_trees(work_dir, kernel_src, syzkaller):
+    cfg_file = work_dir / constants.REPRO_PACKAGE_DIRNAME / constants.REAL_CFG_FILENAME
+    cfg = json.loads(cfg_file.read_text())
+    cfg["kernel_src"], cfg["syzkaller"] = str(kernel_src), str(syzkaller)
+    cfg_file.write_text(json.dumps(cfg))
+    manifest_file = cfg_file.parent / constants.MANIFEST_FILENAME
+    manifest = json.loads(manifest_file.read_text())
+    data = cfg_file.read_bytes()
+    manifest[cfg_file.name] = {"sha256": hashlib.sha256(data).hexdigest(), "size": len(data)}
+    manifest_file.write_text(json.dumps(manifest))
+
+
+def test_status_reports_failing_trees_and_checks_the_others(tmp_path, launch_env, monkeypatch, capsys):
+    result = run_launcher(tmp_path, launch_env)
+    assert result.returncode == 0, result.stdout + result.stderr
+    dirs = tmp_path / "dirs"
+    for name in ["valid", "no_config", "not_git"]:
+        shutil.copytree(tmp_path / "work", dirs / name)
+    # Relative trees are relative to the cfg, not to where status runs
+    repro_dir = dirs / "valid" / constants.REPRO_PACKAGE_DIRNAME
+    set_cfg_trees(
+        dirs / "valid",
+        os.path.relpath(launch_env["linux"], repro_dir),
+        os.path.relpath(launch_env["syzkaller"], repro_dir),
+    )
+    (tmp_path / "no_config").mkdir()
+    set_cfg_trees(dirs / "no_config", tmp_path / "no_config", launch_env["syzkaller"])
+    (tmp_path / "not_git").mkdir()
+    shutil.copy(launch_env["linux"] / ".config", tmp_path / "not_git")
+    set_cfg_trees(dirs / "not_git", tmp_path / "not_git", launch_env["syzkaller"])
+    monkeypatch.chdir(tmp_path / "no_config")
+
+    assert status.status_main([str(dirs), "--no-cache", "-j", "1"]) == 1
+
+    rows = {}
+    for line in capsys.readouterr().out.splitlines()[1:-1]:
+        state, *fields = line.split()
+        rows.update((field, state) for field in fields if field.startswith(str(dirs)))
+    assert rows == {
+        str((dirs / "valid").resolve()): "valid",
+        str((dirs / "no_config").resolve()): "error",
+        str((dirs / "not_git").resolve()): "error",
+    }